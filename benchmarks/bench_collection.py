@@ -0,0 +1,68 @@
+''' Profile collection versus a loop over profiles '''
+from __future__ import print_function
+import os
+import sys
+import timeit
+import numpy as np
+from sharppy.sharptab import interp, parcel, winds
+from sharppy.sharptab.profile import Profile, ProfileCollection
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir,
+                                'sharppy', 'tests'))
+import test_profile
+
+
+def ensemble(prof, size):
+    '''
+    Returns copies of the sample sounding with perturbed temperatures and
+    winds
+
+    '''
+    rng = np.random.RandomState(0)
+    profs = []
+    for i in range(size):
+        dt = rng.normal(0, 1)
+        profs.append(Profile(pres=prof.pres, hght=prof.hght,
+                             tmpc=prof.tmpc + dt, dwpc=prof.dwpc + dt,
+                             u=prof.u * rng.uniform(0.5, 1.5),
+                             v=prof.v * rng.uniform(0.5, 1.5)))
+    return profs
+
+
+CASES = [
+    ('interp.temp', lambda prof: interp.temp(prof, 500.)),
+    ('mean_wind', lambda prof: winds.mean_wind(prof)),
+    ('helicity', lambda prof: winds.helicity(prof, 0, 3000, 10, -5)),
+    ('bunkers', lambda prof: winds.non_parcel_bunkers_motion(prof)),
+    ('kinematics', lambda prof: winds.kinematics(prof)),
+    ('mixed_layer', lambda prof: parcel.mixed_layer(prof)),
+]
+
+
+def bench(func, number=1):
+    '''
+    Returns the best time per call (milliseconds) of func()
+
+    '''
+    return min(timeit.repeat(func, number=number, repeat=3)) / number * 1e3
+
+
+def main():
+    sample = test_profile.TestProfile().prof
+    for size in [100, 1000]:
+        profs = ensemble(sample, size)
+        coll = ProfileCollection.from_profiles(profs)
+        print('%d profiles (%d levels)' % (size, coll.pres.shape[1]))
+        print('%12s %12s %12s %8s' % ('', 'loop (ms)', 'batch (ms)',
+                                      'speedup'))
+        t = bench(lambda: ProfileCollection.from_profiles(profs))
+        print('%12s %12s %12.1f' % ('construct', '', t))
+        for name, func in CASES:
+            t1 = bench(lambda: [func(p) for p in profs])
+            t2 = bench(lambda: func(coll))
+            print('%12s %12.1f %12.1f %7.1fx' % (name, t1, t2, t1 / t2))
+        print()
+
+
+if __name__ == '__main__':
+    main()
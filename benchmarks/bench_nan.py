@@ -0,0 +1,85 @@
+''' Masked array versus NaN storage of a Profile '''
+from __future__ import print_function
+import os
+import sys
+import timeit
+import numpy as np
+from sharppy.sharptab import interp, parcel, utils, winds
+from sharppy.sharptab.constants import MISSING
+from sharppy.sharptab.profile import Profile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir,
+                                'sharppy', 'tests'))
+import test_profile
+
+
+def dense_sounding(prof, size):
+    '''
+    Returns the data of the sample sounding interpolated to the given number
+    of levels, with every seventh wind above the surface missing. The
+    surface wind is kept, since the routines that start at the surface
+    (e.g. helicity) return early without it.
+
+    '''
+    pres = np.logspace(np.log10(prof.pres[prof.sfc]), np.log10(100.), size)
+    hght = interp.hght(prof, pres)
+    tmpc = interp.temp(prof, pres)
+    dwpc = interp.dwpt(prof, pres)
+    wdir, wspd = utils.comp2vec_many(*interp.components(prof, pres))
+    wdir[3::7] = MISSING
+    wspd[3::7] = MISSING
+    return dict(pres=pres, hght=hght, tmpc=tmpc, dwpc=dwpc, wdir=wdir,
+                wspd=wspd)
+
+
+def sample_sounding(prof):
+    '''
+    Returns the data of the sample sounding
+
+    '''
+    return dict((name, getattr(prof, name).filled(MISSING))
+                for name in ['pres', 'hght', 'tmpc', 'dwpc', 'wdir', 'wspd'])
+
+
+CASES = [
+    ('construct', lambda prof, kw: Profile(**kw)),
+    ('from_buffers', lambda prof, kw: Profile.from_buffers(**kw)),
+    ('interp.temp', lambda prof, kw: interp.temp(prof,
+                                                 np.linspace(900, 200, 50))),
+    ('mean_wind', lambda prof, kw: winds.mean_wind(prof)),
+    ('helicity', lambda prof, kw: winds.helicity(prof, 0, 3000, 10, -5)),
+    ('max_wind', lambda prof, kw: winds.max_wind(prof, 0, 12000)),
+    ('kinematics', lambda prof, kw: winds.kinematics(prof)),
+    ('parcelx', lambda prof, kw: parcel.parcelx(prof)),
+    ('thetae', lambda prof, kw: (prof.reset_cache(), prof.thetae)),
+]
+
+
+def bench(func, args, number):
+    '''
+    Returns the best time per call (milliseconds) of func(*args)
+
+    '''
+    times = timeit.repeat(lambda: func(*args), number=number, repeat=3)
+    return min(times) / number * 1e3
+
+
+def main():
+    sample = test_profile.TestProfile().prof
+    for label, kw, number in [('sample sounding', sample_sounding(sample), 50),
+                              ('5000 levels', dense_sounding(sample, 5000), 5)]:
+        masked = Profile(**kw)
+        nan = Profile(nan=True, **kw)
+        print('%s (%d levels)' % (label, masked.pres.size))
+        print('%12s %12s %12s %8s' % ('', 'masked (ms)', 'nan (ms)',
+                                      'speedup'))
+        for name, func in CASES:
+            nkw = dict(kw, nan=True)
+            t1 = bench(func, (masked, kw), number)
+            t2 = bench(func, (nan, nkw), number)
+            print('%12s %12.3f %12.3f %7.1fx' % (name, t1, t2, t1 / t2))
+        print()
+
+
+if __name__ == '__main__':
+    main()
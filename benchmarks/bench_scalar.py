@@ -0,0 +1,41 @@
+''' Microbenchmarks of the scalar paths in thermo and utils '''
+from __future__ import print_function
+import timeit
+import numpy as np
+from sharppy.sharptab import thermo, utils
+
+
+# Each case is called once with Python floats (scalar path) and once with
+# 0-d arrays of the same values (array path)
+CASES = [
+    ('utils.vec2comp', utils.vec2comp, (225., 30.)),
+    ('utils.comp2vec', utils.comp2vec, (-10., 15.)),
+    ('utils.mag', utils.mag, (-10., 15.)),
+    ('thermo.theta', thermo.theta, (850., 12., 1000.)),
+    ('thermo.lcltemp', thermo.lcltemp, (25., 18.)),
+    ('thermo.satlift', thermo.satlift, (500., 20.)),
+    ('thermo.wetlift', thermo.wetlift, (850., 15., 300.)),
+]
+
+
+def bench(func, args, number):
+    '''
+    Returns the best time per call (microseconds) of func(*args)
+
+    '''
+    times = timeit.repeat(lambda: func(*args), number=number, repeat=5)
+    return min(times) / number * 1e6
+
+
+def main(number=2000):
+    print('%-16s %12s %12s %8s' % ('function', 'scalar (us)', 'array (us)',
+                                   'speedup'))
+    for name, func, args in CASES:
+        scalar = bench(func, args, number)
+        array = bench(func, [np.array(arg) for arg in args], number)
+        print('%-16s %12.2f %12.2f %7.1fx' % (name, scalar, array,
+                                              array / scalar))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+''' Scaling of interp.vtmp() with the number of target levels '''
+from __future__ import print_function
+import os
+import sys
+import timeit
+import numpy as np
+import numpy.ma as ma
+from sharppy.sharptab import interp, thermo
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir,
+                                'sharppy', 'tests'))
+import test_profile
+
+
+SIZES = [10, 100, 1000, 10000]
+
+
+def vtmp_loop(prof, p):
+    '''
+    The former implementation of interp.vtmp(), one level at a time
+
+    '''
+    t = interp.temp(prof, p)
+    td = interp.dwpt(prof, p)
+    vt = [thermo.virtemp(pp, tt, tdtd) for pp, tt, tdtd in zip(p, t, td)]
+    return ma.asarray(vt)
+
+
+def bench(func, args, number):
+    '''
+    Returns the best time per call (milliseconds) of func(*args)
+
+    '''
+    times = timeit.repeat(lambda: func(*args), number=number, repeat=3)
+    return min(times) / number * 1e3
+
+
+def main():
+    prof = test_profile.TestProfile().prof
+    print('%8s %12s %12s %8s' % ('levels', 'loop (ms)', 'vector (ms)',
+                                 'speedup'))
+    for size in SIZES:
+        p = np.linspace(prof.pres[prof.sfc], 100., size)
+        number = max(1, 2000 // size)
+        loop = bench(vtmp_loop, (prof, p), number)
+        vector = bench(interp.vtmp, (prof, p), number)
+        print('%8d %12.3f %12.3f %7.1fx' % (size, loop, vector,
+                                            loop / vector))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,12 @@
 import constants
 import utils
+import jit
 import profile
 import thermo
+import adiabats
 import interp
 import winds
+import parcel
 
-__all__ = ['contants', 'utils', 'profile', 'thermo', 'interp', 'winds']
\ No newline at end of file
+__all__ = ['contants', 'utils', 'jit', 'profile', 'thermo', 'adiabats',
+           'interp', 'winds', 'parcel']
\ No newline at end of file
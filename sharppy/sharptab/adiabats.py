@@ -0,0 +1,311 @@
+''' Moist Adiabat Lookup Table '''
+from __future__ import division
+import os
+import numpy as np
+import numpy.ma as ma
+from sharppy.sharptab.constants import *
+
+__all__ = ['MoistAdiabatTable', 'get_table', 'use_table', 'table_enabled']
+
+
+# Default table grid. Bilinear interpolation on this grid agrees with the
+# iterative thermo.satlift() to within MAX_ERROR (C) for saturated potential
+# temperatures between THETAM_MIN and THETAM_MAX and pressures between
+# PRES_MAX and PRES_MIN. The observed error on a dense random sample of the
+# grid is about 0.06 C; MAX_ERROR is set to the 0.1 C convergence criterion
+# used by thermo.satlift() itself.
+THETAM_MIN = -60.
+THETAM_MAX = 60.
+THETAM_STEP = 0.25
+PRES_MAX = 1100.
+PRES_MIN = 10.
+NPRES = 601
+MAX_ERROR = 0.1
+
+# Version of the table file format, stored with the table by save(). Bump it
+# when the layout of the file or the way the table is built changes, so that
+# tables cached by older versions are rebuilt.
+TABLE_VERSION = 1
+
+CACHE_DIR = os.environ.get('SHARPPY_CACHE_DIR',
+    os.path.join(os.path.expanduser('~'), '.sharppy'))
+CACHE_FILE = 'moist_adiabats.npz'
+
+_table = None
+_enabled = False
+
+
+class MoistAdiabatTable(object):
+    '''
+    Lookup table of the temperature (C) along moist adiabats as a function
+    of saturated potential temperature (C) and pressure (hPa). Values are
+    interpolated bilinearly in saturated potential temperature and
+    log-pressure. Points that fall outside of the table are computed with
+    the iterative thermo.satlift().
+
+    '''
+    def __init__(self, thetam, logp, temp, version=TABLE_VERSION):
+        '''
+        Create the lookup table object
+
+        Parameters
+        ----------
+        thetam : numpy array
+            Evenly spaced, ascending saturated potential temperatures (C)
+        logp : numpy array
+            Evenly spaced, descending natural log of the pressures (hPa)
+        temp : numpy array
+            Temperature (C) of the moist adiabats with shape
+            (len(thetam), len(logp))
+        version : int (optional; default TABLE_VERSION)
+            Format version of the table
+
+        Returns
+        -------
+        A moist adiabat lookup table object
+
+        '''
+        self.thetam = np.asarray(thetam, dtype=np.float64)
+        self.logp = np.asarray(logp, dtype=np.float64)
+        self.temp = np.asarray(temp, dtype=np.float64)
+        self.dthetam = self.thetam[1] - self.thetam[0]
+        self.dlogp = self.logp[1] - self.logp[0]
+        self.version = version
+
+    @classmethod
+    def build(cls, thetam_min=THETAM_MIN, thetam_max=THETAM_MAX,
+              thetam_step=THETAM_STEP, pres_max=PRES_MAX, pres_min=PRES_MIN,
+              npres=NPRES):
+        '''
+        Build a lookup table by lifting every moist adiabat on the grid
+        with thermo.satlift()
+
+        Parameters
+        ----------
+        thetam_min : number (optional)
+            Lowest saturated potential temperature in the table (C)
+        thetam_max : number (optional)
+            Highest saturated potential temperature in the table (C)
+        thetam_step : number (optional)
+            Saturated potential temperature increment (C)
+        pres_max : number (optional)
+            Highest pressure in the table (hPa)
+        pres_min : number (optional)
+            Lowest pressure in the table (hPa)
+        npres : int (optional)
+            Number of pressure levels, evenly spaced in log-pressure
+
+        Returns
+        -------
+        A moist adiabat lookup table object
+
+        '''
+        from sharppy.sharptab import thermo
+        thetam, logp = _axes(thetam_min, thetam_max, thetam_step, pres_max,
+                             pres_min, npres)
+        temp = thermo.satlift(np.exp(logp)[np.newaxis, :],
+                              thetam[:, np.newaxis])
+        return cls(thetam, logp, temp)
+
+    @classmethod
+    def load(cls, path):
+        '''
+        Load a lookup table previously written by save(). A table written
+        without a format version gets None as its version.
+
+        Parameters
+        ----------
+        path : string
+            Location of the table file
+
+        Returns
+        -------
+        A moist adiabat lookup table object
+
+        '''
+        data = np.load(path)
+        try:
+            version = None
+            if 'version' in data.files:
+                version = int(data['version'])
+            return cls(data['thetam'], data['logp'], data['temp'], version)
+        finally:
+            data.close()
+
+    def save(self, path):
+        '''
+        Write the lookup table to disk
+
+        Parameters
+        ----------
+        path : string
+            Location of the table file
+
+        Returns
+        -------
+        None
+
+        '''
+        arrays = dict(thetam=self.thetam, logp=self.logp, temp=self.temp)
+        if self.version is not None:
+            arrays['version'] = self.version
+        np.savez(path, **arrays)
+
+    def __call__(self, p, thetam):
+        '''
+        Returns the temperature (C) of a saturated parcel when lifted to a
+        new pressure level (hPa). This is a drop in replacement for
+        thermo.satlift().
+
+        Parameters
+        ----------
+        p : number, numpy array
+            Pressure to which parcel is raised (hPa)
+        thetam : number, numpy array
+            Saturated Potential Temperature of parcel (C)
+
+        Returns
+        -------
+        Temperature (C) of saturated parcel at new level
+
+        '''
+        from sharppy.sharptab import thermo
+        mask = ma.getmask(p) | ma.getmask(thetam)
+        p, thetam = np.broadcast_arrays(ma.getdata(p).astype(np.float64),
+            ma.getdata(thetam).astype(np.float64))
+        x = (thetam - self.thetam[0]) / self.dthetam
+        y = (np.log(p) - self.logp[0]) / self.dlogp
+        outside = ~((x >= 0) & (x <= self.thetam.size - 1) &
+                    (y >= 0) & (y <= self.logp.size - 1))
+        i = np.clip(np.floor(x), 0, self.thetam.size - 2)
+        j = np.clip(np.floor(y), 0, self.logp.size - 2)
+        fx = x - i
+        fy = y - j
+        i = np.where(outside, 0, i).astype(np.intp)
+        j = np.where(outside, 0, j).astype(np.intp)
+        temp = ((self.temp[i, j] * (1 - fx) + self.temp[i+1, j] * fx) *
+                (1 - fy) + (self.temp[i, j+1] * (1 - fx) +
+                self.temp[i+1, j+1] * fx) * fy)
+        if outside.any():
+            temp = np.array(temp, dtype=np.float64, ndmin=1)
+            outside = np.array(outside, ndmin=1)
+            temp[outside] = thermo.satlift(np.array(p, ndmin=1)[outside],
+                np.array(thetam, ndmin=1)[outside])
+            temp = temp.reshape(p.shape)
+        if not temp.shape:
+            return ma.masked if np.any(mask) else temp[()]
+        if np.any(mask):
+            return ma.array(temp, mask=np.broadcast_to(mask, temp.shape))
+        return temp
+
+
+def _axes(thetam_min=THETAM_MIN, thetam_max=THETAM_MAX,
+          thetam_step=THETAM_STEP, pres_max=PRES_MAX, pres_min=PRES_MIN,
+          npres=NPRES):
+    '''
+    Returns the saturated potential temperature (C) and log-pressure axes
+    of a lookup table grid
+
+    '''
+    thetam = np.arange(thetam_min, thetam_max + thetam_step / 2., thetam_step)
+    logp = np.linspace(np.log(pres_max), np.log(pres_min), npres)
+    return thetam, logp
+
+
+def get_table():
+    '''
+    Returns the default moist adiabat lookup table. The table is built on
+    first use and cached on disk in CACHE_DIR (set by the SHARPPY_CACHE_DIR
+    environment variable) so that later sessions only need to load it. A
+    cached table is only used if it passes _check_table(); otherwise it is
+    rebuilt and the cache is overwritten.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    A moist adiabat lookup table object
+
+    '''
+    global _table
+    if _table is not None:
+        return _table
+    path = os.path.join(CACHE_DIR, CACHE_FILE)
+    try:
+        table = MoistAdiabatTable.load(path)
+        if not _check_table(table):
+            table = None
+    except (IOError, OSError, KeyError, ValueError):
+        table = None
+    if table is None:
+        table = MoistAdiabatTable.build()
+        try:
+            if not os.path.isdir(CACHE_DIR):
+                os.makedirs(CACHE_DIR)
+            table.save(path)
+        except (IOError, OSError):
+            pass
+    _table = table
+    return _table
+
+
+def _check_table(table, nsample=9):
+    '''
+    Returns whether a cached table can stand in for the default one: it has
+    the current format version, the default grid and finite values that
+    agree with thermo.satlift() to within MAX_ERROR at a grid of nsample x
+    nsample nodes spread over the table, including its corners.
+
+    '''
+    from sharppy.sharptab import thermo
+    thetam, logp = _axes()
+    if table.version != TABLE_VERSION or \
+            not np.array_equal(table.thetam, thetam) or \
+            not np.array_equal(table.logp, logp) or \
+            table.temp.shape != (thetam.size, logp.size) or \
+            not np.isfinite(table.temp).all():
+        return False
+    i = np.linspace(0, thetam.size - 1, nsample).astype(np.intp)
+    j = np.linspace(0, logp.size - 1, nsample).astype(np.intp)
+    i, j = i[:, np.newaxis], j[np.newaxis, :]
+    correct = thermo.satlift(np.exp(logp[j]), thetam[i])
+    return bool(np.all(np.abs(table.temp[i, j] - correct) < MAX_ERROR))
+
+
+def use_table(flag=True):
+    '''
+    Globally switch thermo.wetlift() between the lookup table and the
+    iterative thermo.satlift(). The switch can be overridden on each call
+    with the 'lookup' keyword of thermo.wetlift().
+
+    Parameters
+    ----------
+    flag : bool (optional; default True)
+        Whether the lookup table should be used
+
+    Returns
+    -------
+    None
+
+    '''
+    global _enabled
+    _enabled = bool(flag)
+
+
+def table_enabled():
+    '''
+    Returns whether thermo.wetlift() uses the lookup table by default
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    bool
+
+    '''
+    return _enabled
+
@@ -1,14 +1,18 @@
 ''' Interpolation Routines '''
 from __future__ import division
+import math
 import numpy as np
 import numpy.ma as ma
 import numpy.testing as npt
 from sharppy.sharptab import utils, thermo
 from sharppy.sharptab.constants import *
+from sharppy.sharptab.profile import ProfileCollection
+from sharppy.sharptab.utils import _NUMBERS
 
 
 __all__ = ['pres', 'hght', 'temp', 'dwpt', 'vtmp', 'components', 'vec']
-__all__ += ['to_agl', 'to_msl']
+__all__ += ['to_agl', 'to_msl', 'InterpPlan', 'ColumnPlan']
+__all__ += ['generic_interp_columns']
 
 
 def pres(prof, h):
@@ -17,8 +21,8 @@ def pres(prof, h):
 
     Parameters
     ----------
-    prof : profile object
-        Profile object
+    prof : profile object, profile collection
+        Profile object, or a collection of profiles
     h : number, numpy array
         Height (m) of the level for which pressure is desired
 
@@ -27,7 +31,10 @@ def pres(prof, h):
     Pressure (hPa) at the given height
 
     '''
-    return generic_interp_hght(h, prof.hght, prof.logp, log=True)
+    if isinstance(prof, ProfileCollection):
+        return 10**_interp_columns(prof, ['logp'], h, 'hght')[0]
+    hght, logp = prof.valid_levels('logp', coord='hght')
+    return 10**np.interp(h, hght, logp, left=np.nan, right=np.nan)
 
 
 def hght(prof, p):
@@ -36,8 +43,8 @@ def hght(prof, p):
 
     Parameters
     ----------
-    prof : profile object
-        Profile object
+    prof : profile object, profile collection
+        Profile object, or a collection of profiles
     p : number, numpy array
         Pressure (hPa) of the level for which height is desired
 
@@ -46,11 +53,7 @@ def hght(prof, p):
     Height (m) at the given pressure
 
     '''
-    # Note: numpy's interpoloation routine expects the interpoloation
-    # routine to be in ascending order. Because pressure decreases in the
-    # vertical, we must reverse the order of the two arrays to satisfy
-    # this requirement.
-    return generic_interp_pres(np.log10(p), prof.logp[::-1], prof.hght[::-1])
+    return _interp_pres(prof, 'hght', np.log10(p))
 
 
 def temp(prof, p):
@@ -59,8 +62,8 @@ def temp(prof, p):
 
     Parameters
     ----------
-    prof : profile object
-        Profile object
+    prof : profile object, profile collection
+        Profile object, or a collection of profiles
     p : number, numpy array
         Pressure (hPa) of the level for which temperature is desired
 
@@ -69,11 +72,7 @@ def temp(prof, p):
     Temperature (C) at the given pressure
 
     '''
-    # Note: numpy's interpoloation routine expects the interpoloation
-    # routine to be in ascending order. Because pressure decreases in the
-    # vertical, we must reverse the order of the two arrays to satisfy
-    # this requirement.
-    return generic_interp_pres(np.log10(p), prof.logp[::-1], prof.tmpc[::-1])
+    return _interp_pres(prof, 'tmpc', np.log10(p))
 
 
 def dwpt(prof, p):
@@ -83,8 +82,8 @@ def dwpt(prof, p):
 
     Parameters
     ----------
-    prof : profile object
-        Profile object
+    prof : profile object, profile collection
+        Profile object, or a collection of profiles
     p : number, numpy array
         Pressure (hPa) of the level for which dew point temperature is desired
 
@@ -93,11 +92,7 @@ def dwpt(prof, p):
     Dew point tmperature (C) at the given pressure
 
     '''
-    # Note: numpy's interpoloation routine expects the interpoloation
-    # routine to be in ascending order. Because pressure decreases in the
-    # vertical, we must reverse the order of the two arrays to satisfy
-    # this requirement.
-    return generic_interp_pres(np.log10(p), prof.logp[::-1], prof.dwpc[::-1])
+    return _interp_pres(prof, 'dwpc', np.log10(p))
 
 
 def vtmp(prof, p):
@@ -107,8 +102,8 @@ def vtmp(prof, p):
 
     Parameters
     ----------
-    prof : profile object
-        Profile object
+    prof : profile object, profile collection
+        Profile object, or a collection of profiles
     p : number, numpy array
         Pressure (hPa) of the level for which virtual temperature is desired
 
@@ -119,11 +114,10 @@ def vtmp(prof, p):
     '''
     t = temp(prof, p)
     td = dwpt(prof, p)
-    try:
-        vt = [thermo.virtemp(pp, tt, tdtd) for pp,tt,tdtd in zip(p, t, td)]
-        return ma.asarray(vt)
-    except TypeError:
+    if not np.ndim(p):
         return thermo.virtemp(p, t, td)
+    p = ma.asanyarray(p, dtype=np.float64)
+    return ma.array(thermo.virtemp(ma.getdata(p), t, td), mask=ma.getmask(p))
 
 
 def components(prof, p):
@@ -133,8 +127,8 @@ def components(prof, p):
 
     Parameters
     ----------
-    prof : profile object
-        Profile object
+    prof : profile object, profile collection
+        Profile object, or a collection of profiles
     p : number, numpy array
         Pressure (hPa) of a level
 
@@ -142,12 +136,11 @@ def components(prof, p):
     -------
     U and V components at the given pressure
     '''
-    # Note: numpy's interpoloation routine expects the interpoloation
-    # routine to be in ascending order. Because pressure decreases in the
-    # vertical, we must reverse the order of the two arrays to satisfy
-    # this requirement.
-    U = generic_interp_pres(np.log10(p), prof.logp[::-1], prof.u[::-1])
-    V = generic_interp_pres(np.log10(p), prof.logp[::-1], prof.v[::-1])
+    logp = np.log10(p)
+    if isinstance(prof, ProfileCollection):
+        return tuple(_interp_columns(prof, ['u', 'v'], logp, 'logp'))
+    U = _interp_pres(prof, 'u', logp)
+    V = _interp_pres(prof, 'v', logp)
     return U, V
 
 
@@ -179,15 +172,15 @@ def to_agl(prof, h):
     ----------
     h : number, numpy array
         Height of a level
-    prof : profile object
-        Profile object
+    prof : profile object, profile collection
+        Profile object, or a collection of profiles
 
     Returns
     -------
     Converted height
 
     '''
-    return h - prof.hght[prof.sfc]
+    return h - _sfc_value(prof, 'hght', np.ndim(h))
 
 
 def to_msl(prof, h):
@@ -198,15 +191,405 @@ def to_msl(prof, h):
     ----------
     h : number, numpy array
         Height of a level
-    prof : profile object
-        Profile object
+    prof : profile object, profile collection
+        Profile object, or a collection of profiles
 
     Returns
     -------
     Converted height
 
     '''
-    return h + prof.hght[prof.sfc]
+    return h + _sfc_value(prof, 'hght', np.ndim(h))
+
+
+class InterpPlan(object):
+    '''
+    Interpolates any number of data arrays of a profile to the same set of
+    pressures or heights. The levels that bracket each target and the
+    interpolation weights are found once, on the levels with a valid
+    vertical coordinate; each data array then only needs a weighted sum of
+    its gap-filled values (see Profile.filled_levels()). Results agree with
+    numpy.interp to within rounding; targets outside of the valid levels
+    of a data array are returned as NaN.
+
+    '''
+    def __init__(self, prof, p=None, h=None):
+        '''
+        Create the interpolation plan
+
+        Parameters
+        ----------
+        prof : profile object
+            Profile object
+        p : number, numpy array (optional)
+            Pressures (hPa) to interpolate to
+        h : number, numpy array (optional)
+            Heights (m) to interpolate to (used if p is not given)
+
+        Returns
+        -------
+        An interpolation plan object
+
+        '''
+        if p is not None:
+            self.coord = 'logp'
+            x = np.log10(p)
+        elif h is not None:
+            self.coord = 'hght'
+            x = h
+        else:
+            raise ValueError('Either p or h must be given')
+        self.prof = prof
+        self.shape = np.shape(x)
+        x = ma.filled(ma.asarray(x, dtype=np.float64), np.nan).ravel()
+        grid = prof.valid_levels(self.coord, self.coord)[0]
+        n = grid.size
+        if n < 2:
+            raise ValueError('at least two valid levels are required')
+
+        # Locate the targets with a single search: the position of each
+        # target in units of levels
+        pos = np.interp(x, grid, np.arange(n), left=-1, right=n)
+        pos[np.isnan(pos)] = -1
+        outside = (pos < 0) | (pos > n - 1)
+        pos[outside] = 0
+        lo = pos.astype(np.intp)
+        np.clip(lo, 0, n - 2, out=lo)
+        x0 = grid[lo]
+        w = (x - x0) / (grid[lo + 1] - x0)
+        w[outside] = np.nan
+        self.lo = lo
+        self.hi = lo + 1
+        self.w = w
+
+        # Targets that fall exactly on a level take its value even when the
+        # other bracketing level is missing
+        self._atlo = np.flatnonzero(w == 0)
+        self._athi = np.flatnonzero(w == 1)
+
+    def __call__(self, name):
+        '''
+        Interpolates a data array of the profile
+
+        Parameters
+        ----------
+        name : string
+            Name of the data array (e.g. 'tmpc')
+
+        Returns
+        -------
+        Value of the data array at the planned levels
+
+        '''
+        filled = self.prof.filled_levels(name, self.coord)
+        f0 = filled[self.lo]
+        f = filled[self.hi]
+        f -= f0
+        f *= self.w
+        f += f0
+        if self._atlo.size:
+            f[self._atlo] = f0[self._atlo]
+        if self._athi.size:
+            f[self._athi] = filled[self.hi[self._athi]]
+        return f.reshape(self.shape)[()]
+
+    def fields(self, *names):
+        '''
+        Interpolates several data arrays of the profile
+
+        Parameters
+        ----------
+        names : string
+            Names of the data arrays (e.g. 'tmpc', 'dwpc')
+
+        Returns
+        -------
+        Tuple with the value of each data array at the planned levels
+
+        '''
+        return tuple(self(name) for name in names)
+
+
+class ColumnPlan(object):
+    '''
+    Interpolates stacks of columns (column x level), such as the columns of
+    a model grid, to a set of target levels. The vertical coordinate is
+    either shared by all columns (1-D) or given per column (2-D) and may be
+    ascending or descending along the levels (e.g. log10 of the pressure).
+    The levels that bracket each target are found once for all columns and
+    reused for every field interpolated with the plan. Missing (masked or
+    non-finite) levels are skipped per column, and targets outside of the
+    valid levels of a column are masked.
+
+    '''
+    def __init__(self, x, coord, mask=None):
+        '''
+        Create the interpolation plan
+
+        Parameters
+        ----------
+        x : number, numpy array
+            Target levels, either shared by all columns (number or 1-D) or
+            per column (column x target)
+        coord : numpy array
+            Monotonic vertical coordinate, shared (level) or per column
+            (column x level)
+        mask : numpy array (optional)
+            Additional levels to skip (True where missing), shared or per
+            column
+
+        Returns
+        -------
+        A column interpolation plan object
+
+        '''
+        coord = ma.asanyarray(coord, dtype=np.float64)
+        valid = ~ma.getmaskarray(coord) & np.isfinite(ma.getdata(coord))
+        if mask is not None and np.any(mask):
+            valid = valid & ~np.asarray(mask, dtype=bool)
+        coord = ma.getdata(coord)
+        x = ma.filled(ma.asarray(x, dtype=np.float64), np.nan)
+
+        # Work with an ascending coordinate; the direction is taken from the
+        # first column with two valid levels
+        cols, good = np.broadcast_arrays(np.atleast_2d(coord),
+                                         np.atleast_2d(valid))
+        k = np.argmax(good.sum(axis=-1) > 1)
+        c = cols[k][good[k]]
+        if c.size > 1 and c[-1] < c[0]:
+            coord = -coord
+            x = -x
+        self.x = x
+        self.coord = coord
+        self.valid = valid
+
+        if coord.ndim == 1 and valid.ndim == 1:
+            # One search for all of the columns
+            order = np.flatnonzero(valid)
+            if not order.size:
+                order = np.zeros(1, dtype=np.intp)
+            c = np.where(valid[order], coord[order], np.nan)
+            n = valid.sum()
+            j = np.searchsorted(c[:n], x, side='right') - 1
+            last = j == n - 1
+            jlo = np.maximum(j, 0)
+            jhi = np.minimum(np.where(last, jlo, jlo + 1), order.size - 1)
+            c0, c1 = c[jlo], c[jhi]
+            self.lo, self.hi = order[jlo], order[jhi]
+            self.rows = None if x.ndim < 2 else \
+                np.arange(x.shape[0])[:, np.newaxis]
+        else:
+            order, c, n, j = self._search(x, coord, valid)
+            rows = np.arange(c.shape[0])[:, np.newaxis]
+            last = j == n - 1
+            jlo = np.maximum(j, 0)
+            jhi = np.minimum(np.where(last, jlo, jlo + 1), c.shape[1] - 1)
+            c0, c1 = c[rows, jlo], c[rows, jhi]
+            self.lo, self.hi = order[rows, jlo], order[rows, jhi]
+            self.rows = rows
+            if not x.ndim:
+                # A single target gives one value per column
+                x = x[()]
+                j, last, jlo, jhi, c0, c1 = [a[:, 0] for a in
+                                             (j, last, jlo, jhi, c0, c1)]
+                self.lo, self.hi = self.lo[:, 0], self.hi[:, 0]
+                self.rows = rows[:, 0]
+
+        # Targets beyond the last valid level only count if they are on it
+        with np.errstate(invalid='ignore', divide='ignore'):
+            inside = (j >= 0) & (~last | (c0 == x))
+            w = np.where(jlo == jhi, 0., (x - c0) / (c1 - c0))
+        self.w = np.where(inside, w, np.nan)
+
+    @staticmethod
+    def _search(x, coord, valid):
+        '''
+        Finds the last valid level at or below each target (-1 if none) for
+        all of the columns at once. The columns are shifted so that each one
+        lies above the one before it and searched end to end with a single
+        numpy.searchsorted.
+
+        '''
+        coord, valid = np.broadcast_arrays(np.atleast_2d(coord),
+                                           np.atleast_2d(valid))
+        ncol, nlev = coord.shape
+
+        # Move the valid levels of each column to the front and pad the
+        # rest with +inf so that every column stays sorted
+        if valid.all():
+            order = np.broadcast_to(np.arange(nlev), coord.shape)
+            c = coord
+            n = np.full((ncol, 1), nlev, dtype=np.intp)
+        else:
+            order = np.argsort(~valid, axis=-1, kind='mergesort')
+            c = np.take_along_axis(coord, order, axis=-1)
+            n = valid.sum(axis=-1)[:, np.newaxis]
+            c[np.arange(nlev) >= n] = np.inf
+
+        x = np.broadcast_to(np.atleast_1d(x), (ncol, np.shape(x)[-1] if
+                            np.ndim(x) else 1))
+        finite = np.isfinite(c)
+        if not finite.any():
+            return order, c, n, np.full(x.shape, -1, dtype=np.intp)
+
+        # Within a column the valid levels span [0, width), the padding sits
+        # at 2*width and the targets are clipped to [-width, 1.5*width]; the
+        # columns are then stacked 4*width apart
+        lo = c[finite].min()
+        width = c[finite].max() - lo + 1.
+        rows = np.arange(ncol)[:, np.newaxis]
+        shift = rows * (4. * width)
+        levels = np.where(finite, c - lo, 2. * width) + shift
+        with np.errstate(invalid='ignore'):
+            targets = np.clip(x - lo, -width, 1.5 * width) + shift
+        j = np.searchsorted(levels.ravel(), targets.ravel(), side='right')
+        j = j.reshape(x.shape) - 1 - rows * nlev
+        j = np.where(np.isnan(x), -1, np.minimum(j, n - 1))
+        return order, c, n, j
+
+    def __call__(self, field):
+        '''
+        Interpolates a field with the plan
+
+        Parameters
+        ----------
+        field : numpy array
+            Values at the levels of the coordinate (column x level)
+
+        Returns
+        -------
+        Masked array of the field at the target levels (column x target)
+
+        '''
+        field = ma.asanyarray(field, dtype=np.float64)
+        valid = ~ma.getmaskarray(field) & np.isfinite(ma.getdata(field))
+        if not np.all(valid | ~self.valid):
+            # The field is missing at levels where the coordinate is not, so
+            # bracket the valid levels of the field instead
+            plan = ColumnPlan(self.x, self.coord, mask=~(valid & self.valid))
+            return plan(ma.getdata(field))
+        data = ma.getdata(field)
+        if self.rows is None:
+            f0 = data[..., self.lo]
+            f1 = data[..., self.hi]
+        else:
+            f0 = data[self.rows, self.lo]
+            f1 = data[self.rows, self.hi]
+        f = f0 + self.w * (f1 - f0)
+        return ma.masked_invalid(f, copy=False)
+
+
+def generic_interp_columns(x, coord, field):
+    '''
+    Interpolates a stack of columns to the given target levels. This is a
+    shortcut for ColumnPlan(x, coord, mask)(field); build the plan once to
+    interpolate several fields.
+
+    Parameters
+    ----------
+    x : number, numpy array
+        Target levels, either shared by all columns or per column
+    coord : numpy array
+        Monotonic vertical coordinate, shared (level) or per column
+        (column x level)
+    field : numpy array
+        Values at the levels of the coordinate (column x level)
+
+    Returns
+    -------
+    Masked array of the field at the target levels (column x target)
+
+    '''
+    field = ma.asanyarray(field, dtype=np.float64)
+    mask = ma.getmaskarray(field) | ~np.isfinite(ma.getdata(field))
+    return ColumnPlan(x, coord, mask=mask)(ma.getdata(field))
+
+
+def _interp_pres(prof, name, logp):
+    '''
+    Interpolates a data array of the profile to the given log10 pressure
+    using the cached valid levels of the profile (see Profile.valid_levels())
+
+    '''
+    if isinstance(prof, ProfileCollection):
+        return _interp_columns(prof, [name], logp, 'logp')[0]
+    # Note: numpy's interpoloation routine expects the interpoloation
+    # routine to be in ascending order. The cached levels are stored in
+    # order of ascending log-pressure to satisfy this requirement.
+    xp, fp = prof.valid_levels(name)
+    return np.interp(logp, xp, fp, left=np.nan, right=np.nan)
+
+
+def _interp_columns(prof, names, x, coord):
+    '''
+    Interpolates data arrays of a profile collection to the given log10
+    pressures or heights with one ColumnPlan. The levels are given per
+    profile along the first axis (see ProfileCollection).
+
+    '''
+    x = ma.filled(ma.asarray(x, dtype=np.float64), np.nan)
+    single = x.ndim < 2
+    if single:
+        x = x.reshape(-1, 1)
+    x = np.broadcast_to(x, (len(prof), x.shape[1]))
+    plan = ColumnPlan(x, ma.getdata(getattr(prof, coord)),
+                      mask=~prof.valid(coord, *names))
+    fields = [plan(ma.getdata(getattr(prof, name))) for name in names]
+    if single:
+        fields = [field[:, 0] for field in fields]
+    return fields
+
+
+def _sfc_value(prof, name, ndim=0):
+    '''
+    Returns the surface value of a data array of the profile. For a profile
+    collection this is one value per profile, shaped to broadcast against
+    levels of the given number of dimensions.
+
+    '''
+    if isinstance(prof, ProfileCollection):
+        value = prof.sfc_values(name)
+        return value.reshape(value.shape + (1,) * max(ndim - 1, 0))
+    return getattr(prof, name)[prof.sfc]
+
+
+def _layer_mean(prof, name, bot, top, weighted=True, coord='logp'):
+    '''
+    Averages a data array of the profile between two pressures (hPa) or
+    heights (m). This is the single profile equivalent of
+    generic_layer_mean(); the integrals come from the cumulative sums cached
+    on the profile (see Profile.integrate()), so only the two ends of the
+    layer are evaluated. When weighted, the mean is weighted by pressure
+    (or height). A layer that extends beyond the valid levels of the data
+    array is masked, and a layer of zero depth returns the value at that
+    level. A profile collection is averaged in pressure with
+    generic_layer_mean().
+
+    '''
+    if isinstance(prof, ProfileCollection):
+        bot = ma.filled(ma.asarray(bot, dtype=np.float64), np.nan)
+        top = ma.filled(ma.asarray(top, dtype=np.float64), np.nan)
+        mean = generic_layer_mean(bot, top, prof.pres, getattr(prof, name),
+                                  weighted=weighted)
+        return ma.masked_invalid(mean)
+    x, field = prof.valid_levels(name, coord)
+    bot, top = [q if isinstance(q, _NUMBERS) else float(ma.filled(q, np.nan))
+                for q in (bot, top)]
+    ends = (bot, top)
+    if coord == 'logp':
+        ends = [math.log10(q) if q > 0 else np.nan for q in ends]
+    lo, hi = min(ends), max(ends)
+    if not (x.size and x[0] <= lo and hi <= x[-1]):
+        return ma.masked
+    if lo == hi:
+        return np.interp(lo, x, field)
+    q0, c0 = prof.integrate(name, bot, coord)
+    q1, c1 = prof.integrate(name, top, coord)
+    if not abs(q0 - q1) > 0:
+        return ma.masked
+    if weighted:
+        return (c0[1] - c1[1]) / ((q0 * q0 - q1 * q1) / 2.)
+    return (c0[0] - c1[0]) / (q0 - q1)
 
 
 def generic_interp_hght(h, hght, field, log=False):
@@ -279,11 +662,85 @@ def generic_interp_pres(p, pres, field):
                      right=ma.masked)
 
 
+def generic_layer_mean(pbot, ptop, pres, field, weighted=True):
+    '''
+    Generic layer averaging routine. The field is treated as piecewise
+    linear in log-pressure (as in the interpolation routines) and integrated
+    exactly in pressure between the valid levels and the interpolated
+    endpoints of the layer. Both 1-D profiles and 2-D (profile x level)
+    stacks are accepted. Profiles whose valid levels do not span the layer
+    are masked.
 
+    Parameters
+    ----------
+    pbot : number, numpy array
+        Pressure of the bottom of the layer (hPa); one per profile
+    ptop : number, numpy array
+        Pressure of the top of the layer (hPa); one per profile
+    pres : numpy array
+        The array of pressure (descending along the last axis)
+    field : numpy array
+        The variable which is being averaged
+    weighted : bool (optional; default True)
+        Switch to choose between a pressure-weighted mean and a plain mean
+        in pressure coordinates
 
+    Returns
+    -------
+    Layer mean of the 'field' variable
 
-
-
-
-
+    '''
+    pres = ma.asanyarray(pres, dtype=np.float64)
+    field = ma.asanyarray(field, dtype=np.float64)
+    pres, field = np.broadcast_arrays(pres, field, subok=True)
+    valid = ~(ma.getmaskarray(pres) | ma.getmaskarray(field))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x = np.log(ma.getdata(pres))
+    f = ma.getdata(field)
+    valid &= np.isfinite(x) & np.isfinite(f)
+
+    # Move the valid levels to the front of each profile so that adjacent
+    # entries bound a layer
+    order = np.argsort(~valid, axis=-1, kind='mergesort')
+    x = np.take_along_axis(x, order, axis=-1)
+    f = np.take_along_axis(f, order, axis=-1)
+    valid = np.take_along_axis(valid, order, axis=-1)
+    seg = valid[..., :-1] & valid[..., 1:]
+    x1, x2 = x[..., :-1], x[..., 1:]
+    f1, f2 = f[..., :-1], f[..., 1:]
+
+    # Clip each layer to the bounds and integrate it analytically
+    xbot = np.log(np.asarray(pbot, dtype=np.float64))[..., np.newaxis]
+    xtop = np.log(np.asarray(ptop, dtype=np.float64))[..., np.newaxis]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # Profiles whose valid levels do not span the layer are masked
+        covered = (np.where(valid, x, np.inf).min(axis=-1) <=
+                   np.minimum(xbot, xtop)[..., 0]) & \
+                  (np.where(valid, x, -np.inf).max(axis=-1) >=
+                   np.maximum(xbot, xtop)[..., 0])
+        a = np.clip(x1, xtop, xbot)
+        b = np.clip(x2, xtop, xbot)
+        seg &= (x1 != x2)
+        s = np.where(seg, (f2 - f1) / (x2 - x1), 0.)
+        fa = f1 + s * (a - x1)
+        fb = f1 + s * (b - x1)
+        if weighted:
+            num = (fb/2. - s/4.) * np.exp(2*b) - (fa/2. - s/4.) * np.exp(2*a)
+            den = (np.exp(2*b) - np.exp(2*a)) / 2.
+        else:
+            num = (fb - s) * np.exp(b) - (fa - s) * np.exp(a)
+            den = np.exp(b) - np.exp(a)
+        num = np.where(seg & (a != b), num, 0.).sum(axis=-1)
+        den = np.where(seg & (a != b), den, 0.).sum(axis=-1)
+        mean = num / den
+
+        # A layer of zero depth takes the interpolated value at its level
+        hit = seg & (np.minimum(x1, x2) <= a) & (a <= np.maximum(x1, x2))
+        point = (xbot == xtop)[..., 0] & hit.any(axis=-1)
+        if np.any(point):
+            k = hit.argmax(axis=-1)[..., np.newaxis]
+            mean = np.where(point,
+                            np.take_along_axis(fa, k, axis=-1)[..., 0], mean)
+            den = np.where(point, 1., den)
+        return ma.masked_where((den == 0) | ~covered, mean)[()]
 
@@ -0,0 +1,163 @@
+''' Numba Compiled Thermodynamic Kernels '''
+from __future__ import division
+import numpy as np
+import numpy.ma as ma
+from sharppy.sharptab.constants import *
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+__all__ = ['HAS_NUMBA', 'apply']
+
+
+HAS_NUMBA = numba is not None
+
+_kernels = None
+
+
+def _compile():
+    '''
+    Compiles the thermodynamic kernels. The kernels are scalar versions of
+    the functions in sharppy.sharptab.thermo, built into NumPy ufuncs with
+    numba.vectorize. Compilation happens on first use so that importing
+    SHARPpy does not pay for it.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    Dictionary of compiled ufuncs keyed by the name of the thermo function
+
+    '''
+    global _kernels
+    if _kernels is not None:
+        return _kernels
+    if not HAS_NUMBA:
+        raise ImportError('numba is required for the numba backend')
+
+    c1 = 0.0498646455 ; c2 = 2.4082965 ; c3 = 7.07475
+    c4 = 38.9114 ; c5 = 0.0915 ; c6 = 1.2035
+
+    @numba.njit
+    def wobf(t):
+        t = t - 20
+        if t <= 0:
+            npol = 1 + t * (-8.841660499999999e-3 + t * ( 1.4714143e-4
+                   + t * (-9.671989000000001e-7 + t * (-3.2607217e-8
+                   + t * (-3.8598073e-10)))))
+            return 15.13 / (npol**4)
+        ppol = t * (4.9618922e-07 + t * (-6.1059365e-09 +
+              t * (3.9401551e-11 + t * (-1.2588129e-13 +
+              t * (1.6688280e-16)))))
+        ppol = 1 + t * (3.6182989e-03 + t * (-1.3603273e-05 + ppol))
+        return (29.93 / (ppol**4)) + (0.96 * t) - 14.8
+
+    @numba.njit
+    def vappres(t):
+        pol = t * (1.1112018e-17 + (t * -3.0994571e-20))
+        pol = t * (2.1874425e-13 + (t * (-1.789232e-15 + pol)))
+        pol = t * (4.3884180e-09 + (t * (-2.988388e-11 + pol)))
+        pol = t * (7.8736169e-05 + (t * (-6.111796e-07 + pol)))
+        pol = 0.99999683 + (t * (-9.082695e-03 + pol))
+        return 6.1078 / pol**8
+
+    @numba.njit
+    def mixratio(p, t):
+        x = 0.02 * (t - 12.5 + (7500. / p))
+        wfw = 1. + (0.0000045 * p) + (0.0014 * x * x)
+        fwesw = wfw * vappres(t)
+        return 621.97 * (fwesw / (p - fwesw))
+
+    @numba.njit
+    def lcltemp(t, td):
+        s = t - td
+        dlt = s * (1.2185 + 0.001278 * t + s * (-0.00219 + 1.173e-5 * s -
+            0.0000052 * t))
+        return t - dlt
+
+    @numba.njit
+    def temp_at_mixrat(w, p):
+        x = np.log10(w * p / (622. + w))
+        return (10.**((c1 * x) + c2) - c3 + (c4 * (10**(c5 * x) - c6)**2)
+                - ZEROCNK)
+
+    @numba.njit
+    def satlift(p, thetam):
+        if np.fabs(p - 1000.) - 0.001 <= 0: return thetam
+        pwrp = (p / 1000.)**ROCP
+        t1 = (thetam + ZEROCNK) * pwrp - ZEROCNK
+        e1 = wobf(t1) - wobf(thetam)
+        rate = 1.
+        t2 = t1 - (e1 * rate)
+        e2 = (t2 + ZEROCNK) / pwrp - ZEROCNK
+        e2 += wobf(t2) - wobf(e2) - thetam
+        eor = e2 * rate
+        while np.fabs(eor) - 0.1 > 0:
+            rate = (t2 - t1) / (e2 - e1)
+            t1 = t2
+            e1 = e2
+            t2 = t1 - (e1 * rate)
+            e2 = (t2 + ZEROCNK) / pwrp - ZEROCNK
+            e2 += wobf(t2) - wobf(e2) - thetam
+            eor = e2 * rate
+        return t2 - eor
+
+    @numba.njit
+    def wetlift(p, t, p2):
+        thta = ((t + ZEROCNK) * (1000. / p)**ROCP) - ZEROCNK
+        thetam = thta - wobf(thta) + wobf(t)
+        return satlift(p2, thetam)
+
+    f1 = ['float64(float64)']
+    f2 = ['float64(float64, float64)']
+    f3 = ['float64(float64, float64, float64)']
+    _kernels = {
+        'wobf': numba.vectorize(f1)(wobf),
+        'vappres': numba.vectorize(f1)(vappres),
+        'mixratio': numba.vectorize(f2)(mixratio),
+        'lcltemp': numba.vectorize(f2)(lcltemp),
+        'temp_at_mixrat': numba.vectorize(f2)(temp_at_mixrat),
+        'satlift': numba.vectorize(f2)(satlift),
+        'wetlift': numba.vectorize(f3)(wetlift),
+    }
+    return _kernels
+
+
+def apply(name, *args, **kwargs):
+    '''
+    Evaluates a compiled thermodynamic kernel. Masked input values are
+    carried through to a masked result.
+
+    Parameters
+    ----------
+    name : string
+        Name of the thermo function (e.g. 'satlift')
+    args : number, numpy array
+        Arguments of the thermo function
+    out : numpy array (optional)
+        Preallocated array in which to store the result
+
+    Returns
+    -------
+    Result of the kernel (number or numpy array)
+
+    '''
+    kernel = _compile()[name]
+    mask = ma.nomask
+    for arg in args:
+        mask = mask | ma.getmask(arg)
+    out = kwargs.get('out')
+    if out is None:
+        out = kernel(*[ma.getdata(arg) for arg in args])
+    else:
+        kernel(*[ma.getdata(arg) for arg in args], out=out)
+    if not np.any(mask):
+        return out
+    if not np.shape(out):
+        return ma.masked
+    return ma.array(out, mask=np.broadcast_to(mask, out.shape))
+
@@ -0,0 +1,508 @@
+''' Parcel Lifting Routines '''
+from __future__ import division
+import numpy as np
+import numpy.ma as ma
+from sharppy.sharptab import interp, thermo
+from sharppy.sharptab.constants import *
+from sharppy.sharptab.profile import Profile, ProfileCollection
+
+
+__all__ = ['Parcel', 'parcelx', 'lift_parcels', 'most_unstable_level']
+__all__ += ['mean_theta', 'mean_mixratio', 'mixed_layer']
+
+
+class Parcel(object):
+    '''
+    Container for the results of lifting a parcel through a profile
+
+    '''
+    def __init__(self, pres, tmpc, dwpc):
+        '''
+        Create the parcel object
+
+        Parameters
+        ----------
+        pres : number
+            Pressure of the initial parcel (hPa)
+        tmpc : number
+            Temperature of the initial parcel (C)
+        dwpc : number
+            Dew point temperature of the initial parcel (C)
+
+        Returns
+        -------
+        A parcel object
+
+        '''
+        self.pres = pres
+        self.tmpc = tmpc
+        self.dwpc = dwpc
+        self.lclpres = ma.masked        # LCL Pressure (hPa)
+        self.lclhght = ma.masked        # LCL Height (m AGL)
+        self.lfcpres = ma.masked        # LFC Pressure (hPa)
+        self.lfchght = ma.masked        # LFC Height (m AGL)
+        self.elpres = ma.masked         # EL Pressure (hPa)
+        self.elhght = ma.masked         # EL Height (m AGL)
+        self.bplus = ma.masked          # CAPE (J/kg)
+        self.bminus = ma.masked         # CIN (J/kg)
+        self.b3km = ma.masked           # 0-3 km AGL CAPE (J/kg)
+        self.bm10m30 = ma.masked        # -10 to -30 C layer CAPE (J/kg)
+        self.ptrace = ma.masked         # Pressure of the parcel trace (hPa)
+        self.ttrace = ma.masked         # Virtual temperature trace (C)
+
+
+def parcelx(prof, pres=None, tmpc=None, dwpc=None):
+    '''
+    Lifts a parcel through a profile and integrates its buoyancy. The parcel
+    ascends dry adiabatically (conserving its mixing ratio) to the LCL and
+    moist adiabatically above it. The parcel trace is built on the levels of
+    the profile above the initial parcel, plus the initial level and the LCL,
+    and the buoyancy of the whole trace is integrated with array operations.
+    Buoyancy uses the virtual temperature of both the parcel and the
+    environment. If no parameters are given for the parcel, a surface based
+    parcel is lifted. This is a thin wrapper around lift_parcels().
+
+    Parameters
+    ----------
+    prof : profile object
+        Profile object
+    pres : number (optional; default surface pressure)
+        Pressure of the initial parcel (hPa)
+    tmpc : number (optional; default surface temperature)
+        Temperature of the initial parcel (C)
+    dwpc : number (optional; default surface dew point)
+        Dew point temperature of the initial parcel (C)
+
+    Returns
+    -------
+    pcl : parcel object
+        Parcel object
+
+    '''
+    if pres is None: pres = prof.pres[prof.sfc]
+    if tmpc is None: tmpc = prof.tmpc[prof.sfc]
+    if dwpc is None: dwpc = prof.dwpc[prof.sfc]
+    return lift_parcels(prof, [pres], [tmpc], [dwpc])[0]
+
+
+def lift_parcels(prof, pres, tmpc, dwpc):
+    '''
+    Lifts several parcels through the same profile at once. The environment
+    is sampled a single time on the levels of the profile, and all parcels
+    are lifted and integrated as one (parcel x level) array operation. Each
+    row of the trace holds the profile levels plus the initial level and LCL
+    of that parcel; levels below the initial parcel are excluded from the
+    integration.
+
+    Parameters
+    ----------
+    prof : profile object
+        Profile object
+    pres : array_like
+        Pressures of the initial parcels (hPa)
+    tmpc : array_like
+        Temperatures of the initial parcels (C)
+    dwpc : array_like
+        Dew point temperatures of the initial parcels (C)
+
+    Returns
+    -------
+    pcls : list
+        Parcel objects, one for each initial parcel
+
+    '''
+    pres = np.atleast_1d(ma.filled(ma.asanyarray(pres, dtype=np.float64),
+                                   np.nan))
+    tmpc = np.atleast_1d(ma.filled(ma.asanyarray(tmpc, dtype=np.float64),
+                                   np.nan))
+    dwpc = np.atleast_1d(ma.filled(ma.asanyarray(dwpc, dtype=np.float64),
+                                   np.nan))
+    npcl = pres.size
+    rows = np.arange(npcl)[:, np.newaxis]
+
+    # Lift the parcels to their LCLs
+    lclpres, lcltmpc = thermo.drylift(pres, tmpc, dwpc)
+
+    # Sample the environment once on the profile levels, and once for all of
+    # the initial levels and LCLs
+    valid = prof.valid('pres', 'tmpc', 'hght')
+    levs = ma.getdata(prof.pres)[valid]
+    extra = np.concatenate([pres, lclpres])
+    samp = np.concatenate([extra, levs])
+    tsamp = ma.filled(interp.temp(prof, samp), np.nan)
+    tdsamp = ma.filled(interp.dwpt(prof, samp), np.nan)
+    hsamp = ma.filled(interp.hght(prof, samp), np.nan)
+    vtsamp = thermo.virtemp(samp, tsamp, tdsamp)
+
+    # Build the (parcel x level) traces, ordered from the bottom up
+    def trace(x):
+        return np.concatenate([x[:npcl, np.newaxis],
+            x[npcl:2*npcl, np.newaxis],
+            np.broadcast_to(x[2*npcl:], (npcl, levs.size))], axis=1)
+    ptrace = trace(samp)
+    order = np.argsort(-ptrace, axis=1, kind='mergesort')
+    ptrace = ptrace[rows, order]
+    tenv = trace(tsamp)[rows, order]
+    vtenv = trace(vtsamp)[rows, order]
+    htrace = trace(hsamp)[rows, order]
+
+    # Parcel virtual temperature: dry below the LCL, saturated above
+    above = ptrace <= pres[:, np.newaxis]
+    dry = ptrace >= lclpres[:, np.newaxis]
+    moist = ~dry & above
+    vtpcl = np.empty(ptrace.shape, dtype=np.float64)
+    vtpcl.fill(np.nan)
+    pdry = ptrace[dry]
+    tdry = thermo.theta(np.broadcast_to(pres[:, np.newaxis], dry.shape)[dry],
+                        np.broadcast_to(tmpc[:, np.newaxis], dry.shape)[dry],
+                        pdry)
+    w = np.broadcast_to(thermo.mixratio(pres, dwpc)[:, np.newaxis], dry.shape)
+    tddry = thermo.temp_at_mixrat(w[dry], pdry)
+    vtpcl[dry] = thermo.virtemp(pdry, tdry, tddry)
+    pmoist = ptrace[moist]
+    tmoist = thermo.wetlift(
+        np.broadcast_to(lclpres[:, np.newaxis], moist.shape)[moist],
+        np.broadcast_to(lcltmpc[:, np.newaxis], moist.shape)[moist], pmoist)
+    vtpcl[moist] = thermo.virtemp(pmoist, tmoist, tmoist)
+
+    # Buoyancy (m/s2) of the parcels along the traces
+    buoy = G * (vtpcl - vtenv) / thermo.ctok(vtenv)
+    buoy[~above] = np.nan
+    hbot = htrace[rows[:, 0], np.argmax(above, axis=1)]
+
+    # LFC and EL
+    haslfc, lfclogp, lfchght, ellogp, elhght = _lfc_el(np.log(ptrace),
+        htrace, buoy, ptrace <= lclpres[:, np.newaxis])
+
+    # Integrate the positive and negative areas
+    bplus = _area(htrace, buoy, lfchght, elhght)
+    bminus = -_area(htrace, -buoy, hbot, lfchght)
+    b3km = _area(htrace, buoy, lfchght,
+                 np.minimum(elhght, interp.to_msl(prof, 3000.)))
+    hm10 = _temp_hght(ptrace, htrace, tenv, pres, -10.)
+    hm30 = _temp_hght(ptrace, htrace, tenv, pres, -30.)
+    bm10m30 = _area(htrace, buoy, np.maximum(lfchght, hm10),
+                    np.minimum(elhght, hm30))
+
+    lclhght = interp.to_agl(prof, hsamp[npcl:2*npcl])
+    lfchght = interp.to_agl(prof, lfchght)
+    elhght = interp.to_agl(prof, elhght)
+    pcls = []
+    for i in range(npcl):
+        pcl = Parcel(pres[i], tmpc[i], dwpc[i])
+        pcl.lclpres = lclpres[i]
+        pcl.lclhght = lclhght[i]
+        keep = above[i] & np.isfinite(vtpcl[i])
+        pcl.ptrace = ptrace[i][keep]
+        pcl.ttrace = vtpcl[i][keep]
+        if haslfc[i]:
+            pcl.lfcpres = np.exp(lfclogp[i])
+            pcl.lfchght = lfchght[i]
+            pcl.elpres = np.exp(ellogp[i])
+            pcl.elhght = elhght[i]
+            pcl.bplus = bplus[i]
+            pcl.bminus = bminus[i]
+            pcl.b3km = b3km[i]
+            pcl.bm10m30 = bm10m30[i]
+        else:
+            pcl.bplus = 0.
+            pcl.bminus = 0.
+            pcl.b3km = 0.
+            pcl.bm10m30 = 0.
+        pcls.append(pcl)
+    return pcls
+
+
+def most_unstable_level(prof, depth=300, dp=-1, exact=True):
+    '''
+    Finds the most unstable level (the level of maximum equivalent potential
+    temperature) in a layer above the surface. The equivalent potential
+    temperature of the whole layer is computed in a single array pass.
+
+    Parameters
+    ----------
+    prof : profile object
+        Profile object
+    depth : number (optional; default 300)
+        Depth of the layer above the surface to search (hPa)
+    dp : negative integer (optional; default -1)
+        The pressure increment for the interpolated sounding
+    exact : bool (optional; default = True)
+        Switch to choose between searching the levels of the profile or the
+        interpolated sounding at 'dp' pressure levels
+
+    Returns
+    -------
+    Pressure (hPa) of the most unstable level
+
+    '''
+    if dp > 0: dp = -dp
+    pbot = prof.pres[prof.sfc]
+    ptop = pbot - depth
+    if exact:
+        ind = np.where((prof.pres <= pbot) & (prof.pres >= ptop))[0]
+        ps = prof.pres[ind]
+        t = prof.tmpc[ind]
+        td = prof.dwpc[ind]
+    else:
+        ps = np.arange(pbot, ptop+dp, dp)
+        t = interp.temp(prof, ps)
+        td = interp.dwpt(prof, ps)
+    thetae = ma.masked_invalid(thermo.thetae(ps, t, td))
+    return ps[ma.argmax(thetae)]
+
+
+def mean_theta(prof, pbot=None, ptop=None):
+    '''
+    Calculates the pressure-weighted mean potential temperature of a layer.
+    The potential temperature is computed on the levels of the profile and
+    integrated exactly between them and the interpolated layer endpoints.
+    The default layer is the lowest 100 hPa.
+
+    Parameters
+    ----------
+    prof : profile object, profile collection, list
+        Profile object, or a collection or sequence of profile objects
+    pbot : number, numpy array (optional; default surface pressure)
+        Pressure of the bottom level (hPa)
+    ptop : number, numpy array (optional; default 100 hPa above pbot)
+        Pressure of the top level (hPa)
+
+    Returns
+    -------
+    Mean potential temperature (C); one value per profile
+
+    '''
+    return _mean(prof, 'theta', pbot, ptop)
+
+
+def mean_mixratio(prof, pbot=None, ptop=None):
+    '''
+    Calculates the pressure-weighted mean mixing ratio of a layer. The
+    mixing ratio is computed on the levels of the profile and integrated
+    exactly between them and the interpolated layer endpoints. The default
+    layer is the lowest 100 hPa.
+
+    Parameters
+    ----------
+    prof : profile object, profile collection, list
+        Profile object, or a collection or sequence of profile objects
+    pbot : number, numpy array (optional; default surface pressure)
+        Pressure of the bottom level (hPa)
+    ptop : number, numpy array (optional; default 100 hPa above pbot)
+        Pressure of the top level (hPa)
+
+    Returns
+    -------
+    Mean mixing ratio (g/kg); one value per profile
+
+    '''
+    return _mean(prof, 'wvmr', pbot, ptop)
+
+
+def mixed_layer(prof, depth=100):
+    '''
+    Defines the mixed-layer parcel from the mean potential temperature and
+    mean mixing ratio of the lowest layer of the profile. The parcel starts
+    at the surface.
+
+    Parameters
+    ----------
+    prof : profile object, profile collection, list
+        Profile object, or a collection or sequence of profile objects
+    depth : number (optional; default 100)
+        Depth of the mixed layer (hPa)
+
+    Returns
+    -------
+    pres : number, numpy array
+        Pressure of the mixed-layer parcel (hPa)
+    tmpc : number, numpy array
+        Temperature of the mixed-layer parcel (C)
+    dwpc : number, numpy array
+        Dew point temperature of the mixed-layer parcel (C)
+
+    '''
+    if isinstance(prof, (list, tuple)):
+        prof = ProfileCollection.from_profiles(prof)
+    psfc = _stack(prof)[3]
+    ptop = psfc - depth
+    mtheta = _mean(prof, 'theta', psfc, ptop)
+    mmr = _mean(prof, 'wvmr', psfc, ptop)
+    return (psfc, thermo.theta(1000., mtheta, psfc),
+            thermo.temp_at_mixrat(mmr, psfc))
+
+
+def _mean(prof, name, pbot, ptop):
+    '''
+    Returns the pressure-weighted mean of the potential temperature
+    ('theta') or the mixing ratio ('wvmr') over a layer. A single profile
+    with scalar bounds is answered from the cumulative integrals cached on
+    the profile (see Profile.integrate()); otherwise the field is computed
+    on the levels and averaged with interp.generic_layer_mean().
+
+    '''
+    pres, tmpc, dwpc, psfc = _stack(prof)
+    if pbot is None: pbot = psfc
+    if ptop is None: ptop = pbot - 100.
+    if isinstance(prof, Profile) and np.ndim(pbot) == 0 and \
+            np.ndim(ptop) == 0:
+        return interp._layer_mean(prof, name, pbot, ptop)
+    if name == 'theta':
+        field = thermo.theta(pres, tmpc, 1000.)
+    else:
+        field = thermo.mixratio(pres, dwpc)
+    return interp.generic_layer_mean(pbot, ptop, pres, field)
+
+
+def _stack(prof):
+    '''
+    Returns the pressure, temperature and dew point of a profile, or of a
+    profile collection or a sequence of profiles as (profile x level)
+    arrays, along with the surface pressure of each profile.
+
+    '''
+    if isinstance(prof, (list, tuple)):
+        prof = ProfileCollection.from_profiles(prof)
+    if not isinstance(prof, ProfileCollection):
+        return prof.pres, prof.tmpc, prof.dwpc, prof.pres[prof.sfc]
+    psfc = ma.getdata(prof.sfc_values('pres'))
+    return prof.pres, prof.tmpc, prof.dwpc, psfc
+
+
+def _lfc_el(logp, h, b, moist):
+    '''
+    Finds the level of free convection and the equilibrium level along
+    parcel traces. The LFC is the first level at or above the LCL where the
+    parcel becomes positively buoyant and the EL is the top of the highest
+    positively buoyant layer. Crossings are interpolated linearly in height.
+
+    Parameters
+    ----------
+    logp : numpy array
+        Natural log of the trace pressures (parcel x level; descending order)
+    h : numpy array
+        Heights of the trace levels (m)
+    b : numpy array
+        Buoyancy of the parcels at the trace levels
+    moist : numpy array
+        Boolean array marking the trace levels at or above the LCL
+
+    Returns
+    -------
+    haslfc : numpy array
+        Whether each parcel has an LFC
+    lfclogp, lfchght : numpy array
+        Log-pressure and height (m) of the LFC
+    ellogp, elhght : numpy array
+        Log-pressure and height (m) of the EL
+
+    '''
+    rows = np.arange(b.shape[0])
+    nlev = b.shape[1]
+    moist = moist & np.isfinite(b)
+    with np.errstate(invalid='ignore'):
+        pos = moist & (b > 0)
+    haslfc = pos.any(axis=1)
+
+    def cross(k):
+        # Interpolate the zero crossing between levels k and k+1
+        k1 = np.minimum(k + 1, nlev - 1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            f = b[rows, k] / (b[rows, k] - b[rows, k1])
+            return (logp[rows, k] + f * (logp[rows, k1] - logp[rows, k]),
+                    h[rows, k] + f * (h[rows, k1] - h[rows, k]))
+
+    k = np.argmax(pos, axis=1)
+    atlcl = (k == np.argmax(moist, axis=1)) | (k == 0)
+    lfclogp, lfchght = cross(np.maximum(k - 1, 0))
+    lfclogp = np.where(atlcl, logp[rows, k], lfclogp)
+    lfchght = np.where(atlcl, h[rows, k], lfchght)
+
+    k = nlev - 1 - np.argmax(pos[:, ::-1], axis=1)
+    attop = (k == nlev - 1) | ~np.isfinite(b[rows, np.minimum(k + 1,
+                                                               nlev - 1)])
+    ellogp, elhght = cross(k)
+    ellogp = np.where(attop, logp[rows, k], ellogp)
+    elhght = np.where(attop, h[rows, k], elhght)
+    return haslfc, lfclogp, lfchght, ellogp, elhght
+
+
+def _temp_hght(p, h, t, pres, target):
+    '''
+    Returns the lowest height (m) above each initial parcel at which the
+    environmental temperature falls to the target temperature. If the
+    temperature never reaches the target, the top of the trace is returned.
+
+    Parameters
+    ----------
+    p : numpy array
+        Pressures of the trace levels (hPa; parcel x level)
+    h : numpy array
+        Heights of the trace levels (m)
+    t : numpy array
+        Temperatures at the trace levels (C)
+    pres : numpy array
+        Pressures of the initial parcels (hPa)
+    target : number
+        Temperature to find (C)
+
+    Returns
+    -------
+    Height (m) of the target temperature
+
+    '''
+    rows = np.arange(h.shape[0])
+    above = p <= pres[:, np.newaxis]
+    with np.errstate(invalid='ignore'):
+        cold = above & (t <= target)
+    k = np.argmax(cold, axis=1)
+    first = (k == np.argmax(above, axis=1)) | (k == 0)
+    k0 = np.maximum(k - 1, 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        f = (t[rows, k0] - target) / (t[rows, k0] - t[rows, k])
+    hght = np.where(first, h[rows, k], h[rows, k0] + f * (h[rows, k] -
+                    h[rows, k0]))
+    top = np.where(np.isfinite(h), h, -np.inf).max(axis=1)
+    return np.where(cold.any(axis=1), hght, top)
+
+
+def _area(h, b, hbot, htop):
+    '''
+    Integrates the positive part of a piecewise linear buoyancy profile
+    between two heights. Layers that are partly positive and layers that
+    are cut by the bottom or top of the integration are split exactly.
+
+    Parameters
+    ----------
+    h : numpy array
+        Heights of the trace levels (m) along the last axis
+    b : numpy array
+        Buoyancy (m/s2) at the trace levels along the last axis
+    hbot : number, numpy array
+        Bottom of the integration (m)
+    htop : number, numpy array
+        Top of the integration (m)
+
+    Returns
+    -------
+    Positive area (J/kg) of the buoyancy profile
+
+    '''
+    hbot = np.asarray(hbot, dtype=np.float64)[..., np.newaxis]
+    htop = np.asarray(htop, dtype=np.float64)[..., np.newaxis]
+    h1, h2 = h[..., :-1], h[..., 1:]
+    b1, b2 = b[..., :-1], b[..., 1:]
+    lo = np.clip(h1, hbot, np.maximum(hbot, htop))
+    hi = np.clip(h2, hbot, np.maximum(hbot, htop))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = np.where(h2 > h1, (b2 - b1) / (h2 - h1), 0.)
+        blo = b1 + slope * (lo - h1)
+        bhi = b1 + slope * (hi - h1)
+        dh = hi - lo
+        area = np.where((blo >= 0) & (bhi >= 0), 0.5 * (blo + bhi) * dh, 0.)
+        part = np.maximum(blo, bhi)**2 / (2 * np.fabs(bhi - blo)) * dh
+        area = np.where((blo >= 0) ^ (bhi >= 0), part, area)
+    area = np.where(np.isfinite(area) & (dh > 0), area, 0.)
+    return area.sum(axis=-1)
+
@@ -1,16 +1,241 @@
 ''' Create the Sounding (Profile) Object '''
 from __future__ import division
+import math
 import numpy as np
 import numpy.ma as ma
-from sharppy.sharptab import utils
+from sharppy.sharptab import utils, thermo
 from sharppy.sharptab.constants import MISSING
+from sharppy.sharptab.utils import _NUMBERS
+
+
+_LN10 = math.log(10.)
+
+
+class _Field(object):
+    '''
+    Descriptor for the data arrays of a Profile. The arrays are views of
+    the data block of the profile (see Profile._field()); assigning a new
+    array stores it in place of the old one and discards the cached views
+    that were built from the old one.
+
+    '''
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, prof, cls):
+        if prof is None:
+            return self
+        return prof._field(self.name)
+
+    def __set__(self, prof, value):
+        prof._set_field(self.name, value)
+
+
+def _writing(method):
+    '''
+    Wraps a method of MaskedArray or ndarray that changes the array in place
+    so that it may write to a data array of a Profile. The read-only flags
+    are lifted for the duration of the call, the arrays cached from the
+    profile data are discarded afterwards, and changes to a derived wind
+    array are written back to the stored pair (see Profile._derived_winds()).
+
+    '''
+    def write(field, *args):
+        cache = field._profile_cache
+        if cache is None:
+            return method(field, *args)
+        arrays = [field]
+        if isinstance(field, ma.MaskedArray):
+            arrays.append(field._mask)
+        for arr in arrays:
+            arr.flags.writeable = True
+        try:
+            return method(field, *args)
+        finally:
+            for arr in arrays:
+                arr.flags.writeable = False
+            cache.clear()
+            if field._write_back is not None:
+                field._write_back()
+    return write
+
+
+def _share_cache(view, obj):
+    '''
+    Carries the profile cache of a data array over to the views taken from
+    it (e.g. prof.tmpc[:5]), so that writes through them discard the cached
+    arrays as well. Arrays that hold their own copy of the data do not get
+    it.
+
+    '''
+    cache = getattr(obj, '_profile_cache', None)
+    if cache is not None and np.may_share_memory(view, obj):
+        view._profile_cache = cache
+        view._write_back = obj._write_back
+
+
+class _FieldArray(ma.MaskedArray):
+    '''
+    Masked data array of a Profile. Its values and mask are read-only but
+    for assignment to its elements (e.g. prof.tmpc[0] += 1.), to its mask
+    and the in-place operators, which write through to the profile and
+    discard the arrays cached from its data (see Profile.reset_cache()).
+    The views taken from it behave the same.
+
+    '''
+    _profile_cache = None
+    _write_back = None
+
+    def _update_from(self, obj):
+        ma.MaskedArray._update_from(self, obj)
+        _share_cache(self, obj)
+
+    __setitem__ = _writing(ma.MaskedArray.__setitem__)
+    __setmask__ = _writing(ma.MaskedArray.__setmask__)
+    mask = property(ma.MaskedArray.mask.fget, __setmask__)
+    __iadd__ = _writing(ma.MaskedArray.__iadd__)
+    __isub__ = _writing(ma.MaskedArray.__isub__)
+    __imul__ = _writing(ma.MaskedArray.__imul__)
+    __idiv__ = _writing(ma.MaskedArray.__idiv__)
+    __itruediv__ = _writing(ma.MaskedArray.__itruediv__)
+    __ifloordiv__ = _writing(ma.MaskedArray.__ifloordiv__)
+    __ipow__ = _writing(ma.MaskedArray.__ipow__)
+
+
+class _NaNFieldArray(np.ndarray):
+    '''
+    Data array of a Profile in the NaN storage mode; the counterpart of
+    _FieldArray. The results of computations on it are plain arrays.
+
+    '''
+    _profile_cache = None
+    _write_back = None
+
+    def __array_finalize__(self, obj):
+        _share_cache(self, obj)
+        if self._profile_cache is None and not self.flags.writeable:
+            # A copy (e.g. by fancy indexing) takes the read-only flag of
+            # the array it was taken from; it is free to be written
+            try:
+                self.flags.writeable = True
+            except ValueError:
+                pass
+
+    def __array_wrap__(self, arr, context=None):
+        if arr is self:
+            return arr
+        return arr.view(np.ndarray) if arr.ndim else arr[()]
+
+    def __repr__(self):
+        return repr(self.view(np.ndarray))
+
+    __setitem__ = _writing(np.ndarray.__setitem__)
+    __iadd__ = _writing(np.ndarray.__iadd__)
+    __isub__ = _writing(np.ndarray.__isub__)
+    __imul__ = _writing(np.ndarray.__imul__)
+    __idiv__ = _writing(np.ndarray.__idiv__)
+    __itruediv__ = _writing(np.ndarray.__itruediv__)
+    __ifloordiv__ = _writing(np.ndarray.__ifloordiv__)
+    __ipow__ = _writing(np.ndarray.__ipow__)
+
+
+def _antiderivatives(coord, x, a, s):
+    '''
+    Evaluates antiderivatives of a data array that is linear in the vertical
+    coordinate, f = a + s*x, at x. For 'logp' (x is log10 of the pressure)
+    these are the antiderivatives of f*dp and f*p*dp; for 'hght' those of
+    f*dz and f*z*dz.
+
+    '''
+    if coord == 'logp':
+        q = 10**x
+        f = a + s * x
+        s = s / _LN10
+        return (f - s) * q, (f / 2. - s / 4.) * q * q
+    return x * (a + s * x / 2.), x * x * (a / 2. + s * x / 3.)
+
+
+def _masked(func, a, b):
+    '''
+    Applies one of the NaN based vector conversions of utils to two masked
+    arrays with the same mask and masks the results like the inputs
+
+    '''
+    mask = ma.getmaskarray(a) | ma.getmaskarray(b)
+    x, y = func(ma.filled(a.astype(np.float64), np.nan),
+                ma.filled(b.astype(np.float64), np.nan))
+    return ma.array(x, mask=mask), ma.array(y, mask=mask.copy())
+
+
+def _differs(a, b):
+    '''
+    Returns whether two data arrays hold different values at each level,
+    taking missing values (masked or NaN) as equal to each other
+
+    '''
+    a_data, b_data = ma.getdata(a), ma.getdata(b)
+    a_bad = ma.getmaskarray(a) | np.isnan(a_data)
+    b_bad = ma.getmaskarray(b) | np.isnan(b_data)
+    return (a_bad != b_bad) | (~a_bad & ~b_bad & (a_data != b_data))
+
+
+def _nan_array(value, missing):
+    '''
+    Returns a new float array of the given data with NaN marking both the
+    masked values and those equal to the missing flag
+
+    '''
+    value = ma.filled(ma.array(value, dtype=np.float64, copy=True), np.nan)
+    value[value == missing] = np.nan
+    return value
+
+
+# Rows of the data block of a Profile. Only one pair of wind arrays is
+# stored, the one the profile was created with; the other is derived.
+_ROWS = {'pres': 0, 'hght': 1, 'tmpc': 2, 'dwpc': 3, 'logp': 4}
+_WINDS = {'u': ('u', 'v'), 'v': ('u', 'v'), 'wdir': ('wdir', 'wspd'),
+          'wspd': ('wdir', 'wspd')}
+# The derived pair of each stored pair of wind arrays, and the conversions
+# to and from it
+_DERIVED = {('wdir', 'wspd'): (('u', 'v'), utils.vec2comp_many,
+                               utils.comp2vec_many),
+            ('u', 'v'): (('wdir', 'wspd'), utils.comp2vec_many,
+                         utils.vec2comp_many)}
 
 
 class Profile(object):
     '''
     The default data class for SHARPpy
 
+    The data are held in one contiguous (field x level) float block, with a
+    matching boolean block of missing values, and the data arrays are views
+    of its rows. Only the wind arrays the profile was created with (u and v,
+    or wdir and wspd) are stored; the other pair is derived on first use.
+    A profile made by from_buffers() holds the caller's arrays as its rows
+    instead.
+
+    The views are read-only so that the arrays cached from the data stay
+    in step with it. Assigning to the elements of a data array or of a view
+    taken from it (and, in the masked storage mode, to its mask) and the
+    in-place operators still write through and discard the cached arrays.
+    Changes to the derived wind arrays are written back to the stored pair;
+    as the two arrays of a pair share their missing levels, a level missing
+    in one of them is missing in both.
+
     '''
+    __slots__ = ('_data', '_mask', '_winds', '_views', '_cache', 'missing',
+                 'masked', 'nan', 'sfc')
+
+    pres = _Field('pres')
+    hght = _Field('hght')
+    tmpc = _Field('tmpc')
+    dwpc = _Field('dwpc')
+    logp = _Field('logp')
+    u = _Field('u')
+    v = _Field('v')
+    wdir = _Field('wdir')
+    wspd = _Field('wspd')
+
     def __init__(self, **kwargs):
         '''
         Create the sounding data object
@@ -46,49 +271,299 @@ class Profile(object):
         Optional Keywords
             missing : number (default: sharppy.sharptab.constants.MISSING)
                 The value of the missing flag
+            nan : bool (default: False)
+                Store the data as float arrays with NaN for missing values
+                instead of masked arrays
 
         Returns
         -------
         A profile object
 
         '''
+        self._cache = {}
+        self._views = {}
         self.missing = kwargs.get('missing', MISSING)
         self.masked = ma.masked
-        self.pres = ma.asanyarray(kwargs.get('pres'))
-        self.hght = ma.asanyarray(kwargs.get('hght'))
-        self.tmpc = ma.asanyarray(kwargs.get('tmpc'))
-        self.dwpc = ma.asanyarray(kwargs.get('dwpc'))
-        self.pres[self.pres == self.missing] = ma.masked
-        self.hght[self.hght == self.missing] = ma.masked
-        self.tmpc[self.tmpc == self.missing] = ma.masked
-        self.dwpc[self.dwpc == self.missing] = ma.masked
-        self.logp = np.log10(self.pres.copy())
+        self.nan = kwargs.get('nan', False)
         if 'wdir' in kwargs:
-            self.wdir = ma.asanyarray(kwargs.get('wdir'))
-            self.wspd = ma.asanyarray(kwargs.get('wspd'))
-            self.wdir[self.wdir == self.missing] = ma.masked
-            self.wspd[self.wspd == self.missing] = ma.masked
-            self.wdir[self.wspd.mask] = ma.masked
-            self.wspd[self.wdir.mask] = ma.masked
-            self.u, self.v = utils.vec2comp(self.wdir, self.wspd)
-        elif 'u' in kwargs:
-            self.u = ma.asanyarray(kwargs.get('u'))
-            self.v = ma.asanyarray(kwargs.get('v'))
-            self.u[self.u == self.missing] = ma.masked
-            self.v[self.v == self.missing] = ma.masked
-            self.u[self.v.mask] = ma.masked
-            self.v[self.u.mask] = ma.masked
-            self.wdir, self.wspd = utils.comp2vec(self.u, self.v)
-        self.pres.set_fill_value(self.missing)
-        self.hght.set_fill_value(self.missing)
-        self.tmpc.set_fill_value(self.missing)
-        self.dwpc.set_fill_value(self.missing)
-        self.wdir.set_fill_value(self.missing)
-        self.wspd.set_fill_value(self.missing)
-        self.u.set_fill_value(self.missing)
-        self.v.set_fill_value(self.missing)
+            self._winds = ('wdir', 'wspd')
+        else:
+            self._winds = ('u', 'v')
+        names = ['pres', 'hght', 'tmpc', 'dwpc', None] + list(self._winds)
+        size = np.size(kwargs.get('pres'))
+
+        # Copy the data into the block and flag the missing values
+        data = np.empty((len(names), size))
+        mask = np.zeros((len(names), size), dtype=bool)
+        for i, name in enumerate(names):
+            if name is None:
+                continue
+            value = kwargs.get(name, self.missing)
+            data[i] = ma.getdata(value)
+            mask[i] = ma.getmaskarray(value)
+            mask[i] |= data[i] == self.missing
+        mask[5] |= mask[6]
+        mask[6] = mask[5]
+        mask[4] = mask[0] | ~(data[0] > 0)
+        data[4] = np.nan
+        np.log10(data[0], out=data[4], where=~mask[4])
+        if self.nan:
+            data[mask] = np.nan
+            mask = None
+        self._data = data
+        self._mask = mask
         self.sfc = self.get_sfc()
 
+    @classmethod
+    def from_buffers(cls, missing=MISSING, nan=False, **buffers):
+        '''
+        Create a sounding data object that wraps existing arrays instead of
+        copying them, e.g. the rows of a numpy.memmap of a sounding archive.
+        The arrays are used as the data arrays of the profile as they are,
+        so they are never modified by the profile; only the missing-value
+        masks and the log10 of the pressure are built, in one pass over
+        each array.
+
+        Float32 and float64 arrays are wrapped without copying; arrays of
+        other types are converted to float64. In the NaN storage mode an
+        array that holds missing values is copied with NaN in their place,
+        since the source is left untouched. Note that assigning to the
+        elements of a wrapped array (e.g. prof.tmpc[0] = 20.) writes to the
+        caller's array, and that changes the caller makes to the arrays
+        directly need a call to reset_cache().
+
+        Parameters
+        ----------
+        pres, hght, tmpc, dwpc : 1-D arrays
+            The pressure (hPa), height (m), temperature (C) and dewpoint (C)
+        wdir, wspd OR u, v : 1-D arrays (optional)
+            The wind direction and speed or its U and V components
+        missing : number (default: sharppy.sharptab.constants.MISSING)
+            The value of the missing flag
+        nan : bool (default: False)
+            Store the data as float arrays with NaN for missing values
+            instead of masked arrays
+
+        Returns
+        -------
+        A profile object
+
+        '''
+        prof = cls.__new__(cls)
+        prof._cache = {}
+        prof._views = {}
+        prof.missing = missing
+        prof.masked = ma.masked
+        prof.nan = nan
+        if 'wdir' in buffers:
+            prof._winds = ('wdir', 'wspd')
+        else:
+            prof._winds = ('u', 'v')
+        names = ['pres', 'hght', 'tmpc', 'dwpc', None] + list(prof._winds)
+        size = np.size(buffers['pres'])
+
+        data = []
+        mask = np.empty((len(names), size), dtype=bool)
+        for i, name in enumerate(names):
+            if name is None:
+                data.append(np.full(size, np.nan))
+                continue
+            if name not in buffers:
+                data.append(np.empty(size))
+                data[i].fill(missing)
+                mask[i] = True
+                continue
+            value = buffers[name]
+            row = np.asarray(ma.getdata(value))
+            if row.dtype not in (np.float32, np.float64):
+                row = row.astype(np.float64)
+            if row.shape != (size,):
+                raise ValueError('%s must be a 1-D array of the same size '
+                                 'as pres' % name)
+            np.equal(row, missing, out=mask[i])
+            if ma.getmask(value) is not ma.nomask:
+                mask[i] |= ma.getmaskarray(value)
+            data.append(row)
+        mask[5] |= mask[6]
+        mask[6] = mask[5]
+        mask[4] = mask[0] | ~(data[0] > 0)
+        np.log10(data[0], out=data[4], where=~mask[4])
+        if nan:
+            for i, row in enumerate(data):
+                if i != 4 and mask[i].any():
+                    data[i] = np.where(mask[i], np.nan, row).astype(row.dtype)
+            mask = None
+        prof._data = data
+        prof._mask = mask
+        prof.sfc = prof.get_sfc()
+        return prof
+
+    def __getstate__(self):
+        '''
+        Returns the state of the profile for pickling. The cached views and
+        arrays are left out and rebuilt on first use.
+
+        '''
+        return dict((name, getattr(self, name)) for name in self.__slots__
+                    if name not in ('_views', '_cache'))
+
+    def __setstate__(self, state):
+        '''
+        Restores the state of the profile when unpickling
+
+        '''
+        for name, value in state.items():
+            setattr(self, name, value)
+        self._views = {}
+        self._cache = {}
+
+    def _field(self, name):
+        '''
+        Returns a data array of the profile
+
+        '''
+        try:
+            return self._views[name]
+        except KeyError:
+            pass
+        if name in _WINDS and name not in self._winds:
+            return self._derived_winds()[name]
+        i = _ROWS[name] if name in _ROWS else 5 + self._winds.index(name)
+        mask = None if self.nan else self._mask[i]
+        view = self._view(self._data[i], mask)
+        self._views[name] = view
+        return view
+
+    def _view(self, data, mask, write_back=None):
+        '''
+        Returns a read-only data array of the profile over the given values
+        and mask (None in the NaN storage mode). Writes through its methods
+        discard the cached arrays and then call write_back, if given.
+
+        '''
+        if self.nan:
+            view = data.view(_NaNFieldArray)
+        else:
+            view = _FieldArray(data, mask=mask.view(), copy=False,
+                               fill_value=self.missing)
+            view._sharedmask = False
+            view._mask.flags.writeable = False
+        view._profile_cache = self._cache
+        view._write_back = write_back
+        view.flags.writeable = False
+        return view
+
+    def _convert_winds(self, func, a, b):
+        '''
+        Converts a pair of wind arrays into the other pair with one of the
+        vector conversions of utils
+
+        '''
+        if self.nan:
+            return func(a, b)
+        return _masked(func, a, b)
+
+    def _derived_winds(self):
+        '''
+        Returns the wind arrays that are not stored in the data block. They
+        are cached like the derived arrays, and changes made to them in
+        place are written back to the stored pair at the changed levels.
+
+        '''
+        key = ('derived', 'winds')
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+        a, b = [self._field(name) for name in self._winds]
+        names, convert, invert = _DERIVED[self._winds]
+        x, y = self._convert_winds(convert, a, b)
+
+        def write_back():
+            x, y = views
+            old_x, old_y = self._convert_winds(convert, a, b)
+            changed = _differs(x, old_x) | _differs(y, old_y)
+            if changed.any():
+                a[changed], b[changed] = self._convert_winds(
+                    invert, x[changed], y[changed])
+
+        views = [self._view(ma.getdata(value), ma.getmask(value), write_back)
+                 for value in (x, y)]
+        self._cache[key] = dict(zip(names, views))
+        return self._cache[key]
+
+    def _set_field(self, name, value):
+        '''
+        Replaces a data array of the profile. The new array is copied into
+        its own row, so the data block is left as it was. Assigning one of
+        the derived wind arrays makes its pair the stored one.
+
+        '''
+        values = {name: value}
+        if name in _WINDS:
+            if name not in self._winds:
+                other = [n for n in _WINDS[name] if n != name][0]
+                values[other] = self._field(other)
+            winds = _WINDS[name]
+        else:
+            winds = self._winds
+        data = list(self._data)
+        mask = None if self.nan else list(self._mask)
+        for key, value in values.items():
+            i = _ROWS[key] if key in _ROWS else 5 + winds.index(key)
+            value = ma.array(value, dtype=np.float64, copy=True)
+            if self.nan:
+                data[i] = value.filled(np.nan)
+            else:
+                data[i] = value.data
+                mask[i] = ma.getmaskarray(value)
+        self._data = data
+        self._mask = mask
+        self._winds = winds
+        self._views.clear()
+        self.reset_cache()
+
+    def to_masked(self):
+        '''
+        Returns a copy of the profile that stores its data as masked arrays,
+        for callers that expect them (see the 'nan' keyword of __init__())
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        A profile object
+
+        '''
+        return self._convert(False)
+
+    def to_nan(self):
+        '''
+        Returns a copy of the profile that stores its data as float arrays
+        with NaN for missing values (see the 'nan' keyword of __init__())
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        A profile object
+
+        '''
+        return self._convert(True)
+
+    def _convert(self, nan):
+        '''
+        Copies the profile into the masked or the NaN storage mode
+
+        '''
+        kwargs = dict((name, ma.masked_invalid(getattr(self, name)))
+                      for name in ['pres', 'hght', 'tmpc', 'dwpc'] +
+                      list(self._winds))
+        return Profile(missing=self.missing, nan=nan, **kwargs)
 
     def get_sfc(self):
         '''
@@ -105,5 +580,537 @@ class Profile(object):
         Index of the surface
 
         '''
-        return np.where(~self.tmpc.mask)[0].min()
+        return np.flatnonzero(self.valid('tmpc')).min()
+
+    def valid(self, *names):
+        '''
+        Returns whether each level holds a value in all of the given data
+        arrays, i.e. is neither masked nor NaN. This works for both storage
+        modes of the profile. The array is cached like those of
+        valid_levels().
+
+        Parameters
+        ----------
+        names : strings
+            Names of the data arrays (e.g. 'pres', 'tmpc')
+
+        Returns
+        -------
+        Boolean array that is True at the valid levels
+
+        '''
+        key = ('valid',) + names
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+        valid = None
+        for name in names:
+            value = getattr(self, name)
+            bad = np.isnan(ma.getdata(value))
+            bad |= ma.getmaskarray(value)
+            valid = ~bad if valid is None else valid & ~bad
+        valid.flags.writeable = False
+        self._cache[key] = valid
+        return valid
+
+    @property
+    def theta(self):
+        '''
+        Potential temperature (C) of each level (see derived())
+
+        '''
+        return self.derived('theta', thermo.theta, 'pres', 'tmpc')
+
+    @property
+    def thetae(self):
+        '''
+        Equivalent potential temperature (C) of each level (see derived())
+
+        '''
+        return self.derived('thetae', thermo.thetae, 'pres', 'tmpc', 'dwpc')
+
+    @property
+    def wetbulb(self):
+        '''
+        Wetbulb temperature (C) of each level (see derived())
+
+        '''
+        return self.derived('wetbulb', thermo.wetbulb, 'pres', 'tmpc',
+                            'dwpc')
+
+    @property
+    def wvmr(self):
+        '''
+        Water vapor mixing ratio (g/kg) of each level (see derived())
+
+        '''
+        return self.derived('wvmr', thermo.mixratio, 'pres', 'dwpc')
+
+    @property
+    def relh(self):
+        '''
+        Relative humidity (%) of each level (see derived())
+
+        '''
+        return self.derived('relh', thermo.relh, 'pres', 'tmpc', 'dwpc')
+
+    @property
+    def vtmp(self):
+        '''
+        Virtual temperature (C) of each level (see derived())
+
+        '''
+        return self.derived('vtmp', thermo.virtemp, 'pres', 'tmpc', 'dwpc')
+
+    def derived(self, name, func, *fields):
+        '''
+        Returns a data array derived from other data arrays of the profile.
+        It is computed on first use, with a single vectorized call on the
+        levels where all of the inputs are valid, and cached until the data
+        changes (see reset_cache()). The derived arrays are masked where any
+        input is and must not be changed in place.
+
+        Parameters
+        ----------
+        name : string
+            Name under which the derived array is cached
+        func : function
+            Function computing the derived array (e.g. thermo.theta)
+        fields : strings
+            Names of the data arrays passed to func (e.g. 'pres', 'tmpc')
+
+        Returns
+        -------
+        The derived data array
+
+        '''
+        key = ('derived', name)
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+        args = [ma.getdata(getattr(self, field)) for field in fields]
+        valid = self.valid(*fields)
+        mask = ~valid
+        data = np.empty(mask.shape)
+        data[mask] = np.nan if self.nan else self.missing
+        if valid.any():
+            data[valid] = ma.getdata(func(*[arg[valid] for arg in args]))
+        data.flags.writeable = False
+        if self.nan:
+            field = data
+        else:
+            field = ma.array(data, mask=mask, fill_value=self.missing)
+        self._cache[key] = field
+        return field
+
+    def reset_cache(self):
+        '''
+        Discards the cached views of the profile data. This happens
+        automatically when a data array is replaced or changed in place;
+        call it after changing an array wrapped by from_buffers() directly.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+
+        '''
+        self._cache.clear()
+
+    def valid_levels(self, name, coord='logp'):
+        '''
+        Returns a vertical coordinate and the values of a data array at the
+        levels where both are valid, ordered by ascending coordinate as
+        numpy.interp requires. The arrays are built on first use and cached
+        until the data changes (see reset_cache()). Data arrays with the
+        same valid levels share the same coordinate array.
+
+        Parameters
+        ----------
+        name : string
+            Name of the data array (e.g. 'tmpc')
+        coord : string (optional; default 'logp')
+            Vertical coordinate: 'logp' (log10 of the pressure) or 'hght'
+
+        Returns
+        -------
+        x : numpy array
+            Vertical coordinate of the valid levels
+        field : numpy array
+            Values of the data array at the valid levels
+
+        '''
+        key = (coord, name)
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+        x = ma.getdata(getattr(self, coord))
+        field = ma.getdata(getattr(self, name))
+        valid = self.valid(coord, name)
+        if coord == 'logp':
+            x = x[::-1]
+            field = field[::-1]
+            valid = valid[::-1]
+        x = x[valid]
+        field = field[valid]
+        for other_key, other in self._cache.items():
+            if other_key[0] == coord and np.array_equal(x, other[0]):
+                x = other[0]
+                break
+        x.flags.writeable = False
+        field.flags.writeable = False
+        self._cache[key] = (x, field)
+        return x, field
+
+    def filled_levels(self, name, coord='logp'):
+        '''
+        Returns the values of a data array at every level with a valid
+        vertical coordinate, ordered by ascending coordinate. Missing values
+        between valid ones are filled by linear interpolation in the
+        coordinate and missing values beyond them are NaN, so interpolating
+        the result linearly is the same as interpolating the valid levels.
+        The array is cached like those of valid_levels().
+
+        Parameters
+        ----------
+        name : string
+            Name of the data array (e.g. 'tmpc')
+        coord : string (optional; default 'logp')
+            Vertical coordinate: 'logp' (log10 of the pressure) or 'hght'
+
+        Returns
+        -------
+        Values of the data array at the levels of valid_levels(coord, coord)
+
+        '''
+        key = ('filled', coord, name)
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+        grid = self.valid_levels(coord, coord)[0]
+        x, field = self.valid_levels(name, coord)
+        if x is grid:
+            filled = field
+        else:
+            filled = np.interp(grid, x, field, left=np.nan, right=np.nan)
+            filled.flags.writeable = False
+        self._cache[key] = filled
+        return filled
+
+    def integrals(self, name, coord='logp'):
+        '''
+        Returns the cumulative integrals of a data array over the valid
+        levels (see valid_levels()), in order of ascending coordinate and
+        treating the data array as linear in the coordinate between levels.
+        For 'logp' these are the integrals of f*dp and f*p*dp, starting at
+        the top of the profile; for 'hght' those of f*dz and f*z*dz,
+        starting at the bottom. The arrays are cached like those of
+        valid_levels(); see integrate() for the integrals up to arbitrary
+        levels.
+
+        Parameters
+        ----------
+        name : string
+            Name of the data array (e.g. 'u')
+        coord : string (optional; default 'logp')
+            Vertical coordinate: 'logp' (log10 of the pressure) or 'hght'
+
+        Returns
+        -------
+        x : numpy array
+            Vertical coordinate of the valid levels
+        cum : numpy array
+            Cumulative integrals at the valid levels with shape (2, len(x))
+
+        '''
+        return self._integral_table(name, coord)[:2]
+
+    def integrate(self, name, level, coord='logp'):
+        '''
+        Evaluates the cumulative integrals of a data array (see integrals())
+        at the given levels. The integral over a layer is the difference
+        between its values at the ends of the layer, so any number of layers
+        are answered from the same cached sums. Levels beyond the valid
+        levels of the data array are NaN.
+
+        Parameters
+        ----------
+        name : string
+            Name of the data array (e.g. 'u')
+        level : number, numpy array
+            Pressure (hPa) or height (m) of the levels
+        coord : string (optional; default 'logp')
+            Vertical coordinate: 'logp' (log10 of the pressure) or 'hght'
+
+        Returns
+        -------
+        level : numpy array
+            The levels, NaN where they are beyond the valid levels
+        cum : numpy array
+            Cumulative integrals at the levels with shape (2,) + level.shape
+
+        '''
+        x, cum, a, s, const = self._integral_table(name, coord)
+        if isinstance(level, _NUMBERS) and x.size > 1:
+            if coord == 'logp':
+                xq = math.log10(level) if level > 0 else np.nan
+            else:
+                xq = float(level)
+            if not x[0] <= xq <= x[-1]:
+                return np.nan, np.array([np.nan, np.nan])
+            k = min(int(np.searchsorted(x, xq, side='right')) - 1, x.size - 2)
+            g0, g1 = _antiderivatives(coord, xq, a[k], s[k])
+            return ((10**xq if coord == 'logp' else xq),
+                    np.array([g0 + const[0, k], g1 + const[1, k]]))
+        level = np.asarray(level, dtype=np.float64)
+        if x.size < 2:
+            return (np.full(level.shape, np.nan),
+                    np.full((2,) + level.shape, np.nan))
+        shape = level.shape
+        level = level.reshape(-1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            xq = np.log10(level) if coord == 'logp' else level
+            outside = ~((xq >= x[0]) & (xq <= x[-1]))
+        xq = np.where(outside, x[0], xq)
+        k = np.searchsorted(x, xq, side='right') - 1
+        np.minimum(k, x.size - 2, out=k)
+        g0, g1 = _antiderivatives(coord, xq, a[k], s[k])
+        cum = const[:, k]
+        cum[0] += g0
+        cum[1] += g1
+        cum[:, outside] = np.nan
+        xq[outside] = np.nan
+        level = 10**xq if coord == 'logp' else xq
+        return level.reshape(shape), cum.reshape((2,) + shape)
+
+    def _integral_table(self, name, coord):
+        '''
+        Builds and caches the cumulative integrals of a data array along
+        with the coefficients of the linear segments between the levels
+        and the constants that turn their antiderivatives into cumulative
+        integrals.
 
+        '''
+        key = ('integrals', coord, name)
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+        x, field = self.valid_levels(name, coord)
+        dx = np.diff(x)
+        s = np.divide(np.diff(field), dx, out=np.zeros(dx.shape),
+                      where=dx != 0)
+        a = field[:-1] - s * x[:-1]
+        lo = np.array(_antiderivatives(coord, x[:-1], a, s))
+        hi = np.array(_antiderivatives(coord, x[1:], a, s))
+        cum = np.zeros((2, x.size))
+        np.cumsum(hi - lo, axis=1, out=cum[:, 1:])
+        const = cum[:, :-1] - lo
+        for arr in (cum, a, s, const):
+            arr.flags.writeable = False
+        self._cache[key] = (x, cum, a, s, const)
+        return self._cache[key]
+
+
+class ProfileCollection(object):
+    '''
+    A batch of soundings for running SHARPpy over many profiles at once,
+    e.g. the members of an ensemble or the columns of a model grid. The
+    data arrays are (profile x level) masked arrays; profiles with fewer
+    levels are padded with masked levels at the top. The thermo routines
+    work on these arrays directly, and the interp and winds routines (but
+    for helicity_many()) as well as the layer-mean routines of parcel
+    accept a collection in place of a profile and return one value per
+    profile.
+
+    Levels passed to the interp routines along with a collection are given
+    per profile along the first axis: a number, or an array with one value
+    per profile, gives one result per profile; a (profile x k) or (1 x k)
+    array gives k results per profile. Results are masked where a profile
+    does not reach the level.
+
+    '''
+    def __init__(self, **kwargs):
+        '''
+        Create the collection of soundings
+
+        Parameters
+        ----------
+        Mandatory Keywords
+            pres, hght, tmpc, dwpc : 2-D array_like, or sequence of 1-D
+                The pressure (hPa), height (m), temperature (C) and dew
+                point (C) of each profile, either as (profile x level)
+                arrays or as one array per profile, possibly of different
+                lengths
+
+        Optional Keyword Pairs (must use one or the other)
+            wdir, wspd OR u, v : 2-D array_like, or sequence of 1-D
+                The wind direction and speed or its U and V components
+
+        Optional Keywords
+            missing : number (default: sharppy.sharptab.constants.MISSING)
+                The value of the missing flag; NaN values are treated as
+                missing as well
+
+        Returns
+        -------
+        A profile collection object
+
+        '''
+        self.missing = kwargs.get('missing', MISSING)
+        self.masked = ma.masked
+        if 'wdir' in kwargs:
+            winds = ('wdir', 'wspd')
+        else:
+            winds = ('u', 'v')
+        names = ['pres', 'hght', 'tmpc', 'dwpc'] + list(winds)
+        pres = kwargs.get('pres')
+        nprof = len(pres)
+        if isinstance(pres, np.ndarray) and pres.ndim == 2:
+            nlev = max(pres.shape[1], 1)
+        else:
+            nlev = max([np.size(row) for row in pres] + [1])
+
+        # Copy the data into padded blocks and flag the missing values
+        data = np.full((len(names), nprof, nlev), self.missing, dtype=float)
+        mask = np.zeros((len(names), nprof, nlev), dtype=bool)
+        for i, name in enumerate(names):
+            field = kwargs.get(name)
+            if field is None:
+                continue
+            if isinstance(field, np.ndarray) and field.ndim == 2:
+                data[i, :, :field.shape[1]] = ma.getdata(field)
+                mask[i, :, :field.shape[1]] = ma.getmaskarray(field)
+                continue
+            for j, row in enumerate(field):
+                n = np.size(row)
+                data[i, j, :n] = ma.getdata(row)
+                if ma.getmask(row) is not ma.nomask:
+                    mask[i, j, :n] = ma.getmask(row)
+        mask |= data == self.missing
+        mask |= np.isnan(data)
+        mask[4] |= mask[5]
+        mask[5] = mask[4]
+        for i, name in enumerate(names):
+            setattr(self, name, ma.array(data[i], mask=mask[i],
+                                         fill_value=self.missing))
+        self.logp = ma.log10(ma.masked_less_equal(self.pres, 0))
+        self.logp.set_fill_value(self.missing)
+        if winds == ('wdir', 'wspd'):
+            self.u, self.v = _masked(utils.vec2comp_many, self.wdir,
+                                     self.wspd)
+        else:
+            self.wdir, self.wspd = _masked(utils.comp2vec_many, self.u,
+                                           self.v)
+        for name in [n for n in ('u', 'v', 'wdir', 'wspd') if n not in winds]:
+            getattr(self, name).set_fill_value(self.missing)
+        self._winds = winds
+
+        valid = self.valid('pres')
+        last = nlev - np.argmax(valid[:, ::-1], axis=1)
+        self.nlevels = np.where(valid.any(axis=1), last, 0)
+        self.sfc = self.get_sfc()
+
+    @classmethod
+    def from_profiles(cls, profiles):
+        '''
+        Create a collection from a sequence of profile objects
+
+        Parameters
+        ----------
+        profiles : sequence of profile objects
+            The profiles to collect; they all have to share the missing
+            flag of the first one
+
+        Returns
+        -------
+        A profile collection object
+
+        '''
+        profiles = list(profiles)
+        winds = profiles[0]._winds if profiles else ('u', 'v')
+        kwargs = dict((name, [getattr(p, name) for p in profiles])
+                      for name in ['pres', 'hght', 'tmpc', 'dwpc'] +
+                      list(winds))
+        if profiles:
+            kwargs['missing'] = profiles[0].missing
+        return cls(**kwargs)
+
+    def __len__(self):
+        return self.pres.shape[0]
+
+    def __getitem__(self, i):
+        '''
+        Returns one profile of the collection as a profile object
+
+        '''
+        if not -len(self) <= i < len(self):
+            raise IndexError('profile index out of range')
+        n = self.nlevels[i]
+        kwargs = dict((name, getattr(self, name)[i, :n])
+                      for name in ['pres', 'hght', 'tmpc', 'dwpc'] +
+                      list(self._winds))
+        return Profile(missing=self.missing, **kwargs)
+
+    def get_sfc(self):
+        '''
+        Returns the index of the surface of each profile, the lowest level
+        in which a temperature is reported (see Profile.get_sfc())
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        Index of the surface of each profile
+
+        '''
+        return np.argmax(self.valid('tmpc'), axis=1)
+
+    def sfc_values(self, name):
+        '''
+        Returns the value of a data array at the surface of each profile,
+        e.g. sfc_values('hght') for the surface heights used by
+        interp.to_agl() and interp.to_msl()
+
+        Parameters
+        ----------
+        name : string
+            Name of the data array (e.g. 'pres')
+
+        Returns
+        -------
+        Masked array with one value per profile
+
+        '''
+        return getattr(self, name)[np.arange(len(self)), self.sfc]
+
+    def valid(self, *names):
+        '''
+        Returns whether each level of each profile holds a value in all of
+        the given data arrays (see Profile.valid())
+
+        Parameters
+        ----------
+        names : strings
+            Names of the data arrays (e.g. 'pres', 'tmpc')
+
+        Returns
+        -------
+        Boolean (profile x level) array that is True at the valid levels
+
+        '''
+        valid = np.ones(self.pres.shape, dtype=bool)
+        for name in names:
+            value = getattr(self, name)
+            valid &= ~ma.getmaskarray(value)
+            valid &= ~np.isnan(ma.getdata(value))
+        return valid
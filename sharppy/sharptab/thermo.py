@@ -1,14 +1,18 @@
 ''' Thermodynamic Library '''
 from __future__ import division
+import math
 import numpy as np
 import numpy.ma as ma
+from sharppy.sharptab import adiabats, jit
 from sharppy.sharptab.constants import *
+from sharppy.sharptab.utils import _NUMBERS
 
 __all__ = ['drylift', 'thalvl', 'lcltemp', 'theta', 'wobf']
 __all__ += ['satlift', 'wetlift', 'lifted', 'vappres', 'mixratio']
 __all__ += ['temp_at_mixrat', 'wetbulb', 'thetaw', 'thetae']
 __all__ += ['virtemp', 'relh']
 __all__ += ['ftoc', 'ctof', 'ctok', 'ktoc', 'ftok', 'ktof']
+__all__ += ['set_backend', 'get_backend', 'Workspace']
 
 
 # Constants Used
@@ -16,6 +20,130 @@ c1 = 0.0498646455 ; c2 = 2.4082965 ; c3 = 7.07475
 c4 = 38.9114 ; c5 = 0.0915 ; c6 = 1.2035
 eps = 0.62197
 
+# Implementation used by the iterative and polynomial kernels
+_backend = 'numpy'
+
+
+def set_backend(name):
+    '''
+    Selects the implementation of the thermodynamic kernels (wobf, vappres,
+    mixratio, lcltemp, satlift, temp_at_mixrat and wetlift). The 'numba'
+    backend compiles the kernels with Numba on first use; if Numba is not
+    installed, a warning is issued and the NumPy implementation is used.
+
+    Parameters
+    ----------
+    name : string
+        'numpy', 'numba', or 'auto' (Numba when installed, otherwise NumPy)
+
+    Returns
+    -------
+    None
+
+    '''
+    global _backend
+    if name not in ('numpy', 'numba', 'auto'):
+        raise ValueError('Unknown backend: %s' % name)
+    if name == 'auto':
+        name = 'numba' if jit.HAS_NUMBA else 'numpy'
+    if name == 'numba' and not jit.HAS_NUMBA:
+        import warnings
+        warnings.warn('numba is not installed; using the numpy backend')
+        name = 'numpy'
+    _backend = name
+
+
+def get_backend():
+    '''
+    Returns the name of the backend used by the thermodynamic kernels
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    'numpy' or 'numba'
+
+    '''
+    return _backend
+
+
+class Workspace(object):
+    '''
+    Pool of scratch arrays for the thermodynamic kernels. The kernels that
+    take an 'out' array compute in place, and any temporaries they need
+    are taken from the workspace (ws) passed with it. Reusing the same out
+    arrays and workspace for every chunk of a batch computation avoids
+    allocating new arrays on each call.
+
+    '''
+    def __init__(self):
+        '''
+        Create an empty workspace
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        A workspace object
+
+        '''
+        self.buffers = {}
+
+    def get(self, name, shape, dtype=np.float64):
+        '''
+        Returns the scratch array stored under the given name. A new array
+        is allocated if none exists yet or if the stored one has a
+        different shape or type.
+
+        Parameters
+        ----------
+        name : string
+            Name of the scratch array
+        shape : tuple
+            Shape of the scratch array
+        dtype : numpy dtype (optional; default np.float64)
+            Type of the scratch array
+
+        Returns
+        -------
+        Uninitialized numpy array
+
+        '''
+        buf = self.buffers.get(name)
+        if buf is None or buf.shape != shape or buf.dtype != dtype:
+            buf = np.empty(shape, dtype=dtype)
+            self.buffers[name] = buf
+        return buf
+
+
+def _scratch(ws, out, name, dtype=np.float64):
+    '''
+    Returns a scratch array shaped like out, taken from the workspace ws
+    when one is given
+
+    '''
+    if ws is None:
+        return np.empty(out.shape, dtype=dtype)
+    return ws.get(name, out.shape, dtype)
+
+
+def _masked(out, *args):
+    '''
+    Returns out, masked wherever any of the arguments is masked
+
+    '''
+    mask = ma.nomask
+    for arg in args:
+        mask = mask | ma.getmask(arg)
+    if not np.any(mask):
+        return out
+    return ma.array(out, mask=np.broadcast_to(mask, out.shape))
+
+
 def drylift(p, t, td):
     '''
     Lifts a parcel to the LCL and returns its new level and temperature.
@@ -42,7 +170,7 @@ def drylift(p, t, td):
     return p2, t2
 
 
-def lcltemp(t, td):
+def lcltemp(t, td, out=None, ws=None):
     '''
     Returns the temperature (C) of a parcel when raised to its LCL.
 
@@ -52,18 +180,49 @@ def lcltemp(t, td):
         Temperature of the parcel (C)
     td : number, numpy array
         Dewpoint temperature of the parcel (C)
+    out : numpy array (optional)
+        Preallocated array in which to store the result
+    ws : Workspace (optional)
+        Scratch arrays used with out
 
     Returns
     -------
     Temperature (C) of the parcel at it's LCL.
 
     '''
+    if _backend == 'numba' and not (isinstance(t, _NUMBERS) and
+                                    isinstance(td, _NUMBERS)):
+        return jit.apply('lcltemp', t, td, out=out)
+    if out is not None:
+        return _lcltemp_out(t, td, out, ws)
     s = t - td
     dlt = s * (1.2185 + 0.001278 * t + s * (-0.00219 + 1.173e-5 * s -
         0.0000052 * t))
     return t - dlt
 
 
+def _lcltemp_out(t, td, out, ws):
+    '''
+    In place implementation of lcltemp()
+
+    '''
+    t_, td_ = ma.getdata(t), ma.getdata(td)
+    s = _scratch(ws, out, 'lcltemp.s')
+    tmp = _scratch(ws, out, 'lcltemp.tmp')
+    np.subtract(t_, td_, out=s)
+    np.multiply(s, 1.173e-5, out=out)
+    out += -0.00219
+    np.multiply(t_, 0.0000052, out=tmp)
+    out -= tmp
+    out *= s
+    np.multiply(t_, 0.001278, out=tmp)
+    tmp += 1.2185
+    out += tmp
+    out *= s
+    np.subtract(t_, out, out=out)
+    return _masked(out, t, td)
+
+
 def thalvl(theta, t):
     '''
     Returns the level (hPa) of a parcel.
@@ -85,7 +244,7 @@ def thalvl(theta, t):
     return 1000. / ((theta / t)**(1./ROCP))
 
 
-def theta(p, t, p2=1000.):
+def theta(p, t, p2=1000., out=None, ws=None):
     '''
     Returns the potential temperature (C) of a parcel.
 
@@ -97,15 +256,46 @@ def theta(p, t, p2=1000.):
         Temperature of the parcel (C)
     p2 : number, numpy array (default 1000.)
         Reference pressure level (hPa)
+    out : numpy array (optional)
+        Preallocated array in which to store the result
+    ws : Workspace (optional)
+        Scratch arrays used with out
 
     Returns
     -------
     Potential temperature (C)
 
     '''
-    p = np.ma.asanyarray(p)
-    p2 = p2 * np.ones(p.shape, dtype=np.float64)
-    return ((t + ZEROCNK) * (p2 / p)**ROCP) - ZEROCNK
+    if out is None and isinstance(p, _NUMBERS) and \
+            isinstance(t, _NUMBERS) and isinstance(p2, _NUMBERS):
+        if p == 0:
+            return ma.masked
+        return ((t + ZEROCNK) * (p2 / p)**ROCP) - ZEROCNK
+    if out is None:
+        p = np.asanyarray(p)
+        with np.errstate(divide='ignore'):
+            thta = ((t + ZEROCNK) * (p2 / p)**ROCP) - ZEROCNK
+        return _mask_zero(thta, p)
+    tk = _scratch(ws, out, 'theta.tk')
+    with np.errstate(divide='ignore'):
+        np.divide(ma.getdata(p2), ma.getdata(p), out=out)
+    np.power(out, ROCP, out=out)
+    np.add(ma.getdata(t), ZEROCNK, out=tk)
+    out *= tk
+    out -= ZEROCNK
+    return _mask_zero(_masked(out, p, t, p2), p)
+
+
+def _mask_zero(thta, p):
+    '''
+    Returns the potential temperature thta, masked where the pressure p is
+    zero
+
+    '''
+    zero = ma.getdata(p) == 0
+    if not zero.any():
+        return thta
+    return ma.masked_where(np.broadcast_to(zero, np.shape(thta)), thta)
 
 
 def thetaw(p, t, td):
@@ -114,11 +304,11 @@ def thetaw(p, t, td):
 
     Parameters
     ----------
-    p : number
+    p : number, numpy array
         The pressure of the parcel (hPa)
-    t : number
+    t : number, numpy array
         Temperature of the parcel (C)
-    td : number
+    td : number, numpy array
         Dew point of parcel (C)
 
     Returns
@@ -136,11 +326,11 @@ def thetae(p, t, td):
 
     Parameters
     ----------
-    p : number
+    p : number, numpy array
         The pressure of the parcel (hPa)
-    t : number
+    t : number, numpy array
         Temperature of the parcel (C)
-    td : number
+    td : number, numpy array
         Dew point of parcel (C)
 
     Returns
@@ -152,51 +342,88 @@ def thetae(p, t, td):
     return theta(100., wetlift(p2, t2, 100.), 1000.)
 
 
-def virtemp(p, t, td):
+def virtemp(p, t, td, out=None, ws=None):
     '''
     Returns the virtual temperature (C) of a parcel.
 
     Parameters
     ----------
-    p : number
+    p : number, numpy array
         The pressure of the parcel (hPa)
-    t : number
+    t : number, numpy array
         Temperature of the parcel (C)
-    td : number
+    td : number, numpy array
         Dew point of parcel (C)
+    out : numpy array (optional)
+        Preallocated array in which to store the result
+    ws : Workspace (optional)
+        Scratch arrays used with out
 
     Returns
     -------
     Virtual temperature (C)
 
     '''
+    if out is not None:
+        return _virtemp_out(p, t, td, out, ws)
     tk = t + ZEROCNK
     w = 0.001 * mixratio(p, td)
     return (tk * (1. + w / eps) / (1. + w)) - ZEROCNK
 
 
-def relh(p, t, td):
+def _virtemp_out(p, t, td, out, ws):
+    '''
+    In place implementation of virtemp()
+
+    '''
+    w = ma.getdata(mixratio(ma.getdata(p), ma.getdata(td), out=out, ws=ws))
+    tk = _scratch(ws, out, 'virtemp.tk')
+    tmp = _scratch(ws, out, 'virtemp.tmp')
+    w *= 0.001
+    np.divide(w, eps, out=tmp)
+    tmp += 1.
+    np.add(ma.getdata(t), ZEROCNK, out=tk)
+    tk *= tmp
+    w += 1.
+    np.divide(tk, w, out=out)
+    out -= ZEROCNK
+    return _masked(out, p, t, td)
+
+
+def relh(p, t, td, out=None, ws=None):
     '''
     Returns the virtual temperature (C) of a parcel.
 
     Parameters
     ----------
-    p : number
+    p : number, numpy array
         The pressure of the parcel (hPa)
-    t : number
+    t : number, numpy array
         Temperature of the parcel (C)
-    td : number
+    td : number, numpy array
         Dew point of parcel (C)
+    out : numpy array (optional)
+        Preallocated array in which to store the result
+    ws : Workspace (optional)
+        Scratch arrays used with out
 
     Returns
     -------
     Relative humidity (%) of a parcel
 
     '''
-    return 100. * mixratio(p, td) / mixratio(p, t)
-
-
-def wobf(t):
+    if out is None:
+        return 100. * mixratio(p, td) / mixratio(p, t)
+    p_ = ma.getdata(p)
+    sat = ma.getdata(mixratio(p_, ma.getdata(t),
+        out=_scratch(ws, out, 'relh.sat'), ws=ws))
+    mixratio(p_, ma.getdata(td), out=out, ws=ws)
+    out *= 100.
+    out /= sat
+    return _masked(out, p, t, td)
+
+
+def wobf(t, out=None, ws=None):
     '''
     Implementation of the Wobus Function for computing the moist adiabats.
 
@@ -204,12 +431,22 @@ def wobf(t):
     ----------
     t : number, numpy array
         Temperature (C)
+    out : numpy array (optional)
+        Preallocated array in which to store the result
+    ws : Workspace (optional)
+        Scratch arrays used with out
 
     Returns
     -------
     Correction to theta (C) for calculation of saturated potential temperature.
 
     '''
+    if isinstance(t, _NUMBERS) and out is None:
+        return _wobf_scalar(t)
+    if _backend == 'numba':
+        return jit.apply('wobf', t, out=out)
+    if out is not None:
+        return _wobf_out(t, out, ws)
     t = t - 20
 
     npol = 1 + t * (-8.841660499999999e-3 + t * ( 1.4714143e-4
@@ -223,35 +460,106 @@ def wobf(t):
     ppol = 1 + t * (3.6182989e-03 + t * (-1.3603273e-05 + ppol))
     ppol = (29.93 / (ppol**4)) + (0.96 * t) - 14.8
 
-    try:
-        if t <= 0:
-            return npol
-        else:
-            return ppol
-    except:
-        correction = np.zeros(t.shape, dtype=np.float64)
-        correction[t <= 0] = npol[t <= 0]
-        correction[t > 0] = ppol[t > 0]
-        return correction
+    # Select the polynomial for each element without branching on the data
+    cold = ma.getdata(t <= 0)
+    out = np.where(cold, npol, ppol)
+    if ma.isMaskedArray(t):
+        return ma.array(out, mask=ma.getmask(t))[()]
+    return out if out.ndim else out[()]
+
 
+def _wobf_scalar(t):
+    '''
+    Scalar implementation of wobf()
 
-def satlift(p, thetam):
+    '''
+    t = t - 20
+    if t <= 0:
+        npol = 1 + t * (-8.841660499999999e-3 + t * ( 1.4714143e-4
+               + t * (-9.671989000000001e-7 + t * (-3.2607217e-8
+               + t * (-3.8598073e-10)))))
+        return 15.13 / (npol**4)
+    ppol = t * (4.9618922e-07 + t * (-6.1059365e-09 +
+          t * (3.9401551e-11 + t * (-1.2588129e-13 +
+          t * (1.6688280e-16)))))
+    ppol = 1 + t * (3.6182989e-03 + t * (-1.3603273e-05 + ppol))
+    return (29.93 / (ppol**4)) + (0.96 * t) - 14.8
+
+
+def _wobf_out(t, out, ws):
+    '''
+    In place implementation of wobf()
+
+    '''
+    x = _scratch(ws, out, 'wobf.x')
+    npol = _scratch(ws, out, 'wobf.npol')
+    cold = _scratch(ws, out, 'wobf.cold', np.bool_)
+    np.subtract(ma.getdata(t), 20, out=x)
+    np.less_equal(x, 0, out=cold)
+
+    np.multiply(x, -3.8598073e-10, out=npol)
+    npol += -3.2607217e-8
+    npol *= x
+    npol += -9.671989000000001e-7
+    npol *= x
+    npol += 1.4714143e-4
+    npol *= x
+    npol += -8.841660499999999e-3
+    npol *= x
+    npol += 1
+    np.power(npol, 4, out=npol)
+    np.divide(15.13, npol, out=npol)
+
+    np.multiply(x, 1.6688280e-16, out=out)
+    out += -1.2588129e-13
+    out *= x
+    out += 3.9401551e-11
+    out *= x
+    out += -6.1059365e-09
+    out *= x
+    out += 4.9618922e-07
+    out *= x
+    out += -1.3603273e-05
+    out *= x
+    out += 3.6182989e-03
+    out *= x
+    out += 1
+    np.power(out, 4, out=out)
+    np.divide(29.93, out, out=out)
+    x *= 0.96
+    out += x
+    out -= 14.8
+
+    np.copyto(out, npol, where=cold)
+    return _masked(out, t)
+
+
+def satlift(p, thetam, out=None):
     '''
     Returns the temperature (C) of a saturated parcel (thm) when lifted to a
     new pressure level (hPa)
 
     Parameters
     ----------
-    p : number
+    p : number, numpy array
         Pressure to which parcel is raised (hPa)
-    thetam : number
+    thetam : number, numpy array
         Saturated Potential Temperature of parcel (C)
+    out : numpy array (optional)
+        Preallocated array in which to store the result
 
     Returns
     -------
     Temperature (C) of saturated parcel at new level
 
     '''
+    if out is None and isinstance(p, _NUMBERS) and \
+            isinstance(thetam, _NUMBERS):
+        return _satlift_scalar(p, thetam)
+    if _backend == 'numba':
+        return jit.apply('satlift', p, thetam, out=out)
+    if out is not None or np.ndim(p) or np.ndim(thetam):
+        return _satlift_array(p, thetam, out)
     if np.fabs(p - 1000.) - 0.001 <= 0: return thetam
     eor = 999
     while np.fabs(eor) - 0.1 > 0:
@@ -271,29 +579,165 @@ def satlift(p, thetam):
     return t2 - eor
 
 
-def wetlift(p, t, p2):
+def _satlift_scalar(p, thetam):
+    '''
+    Scalar implementation of satlift()
+
+    '''
+    if math.fabs(p - 1000.) - 0.001 <= 0: return thetam
+    pwrp = (p / 1000.)**ROCP
+    t1 = (thetam + ZEROCNK) * pwrp - ZEROCNK
+    e1 = _wobf_scalar(t1) - _wobf_scalar(thetam)
+    rate = 1
+    t2 = t1 - (e1 * rate)
+    e2 = (t2 + ZEROCNK) / pwrp - ZEROCNK
+    e2 += _wobf_scalar(t2) - _wobf_scalar(e2) - thetam
+    eor = e2 * rate
+    while math.fabs(eor) - 0.1 > 0:
+        rate = (t2 - t1) / (e2 - e1)
+        t1 = t2
+        e1 = e2
+        t2 = t1 - (e1 * rate)
+        e2 = (t2 + ZEROCNK) / pwrp - ZEROCNK
+        e2 += _wobf_scalar(t2) - _wobf_scalar(e2) - thetam
+        eor = e2 * rate
+    return t2 - eor
+
+
+def _satlift_array(p, thetam, out=None):
+    '''
+    Array implementation of satlift(). Every element is iterated in the same
+    Newton loop; elements that have converged are dropped from the working
+    set so that the loop exits once the whole batch has converged.
+
+    Parameters
+    ----------
+    p : numpy array
+        Pressure to which parcel is raised (hPa)
+    thetam : numpy array
+        Saturated Potential Temperature of parcel (C)
+    out : numpy array (optional)
+        Preallocated array in which to store the result
+
+    Returns
+    -------
+    Temperature (C) of saturated parcel at new level
+
+    '''
+    mask = ma.getmask(p) | ma.getmask(thetam)
+    p, thetam = np.broadcast_arrays(ma.getdata(p).astype(np.float64),
+                                    ma.getdata(thetam).astype(np.float64))
+    shape = p.shape
+    p = p.ravel()
+    thetam = thetam.ravel()
+    if out is None:
+        temp = thetam.copy()
+    else:
+        # Iterate directly in out unless it cannot be viewed as 1-D
+        np.copyto(out, thetam.reshape(shape))
+        temp = out.reshape(-1)
+
+    # Parcels already at 1000 hPa keep their saturated potential temperature
+    idx = np.flatnonzero(np.fabs(p - 1000.) - 0.001 > 0)
+    thm = thetam[idx]
+    eor = None
+    while idx.size:
+        if eor is None:                 # First Pass
+            pwrp = (p[idx] / 1000.)**ROCP
+            t1 = (thm + ZEROCNK) * pwrp - ZEROCNK
+            e1 = wobf(t1) - wobf(thm)
+            rate = 1
+        else:                           # Successive Passes
+            rate = (t2 - t1) / (e2 - e1)
+            t1 = t2
+            e1 = e2
+        t2 = t1 - (e1 * rate)
+        e2 = (t2 + ZEROCNK) / pwrp - ZEROCNK
+        e2 += wobf(t2) - wobf(e2) - thm
+        eor = e2 * rate
+
+        # Freeze the converged elements and keep iterating on the rest
+        active = np.fabs(eor) - 0.1 > 0
+        temp[idx[~active]] = t2[~active] - eor[~active]
+        idx = idx[active]
+        t1, t2, e1, e2, eor, thm, pwrp = [x[active] for x in
+            (t1, t2, e1, e2, eor, thm, pwrp)]
+
+    if out is None:
+        temp = temp.reshape(shape)
+    else:
+        if not np.may_share_memory(temp, out):
+            np.copyto(out, temp.reshape(shape))
+        temp = out
+    if np.any(mask):
+        return ma.array(temp, mask=np.broadcast_to(mask, shape))
+    return temp
+
+
+def wetlift(p, t, p2, lookup=None, out=None, ws=None):
     '''
     Lifts a parcel moist adiabatically to its new level.
 
     Parameters
     -----------
-    p : number
+    p : number, numpy array
         Pressure of initial parcel (hPa)
-    t : number
+    t : number, numpy array
         Temperature of initial parcel (C)
-    p2 : number
+    p2 : number, numpy array
         Pressure of final level (hPa)
+    lookup : bool (optional; default None)
+        Switch to choose between the moist adiabat lookup table (faster) and
+        the iterative satlift (exact). If not given, use the global setting
+        from sharppy.sharptab.adiabats.use_table()
+    out : numpy array (optional)
+        Preallocated array in which to store the result
+    ws : Workspace (optional)
+        Scratch arrays used with out
 
     Returns
     -------
     Temperature (C)
 
     '''
+    if lookup is None:
+        lookup = adiabats.table_enabled()
+    if not lookup and out is None and isinstance(p, _NUMBERS) and p != 0 \
+            and isinstance(t, _NUMBERS) and isinstance(p2, _NUMBERS):
+        thta = ((t + ZEROCNK) * (1000. / p)**ROCP) - ZEROCNK
+        thetam = thta - _wobf_scalar(thta) + _wobf_scalar(t)
+        return _satlift_scalar(p2, thetam)
+    if not lookup and _backend == 'numba':
+        return jit.apply('wetlift', p, t, p2, out=out)
+    if out is not None:
+        return _wetlift_out(p, t, p2, lookup, out, ws)
     thta = theta(p, t, 1000.)
     thetam = thta - wobf(thta) + wobf(t)
+    if lookup:
+        return adiabats.get_table()(p2, thetam)
     return satlift(p2, thetam)
 
 
+def _wetlift_out(p, t, p2, lookup, out, ws):
+    '''
+    In place implementation of wetlift()
+
+    '''
+    t_ = ma.getdata(t)
+    thta = _scratch(ws, out, 'wetlift.thta')
+    thetam = _scratch(ws, out, 'wetlift.thetam')
+    theta(ma.getdata(p), t_, 1000., out=thta, ws=ws)
+    wobf(thta, out=thetam, ws=ws)
+    np.subtract(thta, thetam, out=thetam)
+    thetam += ma.getdata(wobf(t_, out=thta, ws=ws))
+    if lookup:
+        np.copyto(out, ma.getdata(adiabats.get_table()(ma.getdata(p2),
+            thetam)))
+    else:
+        satlift(ma.getdata(p2), thetam, out=out)
+    return _masked(out, p, t, p2)
+
+
 def lifted(p, t, td, lev):
     '''
     Calculate temperature (C) of parcel (defined by p, t, td) lifted
@@ -301,13 +745,13 @@ def lifted(p, t, td, lev):
 
     Parameters
     ----------
-    p : number
+    p : number, numpy array
         Pressure of initial parcel in hPa
-    t : number
+    t : number, numpy array
         Temperature of initial parcel in C
-    td : number
+    td : number, numpy array
         Dew Point of initial parcel in C
-    lev : number
+    lev : number, numpy array
         Pressure to which parcel is lifted in hPa
 
     Returns
@@ -319,7 +763,7 @@ def lifted(p, t, td, lev):
     return wetlift(p2, t2, lev)
 
 
-def vappres(t):
+def vappres(t, out=None):
     '''
     Returns the vapor pressure of dry air at given temperature
 
@@ -327,12 +771,18 @@ def vappres(t):
     ------
     t : number, numpy array
         Temperature of the parcel (C)
+    out : numpy array (optional)
+        Preallocated array in which to store the result
 
     Returns
     -------
     Vapor Pressure of dry air
 
     '''
+    if _backend == 'numba':
+        return jit.apply('vappres', t, out=out)
+    if out is not None:
+        return _vappres_out(t, out)
     pol = t * (1.1112018e-17 + (t * -3.0994571e-20))
     pol = t * (2.1874425e-13 + (t * (-1.789232e-15 + pol)))
     pol = t * (4.3884180e-09 + (t * (-2.988388e-11 + pol)))
@@ -341,7 +791,31 @@ def vappres(t):
     return 6.1078 / pol**8
 
 
-def mixratio(p, t):
+def _vappres_out(t, out):
+    '''
+    In place implementation of vappres()
+
+    '''
+    t_ = ma.getdata(t)
+    np.multiply(t_, -3.0994571e-20, out=out)
+    out += 1.1112018e-17
+    out *= t_
+    for a, b in ((2.1874425e-13, -1.789232e-15),
+                 (4.3884180e-09, -2.988388e-11),
+                 (7.8736169e-05, -6.111796e-07)):
+        out += b
+        out *= t_
+        out += a
+        out *= t_
+    out += -9.082695e-03
+    out *= t_
+    out += 0.99999683
+    np.power(out, 8, out=out)
+    np.divide(6.1078, out, out=out)
+    return _masked(out, t)
+
+
+def mixratio(p, t, out=None, ws=None):
     '''
     Returns the mixing ratio (g/kg) of a parcel
 
@@ -351,19 +825,52 @@ def mixratio(p, t):
         Pressure of the parcel (hPa)
     t : number, numpy array
         Temperature of the parcel (hPa)
+    out : numpy array (optional)
+        Preallocated array in which to store the result
+    ws : Workspace (optional)
+        Scratch arrays used with out
 
     Returns
     -------
     Mixing Ratio (g/kg) of the given parcel
 
     '''
+    if _backend == 'numba':
+        return jit.apply('mixratio', p, t, out=out)
+    if out is not None:
+        return _mixratio_out(p, t, out, ws)
     x = 0.02 * (t - 12.5 + (7500. / p))
     wfw = 1. + (0.0000045 * p) + (0.0014 * x * x)
     fwesw = wfw * vappres(t)
     return 621.97 * (fwesw / (p - fwesw))
 
 
-def temp_at_mixrat(w, p):
+def _mixratio_out(p, t, out, ws):
+    '''
+    In place implementation of mixratio()
+
+    '''
+    p_, t_ = ma.getdata(p), ma.getdata(t)
+    x = _scratch(ws, out, 'mixratio.x')
+    tmp = _scratch(ws, out, 'mixratio.tmp')
+    np.divide(7500., p_, out=x)
+    np.subtract(t_, 12.5, out=tmp)
+    x += tmp
+    x *= 0.02
+    np.multiply(x, 0.0014, out=tmp)
+    tmp *= x
+    np.multiply(p_, 0.0000045, out=x)
+    x += 1.
+    x += tmp
+    _vappres_out(t_, out)
+    out *= x
+    np.subtract(p_, out, out=x)
+    np.divide(out, x, out=out)
+    out *= 621.97
+    return _masked(out, p, t)
+
+
+def temp_at_mixrat(w, p, out=None, ws=None):
     '''
     Returns the temperature (C) of air at the given mixing ratio (g/kg) and
     pressure (hPa)
@@ -374,27 +881,60 @@ def temp_at_mixrat(w, p):
         Mixing Ratio (g/kg)
     p : number, numpy array
         Pressure (hPa)
+    out : numpy array (optional)
+        Preallocated array in which to store the result
+    ws : Workspace (optional)
+        Scratch arrays used with out
 
     Returns
     -------
     Temperature (C) of air at given mixing ratio and pressure
     '''
+    if _backend == 'numba':
+        return jit.apply('temp_at_mixrat', w, p, out=out)
+    if out is not None:
+        return _temp_at_mixrat_out(w, p, out, ws)
     x = np.log10(w * p / (622. + w))
     x = (10.**((c1 * x) + c2) - c3 + (c4 * (10**(c5 * x) - c6)**2)) - ZEROCNK
     return x
 
 
+def _temp_at_mixrat_out(w, p, out, ws):
+    '''
+    In place implementation of temp_at_mixrat()
+
+    '''
+    w_ = ma.getdata(w)
+    tmp = _scratch(ws, out, 'temp_at_mixrat.tmp')
+    np.multiply(w_, ma.getdata(p), out=out)
+    np.add(w_, 622., out=tmp)
+    out /= tmp
+    np.log10(out, out=out)
+    np.multiply(out, c5, out=tmp)
+    np.power(10., tmp, out=tmp)
+    tmp -= c6
+    np.square(tmp, out=tmp)
+    tmp *= c4
+    out *= c1
+    out += c2
+    np.power(10., out, out=out)
+    out -= c3
+    out += tmp
+    out -= ZEROCNK
+    return _masked(out, w, p)
+
+
 def wetbulb(p, t, td):
     '''
     Calculates the wetbulb temperature (C) for the given parcel
 
     Parameters
     ----------
-    p : number
+    p : number, numpy array
         Pressure of parcel (hPa)
-    t : number
+    t : number, numpy array
         Temperature of parcel (C)
-    td : number
+    td : number, numpy array
         Dew Point of parcel (C)
 
     Returns
@@ -1,11 +1,18 @@
 ''' Frequently used functions '''
 from __future__ import division
+import math
 import numpy as np
 import numpy.ma as ma
 from sharppy.sharptab.constants import MISSING, TOL
 
 __all__ = ['MS2KTS', 'KTS2MS', 'MS2MPH', 'MPH2MS', 'MPH2KTS', 'KTS2MPH']
 __all__ += ['M2FT', 'FT2M', 'vec2comp', 'comp2vec', 'mag']
+__all__ += ['vec2comp_many', 'comp2vec_many', 'mag_many']
+
+
+# Plain Python numbers take the scalar paths, which use the math module
+# instead of NumPy and do not build 0-d masked arrays
+_NUMBERS = (float, int)
 
 
 def MS2KTS(val):
@@ -190,6 +197,8 @@ def vec2comp(wdir, wspd, missing=MISSING):
         V-component of the wind (units are the same as those of input speed)
 
     '''
+    if isinstance(wdir, _NUMBERS) and isinstance(wspd, _NUMBERS):
+        return _vec2comp_scalar(wdir, wspd, missing)
     wdir = ma.asanyarray(wdir).astype(np.float64)
     wspd = ma.asanyarray(wspd).astype(np.float64)
     wdir.set_fill_value(missing)
@@ -218,6 +227,23 @@ def vec2comp(wdir, wspd, missing=MISSING):
     return u, v
 
 
+def _vec2comp_scalar(wdir, wspd, missing):
+    '''
+    Scalar implementation of vec2comp()
+
+    '''
+    if wdir == missing or wspd == missing:
+        return ma.masked, ma.masked
+    wdir = math.radians(wdir % 360.)
+    u = wspd * math.sin(wdir) * -1
+    v = wspd * math.cos(wdir) * -1
+    if math.fabs(u) < TOL:
+        u = 0.
+    if math.fabs(v) < TOL:
+        v = 0.
+    return u, v
+
+
 def comp2vec(u, v, missing=MISSING):
     '''
     Convert U, V components into direction and magnitude
@@ -240,6 +266,8 @@ def comp2vec(u, v, missing=MISSING):
         Magnitudes of wind vector (input units == output units)
 
     '''
+    if isinstance(u, _NUMBERS) and isinstance(v, _NUMBERS):
+        return _comp2vec_scalar(u, v, missing)
     u = ma.asanyarray(u).astype(np.float64)
     v = ma.asanyarray(v).astype(np.float64)
     u.set_fill_value(missing)
@@ -262,6 +290,33 @@ def comp2vec(u, v, missing=MISSING):
     return wdir, mag(u, v)
 
 
+def _comp2vec_scalar(u, v, missing):
+    '''
+    Scalar implementation of comp2vec()
+
+    '''
+    if u == missing or v == missing or not _finite(u, v):
+        return ma.masked, ma.masked
+    wdir = math.degrees(math.atan2(-u, -v))
+    if wdir < 0:
+        wdir += 360
+    if math.fabs(wdir) < TOL:
+        wdir = 0.
+    return wdir, math.sqrt(float(u)**2 + float(v)**2)
+
+
+def _finite(*values):
+    '''
+    Returns whether all of the given numbers are finite. The scalar paths
+    return masked for NaN or infinite input, as numpy.ma does for arrays.
+
+    '''
+    for value in values:
+        if math.isnan(value) or math.isinf(value):
+            return False
+    return True
+
+
 def mag(u, v, missing=MISSING):
     '''
     Compute the magnitude of a vector from its components
@@ -282,6 +337,10 @@ def mag(u, v, missing=MISSING):
         The magnitude of the vector (units are the same as input)
 
     '''
+    if isinstance(u, _NUMBERS) and isinstance(v, _NUMBERS):
+        if u == missing or v == missing or not _finite(u, v):
+            return ma.masked
+        return math.sqrt(float(u)**2 + float(v)**2)
     u = np.ma.asanyarray(u).astype(np.float64)
     v = np.ma.asanyarray(v).astype(np.float64)
     u.set_fill_value(missing)
@@ -295,4 +354,111 @@ def mag(u, v, missing=MISSING):
     return ma.sqrt(u**2 + v**2)
 
 
+def vec2comp_many(wdir, wspd, out=None):
+    '''
+    Convert direction and magnitude into U, V components. This is the fast
+    path of vec2comp() for plain float arrays of any shape (e.g. a stack of
+    profiles with shape (N, levels)), with NaN marking missing values. No
+    masked arrays are built and the results can be written into existing
+    arrays, including the input arrays themselves.
+
+    Parameters
+    ----------
+    wdir : numpy array
+        Angle in meteorological degrees
+    wspd : numpy array
+        Magnitudes of wind vector (input units == output units)
+    out : tuple of two numpy arrays (optional)
+        Preallocated arrays in which to store the U and V components
+
+    Returns
+    -------
+    u : numpy array
+        U-component of the wind (units are the same as those of input speed)
+    v : numpy array
+        V-component of the wind (units are the same as those of input speed)
 
+    '''
+    wdir = np.asarray(wdir, dtype=np.float64)
+    wspd = np.asarray(wspd, dtype=np.float64)
+    if out is None:
+        shape = np.broadcast(wdir, wspd).shape
+        out = (np.empty(shape), np.empty(shape))
+    u, v = out
+    ang = np.remainder(wdir, 360.)
+    np.radians(ang, out=ang)
+    spd = wspd * -1
+    np.sin(ang, out=u)
+    u *= spd
+    np.cos(ang, out=v)
+    v *= spd
+    with np.errstate(invalid='ignore'):
+        u[np.fabs(u) < TOL] = 0.
+        v[np.fabs(v) < TOL] = 0.
+    return u, v
+
+
+def comp2vec_many(u, v, out=None):
+    '''
+    Convert U, V components into direction and magnitude. This is the fast
+    path of comp2vec() for plain float arrays of any shape, with NaN
+    marking missing values (see vec2comp_many()).
+
+    Parameters
+    ----------
+    u : numpy array
+        U-component of the wind
+    v : numpy array
+        V-component of the wind
+    out : tuple of two numpy arrays (optional)
+        Preallocated arrays in which to store the direction and magnitude
+
+    Returns
+    -------
+    wdir : numpy array
+        Angle in meteorological degrees
+    wspd : numpy array
+        Magnitudes of wind vector (input units == output units)
+
+    '''
+    u = np.asarray(u, dtype=np.float64)
+    v = np.asarray(v, dtype=np.float64)
+    if out is None:
+        shape = np.broadcast(u, v).shape
+        out = (np.empty(shape), np.empty(shape))
+    wdir, wspd = out
+    ang = np.arctan2(-u, -v)
+    mag_many(u, v, out=wspd)
+    np.degrees(ang, out=wdir)
+    with np.errstate(invalid='ignore'):
+        wdir[wdir < 0] += 360
+        wdir[np.fabs(wdir) < TOL] = 0.
+    return wdir, wspd
+
+
+def mag_many(u, v, out=None):
+    '''
+    Compute the magnitude of a vector from its components. This is the fast
+    path of mag() for plain float arrays of any shape, with NaN marking
+    missing values (see vec2comp_many()).
+
+    Parameters
+    ----------
+    u : numpy array
+        U-component of the wind
+    v : numpy array
+        V-component of the wind
+    out : numpy array (optional)
+        Preallocated array in which to store the magnitude
+
+    Returns
+    -------
+    mag : numpy array
+        The magnitude of the vector (units are the same as input)
+
+    '''
+    u = np.asarray(u, dtype=np.float64)
+    v = np.asarray(v, dtype=np.float64)
+    sq = u * u
+    sq += v * v
+    return np.sqrt(sq, out=out)
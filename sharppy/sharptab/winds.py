@@ -4,22 +4,25 @@ import numpy as np
 import numpy.ma as ma
 from sharppy.sharptab import interp, utils
 from sharppy.sharptab.constants import *
+from sharppy.sharptab.profile import ProfileCollection
 
 
 __all__ = ['mean_wind', 'mean_wind_npw', 'mean_wind_old', 'mean_wind_npw_old']
 __all__ += ['sr_wind', 'sr_wind_npw', 'wind_shear', 'helicity', 'max_wind']
+__all__ += ['helicity_many', 'helicity_layers']
 __all__ += ['non_parcel_bunkers_motion', 'corfidi_mcs_motion', 'mbe_vectors']
+__all__ += ['Kinematics', 'kinematics']
 
 
-def mean_wind(prof, pbot=850, ptop=250, dp=-1, stu=0, stv=0):
+def mean_wind(prof, pbot=850, ptop=250, dp=-1, stu=0, stv=0, exact=False):
     '''
     Calculates a pressure-weighted mean wind through a layer. The default
     layer is 850 to 200 hPa.
 
     Parameters
     ----------
-    prof: profile object
-        Profile object
+    prof: profile object, profile collection
+        Profile object, or a collection of profiles
     pbot : number (optional; default 850 hPa)
         Pressure of the bottom level (hPa)
     ptop : number (optional; default 250 hPa)
@@ -30,6 +33,10 @@ def mean_wind(prof, pbot=850, ptop=250, dp=-1, stu=0, stv=0):
         U-component of storm-motion vector
     stv : number (optional; default 0)
         V-component of storm-motion vector
+    exact : bool (optional; default False)
+        Switch to choose between integrating the wind profile exactly between
+        the native levels or averaging an interpolated sounding at 'dp'
+        pressure levels
 
     Returns
     -------
@@ -39,22 +46,31 @@ def mean_wind(prof, pbot=850, ptop=250, dp=-1, stu=0, stv=0):
         V-component
 
     '''
+    if exact:
+        mnu = interp._layer_mean(prof, 'u', pbot, ptop)
+        mnv = interp._layer_mean(prof, 'v', pbot, ptop)
+        return mnu-stu, mnv-stv
     if dp > 0: dp = -dp
-    ps = np.arange(pbot, ptop+dp, dp)
+    if isinstance(prof, ProfileCollection):
+        mnu, mnv = _sounding_means(prof, pbot, ptop, dp, weighted=True)
+        return mnu-stu, mnv-stv
+    ps = _pres_levels(prof, pbot, ptop, dp)
     u, v = interp.components(prof, ps)
     # u -= stu; v -= stv
-    return ma.average(u, weights=ps)-stu, ma.average(v, weights=ps)-stv
+    return (ma.average(u, weights=ps, axis=-1)-stu,
+            ma.average(v, weights=ps, axis=-1)-stv)
 
 
-def mean_wind_npw(prof, pbot=850., ptop=250., dp=-1, stu=0, stv=0):
+def mean_wind_npw(prof, pbot=850., ptop=250., dp=-1, stu=0, stv=0,
+                  exact=False):
     '''
     Calculates a non-pressure-weighted mean wind through a layer. The default
     layer is 850 to 200 hPa.
 
     Parameters
     ----------
-    prof: profile object
-        Profile object
+    prof: profile object, profile collection
+        Profile object, or a collection of profiles
     pbot : number (optional; default 850 hPa)
         Pressure of the bottom level (hPa)
     ptop : number (optional; default 250 hPa)
@@ -65,6 +81,10 @@ def mean_wind_npw(prof, pbot=850., ptop=250., dp=-1, stu=0, stv=0):
         U-component of storm-motion vector
     stv : number (optional; default 0)
         V-component of storm-motion vector
+    exact : bool (optional; default False)
+        Switch to choose between integrating the wind profile exactly between
+        the native levels or averaging an interpolated sounding at 'dp'
+        pressure levels
 
     Returns
     -------
@@ -74,14 +94,21 @@ def mean_wind_npw(prof, pbot=850., ptop=250., dp=-1, stu=0, stv=0):
         V-component
 
     '''
+    if exact:
+        mnu = interp._layer_mean(prof, 'u', pbot, ptop, weighted=False)
+        mnv = interp._layer_mean(prof, 'v', pbot, ptop, weighted=False)
+        return mnu-stu, mnv-stv
     if dp > 0: dp = -dp
-    ps = np.arange(pbot, ptop+dp, dp)
+    if isinstance(prof, ProfileCollection):
+        mnu, mnv = _sounding_means(prof, pbot, ptop, dp, weighted=False)
+        return mnu-stu, mnv-stv
+    ps = _pres_levels(prof, pbot, ptop, dp)
     u, v = interp.components(prof, ps)
     # u -= stu; v -= stv
-    return u.mean()-stu, v.mean()-stv
+    return u.mean(axis=-1)-stu, v.mean(axis=-1)-stv
 
 
-def sr_wind(prof, pbot=850, ptop=250, stu=0, stv=0, dp=-1):
+def sr_wind(prof, pbot=850, ptop=250, stu=0, stv=0, dp=-1, exact=False):
     '''
     Calculates a pressure-weighted mean storm-relative wind through a layer.
     The default layer is 850 to 200 hPa. This is a thin wrapper around
@@ -89,8 +116,8 @@ def sr_wind(prof, pbot=850, ptop=250, stu=0, stv=0, dp=-1):
 
     Parameters
     ----------
-    prof: profile object
-        Profile object
+    prof: profile object, profile collection
+        Profile object, or a collection of profiles
     pbot : number (optional; default 850 hPa)
         Pressure of the bottom level (hPa)
     ptop : number (optional; default 250 hPa)
@@ -101,6 +128,10 @@ def sr_wind(prof, pbot=850, ptop=250, stu=0, stv=0, dp=-1):
         V-component of storm-motion vector
     dp : negative integer (optional; default -1)
         The pressure increment for the interpolated sounding
+    exact : bool (optional; default False)
+        Switch to choose between integrating the wind profile exactly between
+        the native levels or averaging an interpolated sounding at 'dp'
+        pressure levels
 
     Returns
     -------
@@ -110,10 +141,12 @@ def sr_wind(prof, pbot=850, ptop=250, stu=0, stv=0, dp=-1):
         V-component
 
     '''
-    return mean_wind(prof, pbot=pbot, ptop=ptop, dp=dp, stu=stu, stv=stv)
+    return mean_wind(prof, pbot=pbot, ptop=ptop, dp=dp, stu=stu, stv=stv,
+                     exact=exact)
 
 
-def sr_wind_npw(prof, pbot=850, ptop=250, stu=0, stv=0, dp=-1):
+def sr_wind_npw(prof, pbot=850, ptop=250, stu=0, stv=0, dp=-1,
+                exact=False):
     '''
     Calculates a none-pressure-weighted mean storm-relative wind through a
     layer. The default layer is 850 to 200 hPa. This is a thin wrapper around
@@ -121,8 +154,8 @@ def sr_wind_npw(prof, pbot=850, ptop=250, stu=0, stv=0, dp=-1):
 
     Parameters
     ----------
-    prof: profile object
-        Profile object
+    prof: profile object, profile collection
+        Profile object, or a collection of profiles
     pbot : number (optional; default 850 hPa)
         Pressure of the bottom level (hPa)
     ptop : number (optional; default 250 hPa)
@@ -133,6 +166,10 @@ def sr_wind_npw(prof, pbot=850, ptop=250, stu=0, stv=0, dp=-1):
         V-component of storm-motion vector
     dp : negative integer (optional; default -1)
         The pressure increment for the interpolated sounding
+    exact : bool (optional; default False)
+        Switch to choose between integrating the wind profile exactly between
+        the native levels or averaging an interpolated sounding at 'dp'
+        pressure levels
 
     Returns
     -------
@@ -142,7 +179,8 @@ def sr_wind_npw(prof, pbot=850, ptop=250, stu=0, stv=0, dp=-1):
         V-component
 
     '''
-    return mean_wind_npw(prof, pbot=pbot, ptop=ptop, dp=dp, stu=stu, stv=stv)
+    return mean_wind_npw(prof, pbot=pbot, ptop=ptop, dp=dp, stu=stu,
+                         stv=stv, exact=exact)
 
 
 def wind_shear(prof, pbot=850, ptop=250):
@@ -151,8 +189,8 @@ def wind_shear(prof, pbot=850, ptop=250):
 
     Parameters
     ----------
-    prof: profile object
-        Profile object
+    prof: profile object, profile collection
+        Profile object, or a collection of profiles
     pbot : number (optional; default 850 hPa)
         Pressure of the bottom level (hPa)
     ptop : number (optional; default 250 hPa)
@@ -166,6 +204,12 @@ def wind_shear(prof, pbot=850, ptop=250):
         V-component
 
     '''
+    if isinstance(prof, ProfileCollection):
+        # Both levels of each profile in one pass
+        ps = np.column_stack(np.broadcast_arrays(_column(pbot)[:, 0],
+                                                 _column(ptop)[:, 0]))
+        u, v = interp.components(prof, ps)
+        return u[:, 1] - u[:, 0], v[:, 1] - v[:, 0]
     ubot, vbot = interp.components(prof, pbot)
     utop, vtop = interp.components(prof, ptop)
     shu = utop - ubot
@@ -179,8 +223,8 @@ def non_parcel_bunkers_motion(prof):
 
     Inputs
     ------
-    prof : profile object
-        Profile Object
+    prof : profile object, profile collection
+        Profile object, or a collection of profiles
 
     Returns
     -------
@@ -199,10 +243,11 @@ def non_parcel_bunkers_motion(prof):
     p6km = interp.pres(prof, msl6km)
 
     # SFC-6km Mean Wind
-    mnu6, mnv6 = mean_wind_npw(prof, prof.pres[prof.sfc], p6km)
+    psfc = interp._sfc_value(prof, 'pres')
+    mnu6, mnv6 = mean_wind_npw(prof, psfc, p6km)
 
     # SFC-6km Shear Vector
-    shru6, shrv6 = wind_shear(prof, prof.pres[prof.sfc], p6km)
+    shru6, shrv6 = wind_shear(prof, psfc, p6km)
 
     # Bunkers Right Motion
     tmp = d / utils.comp2vec(shru6, shrv6)[1]
@@ -222,8 +267,8 @@ def helicity(prof, lower, upper, stu=0, stv=0, dp=-1, exact=True):
 
     Parameters
     ----------
-    prof : profile object
-        Profile Object
+    prof : profile object, profile collection
+        Profile object, or a collection of profiles
     lower : number
         Bottom level of layer (m, AGL)
     upper : number
@@ -247,21 +292,208 @@ def helicity(prof, lower, upper, stu=0, stv=0, dp=-1, exact=True):
     nhel : number
         Negative Helicity (m2/s2)
 
+    '''
+    u, v = _helicity_winds(prof, lower, upper, dp, exact)
+    return _helicity(u, v, stu, stv)
+
+
+def helicity_many(prof, lower, upper, stu=0, stv=0, dp=-1, exact=True):
+    '''
+    Calculates the relative helicity (m2/s2) of a layer from lower to upper
+    for any number of storm-motion vectors at once, e.g. a grid of storm
+    motions over a hodograph. The helicity of each segment of the layer is
+    linear in the storm motion, so the wind profile is sampled once and
+    the segments of every storm motion follow from a single matrix
+    product. As in helicity(), the segments with a missing end are left
+    out, and results agree with helicity() to within rounding. A profile
+    collection is not supported.
+
+    Parameters
+    ----------
+    prof : profile object
+        Profile Object
+    lower : number
+        Bottom level of layer (m, AGL)
+    upper : number
+        Top level of layer (m, AGL)
+    stu : number, numpy array (optional; default = 0)
+        U-components of storm-motion
+    stv : number, numpy array (optional; default = 0)
+        V-components of storm-motion
+    dp : negative integer (optional; default -1)
+        The pressure increment for the interpolated sounding
+    exact : bool (optional; default = True)
+        Switch to choose between using the exact data (slower) or using
+        interpolated sounding at 'dp' pressure levels (faster)
+
+    Returns
+    -------
+    phel+nhel : numpy array
+        Combined Helicity (m2/s2); one value per storm motion
+    phel : numpy array
+        Positive Helicity (m2/s2); one value per storm motion
+    nhel : numpy array
+        Negative Helicity (m2/s2); one value per storm motion
+
+    '''
+    if isinstance(prof, ProfileCollection):
+        raise TypeError('helicity_many() does not support a profile '
+                        'collection; use helicity() for each storm motion')
+    u, v = _helicity_winds(prof, lower, upper, dp, exact)
+    u = utils.KTS2MS(ma.filled(u, np.nan))
+    v = utils.KTS2MS(ma.filled(v, np.nan))
+    stu, stv = np.broadcast_arrays(utils.KTS2MS(np.asarray(stu, np.float64)),
+                                   utils.KTS2MS(np.asarray(stv, np.float64)))
+
+    # As in helicity(), the segments with a missing end are left out
+    keep = np.isfinite(u[1:] + v[1:] + u[:-1] + v[:-1])
+    u0, v0, u1, v1 = u[:-1][keep], v[:-1][keep], u[1:][keep], v[1:][keep]
+
+    # (u1 - su)(v0 - sv) - (u0 - su)(v1 - sv) for the segments from (u0, v0)
+    # to (u1, v1) is u1*v0 - u0*v1 + su*(v1 - v0) + sv*(u0 - u1)
+    coef = np.array([v1 - v0, u0 - u1])
+    motion = np.stack([stu.ravel(), stv.ravel()], axis=-1)
+    layers = np.dot(motion, coef)
+    layers += (u1 * v0) - (u0 * v1)
+    phel = np.maximum(layers, 0).sum(axis=-1).reshape(stu.shape)[()]
+    nhel = np.minimum(layers, 0).sum(axis=-1).reshape(stu.shape)[()]
+    return phel+nhel, phel, nhel
+
+
+def helicity_layers(prof, layers, stu=0, stv=0):
+    '''
+    Calculates the relative helicity (m2/s2) of several layers for the same
+    storm motion, e.g. the 0-500 m, 0-1 km, 0-3 km and effective layers.
+    As in helicity() with exact=True, each layer is integrated over the
+    levels of the profile inside it and the interpolated layer endpoints.
+    The helicity of the segments between levels is computed and summed
+    once; each layer only adds the two segments at its endpoints. As in
+    helicity(), the segments with a missing end are left out, and results
+    agree with helicity() to within rounding.
+
+    Parameters
+    ----------
+    prof : profile object, profile collection
+        Profile object, or a collection of profiles
+    layers : sequence of (number, number)
+        Bottom and top level of each layer (m, AGL)
+    stu : number (optional; default = 0)
+        U-component of storm-motion
+    stv : number (optional; default = 0)
+        V-component of storm-motion
+
+    Returns
+    -------
+    phel+nhel : numpy array
+        Combined Helicity (m2/s2); one value per layer
+    phel : numpy array
+        Positive Helicity (m2/s2); one value per layer
+    nhel : numpy array
+        Negative Helicity (m2/s2); one value per layer
+
+    '''
+    lower, upper = np.asarray(layers, dtype=np.float64).reshape(-1, 2).T
+    if isinstance(prof, ProfileCollection):
+        hel = [helicity(prof, bot, top, stu, stv)
+               for bot, top in zip(lower, upper)]
+        return tuple(ma.stack(h, axis=-1) for h in zip(*hel))
+    plower = interp.pres(prof, interp.to_msl(prof, lower))
+    pupper = interp.pres(prof, interp.to_msl(prof, upper))
+    u1, v1 = interp.components(prof, plower)
+    u2, v2 = interp.components(prof, pupper)
+    sru1 = utils.KTS2MS(u1 - stu)
+    srv1 = utils.KTS2MS(v1 - stv)
+    sru2 = utils.KTS2MS(u2 - stu)
+    srv2 = utils.KTS2MS(v2 - stv)
+
+    # Cumulative positive and negative helicity of the segments between
+    # the levels of the profile
+    valid = prof.valid('pres', 'u')
+    pres = ma.getdata(prof.pres)[valid]
+    sru = utils.KTS2MS(ma.getdata(prof.u)[valid] - stu)
+    srv = utils.KTS2MS(ma.getdata(prof.v)[valid] - stv)
+    seg = (sru[1:] * srv[:-1]) - (sru[:-1] * srv[1:])
+    pcum = np.concatenate([[0.], np.cumsum(np.maximum(seg, 0))])
+    ncum = np.concatenate([[0.], np.cumsum(np.minimum(seg, 0))])
+
+    # The levels strictly inside of each layer are i1 through i2
+    i1 = np.searchsorted(-pres, -plower, side='right')
+    i2 = np.searchsorted(-pres, -pupper, side='left') - 1
+    inside = i1 <= i2
+    i1 = np.clip(i1, 0, pres.size - 1)
+    i2 = np.clip(i2, 0, pres.size - 1)
+
+    # Segments from the bottom of each layer to its first level and from
+    # its last level to the top; a layer without levels is a single segment
+    ua = np.where(inside, sru[i1], sru2)
+    va = np.where(inside, srv[i1], srv2)
+    ub = sru[i2]
+    vb = srv[i2]
+    bot = (ua * srv1) - (sru1 * va)
+    top = np.where(inside, (sru2 * vb) - (ub * srv2), 0.)
+    # As in helicity(), a segment with a missing end (e.g. a layer from the
+    # surface when the surface wind is missing) adds nothing
+    bot = np.where(np.isnan(bot), 0., bot)
+    top = np.where(np.isnan(top), 0., top)
+    phel = np.maximum(bot, 0) + np.maximum(top, 0) + \
+        np.where(inside, pcum[i2] - pcum[i1], 0.)
+    nhel = np.minimum(bot, 0) + np.minimum(top, 0) + \
+        np.where(inside, ncum[i2] - ncum[i1], 0.)
+    return phel+nhel, phel, nhel
+
+
+def _helicity_winds(prof, lower, upper, dp, exact):
+    '''
+    Returns the wind components used to integrate the helicity of a layer
+    (see helicity())
+
     '''
     lower = interp.to_msl(prof, lower)
     upper = interp.to_msl(prof, upper)
     plower = interp.pres(prof, lower)
     pupper = interp.pres(prof, upper)
     if exact:
-        ind1 = np.where(plower > prof.pres)[0].min()
-        ind2 = np.where(pupper < prof.pres)[0].max()
         u1, v1 = interp.components(prof, plower)
         u2, v2 = interp.components(prof, pupper)
-        u = np.concatenate([[u1], prof.u[ind1:ind2+1].compressed(), [u2]])
-        v = np.concatenate([[v1], prof.v[ind1:ind2+1].compressed(), [v2]])
-    else:
-        ps = np.arange(plower, pupper+dp, dp)
-        u, v = interp.components(prof, ps)
+        return _layer_winds(prof, plower, pupper, u1, v1, u2, v2)
+    ps = _pres_levels(prof, plower, pupper, dp)
+    return interp.components(prof, ps)
+
+
+def _layer_winds(prof, plower, pupper, u1, v1, u2, v2):
+    '''
+    Returns the wind components at the levels of the profile between two
+    pressures, bracketed by the given components at the two pressures. For
+    a profile collection these are (profile x level) masked arrays.
+
+    '''
+    if isinstance(prof, ProfileCollection):
+        plower = _column(plower)
+        pupper = _column(pupper)
+        pres = ma.getdata(prof.pres)
+        with np.errstate(invalid='ignore'):
+            keep = prof.valid('pres', 'u', 'v') & (pres < plower) & \
+                (pres > pupper)
+        u = ma.array(ma.getdata(prof.u), mask=~keep)
+        v = ma.array(ma.getdata(prof.v), mask=~keep)
+        return (ma.concatenate([_column(u1), u, _column(u2)], axis=1),
+                ma.concatenate([_column(v1), v, _column(v2)], axis=1))
+    ind1 = np.where(plower > prof.pres)[0].min()
+    ind2 = np.where(pupper < prof.pres)[0].max()
+    keep = prof.valid('u', 'v')[ind1:ind2+1]
+    u = np.concatenate([[u1], ma.getdata(prof.u)[ind1:ind2+1][keep], [u2]])
+    v = np.concatenate([[v1], ma.getdata(prof.v)[ind1:ind2+1][keep], [v2]])
+    return u, v
+
+
+def _helicity(u, v, stu, stv):
+    '''
+    Sums the storm-relative helicity (m2/s2) of the layers between
+    consecutive wind components (kts)
+
+    '''
+    if np.ndim(u) > 1:
+        return _helicity_columns(u, v, stu, stv)
     sru = utils.KTS2MS(u - stu)
     srv = utils.KTS2MS(v - stv)
     layers = (sru[1:] * srv[:-1]) - (sru[:-1] * srv[1:])
@@ -270,6 +502,153 @@ def helicity(prof, lower, upper, stu=0, stv=0, dp=-1, exact=True):
     return phel+nhel, phel, nhel
 
 
+def _helicity_columns(u, v, stu, stv):
+    '''
+    Sums the storm-relative helicity (m2/s2) of each profile of a profile
+    collection from (profile x level) wind components (kts). Masked levels
+    are skipped, so a segment joins the valid levels on either side.
+
+    '''
+    valid = ~(ma.getmaskarray(u) | ma.getmaskarray(v))
+    u = ma.filled(u, np.nan)
+    v = ma.filled(v, np.nan)
+    valid &= np.isfinite(u) & np.isfinite(v)
+    order = np.argsort(~valid, axis=-1, kind='mergesort')
+    sru = utils.KTS2MS(np.take_along_axis(u, order, axis=-1) - _column(stu))
+    srv = utils.KTS2MS(np.take_along_axis(v, order, axis=-1) - _column(stv))
+    valid = np.take_along_axis(valid, order, axis=-1)
+    seg = valid[:, 1:] & valid[:, :-1]
+    with np.errstate(invalid='ignore'):
+        layers = (sru[:, 1:] * srv[:, :-1]) - (sru[:, :-1] * srv[:, 1:])
+    layers = np.where(seg, layers, 0.)
+    phel = ma.masked_invalid(np.maximum(layers, 0).sum(axis=-1))
+    nhel = ma.masked_invalid(np.minimum(layers, 0).sum(axis=-1))
+    return phel+nhel, phel, nhel
+
+
+def _pres_levels(prof, pbot, ptop, dp):
+    '''
+    Returns the pressures (hPa) of the interpolated sounding from pbot to
+    ptop at 'dp' pressure levels. For a profile collection the layer may
+    differ per profile, and the soundings are padded with masked levels
+    into a (profile x level) array.
+
+    '''
+    if not isinstance(prof, ProfileCollection):
+        return np.arange(pbot, ptop+dp, dp)
+    pbot, n = _level_counts(prof, pbot, ptop, dp)
+    levels = np.arange(n.max())
+    ps = pbot + dp * levels
+    return ma.masked_where(levels >= n[:, np.newaxis],
+                           np.broadcast_to(ps, (len(prof), levels.size)))
+
+
+def _level_counts(prof, pbot, ptop, dp):
+    '''
+    Returns the bottom pressures of the interpolated soundings of a profile
+    collection as a column, and the number of levels of each sounding (see
+    _pres_levels())
+
+    '''
+    pbot = _column(pbot)
+    ptop = _column(ptop)
+    with np.errstate(invalid='ignore'):
+        n = np.ceil((ptop + dp - pbot) / dp)[:, 0]
+    n = np.where(n > 0, n, 0)
+    return pbot, np.broadcast_to(n, (len(prof),)).astype(np.intp)
+
+
+def _sounding_means(prof, pbot, ptop, dp, weighted):
+    '''
+    Averages the wind components of the interpolated soundings of a profile
+    collection (see _pres_levels()) without interpolating to each of their
+    levels. The winds are linear in the log10 of the pressure between the
+    valid levels of a profile, so the sounding levels that fall between two
+    of them are summed in closed form from cumulative sums over the
+    sounding. The mean of a sounding that reaches beyond the valid levels
+    of its profile is masked, as the NaN values make it missing for a
+    single profile.
+
+    '''
+    pbot, n = _level_counts(prof, pbot, ptop, dp)
+    nprof = len(prof)
+    if not n.max():
+        return [ma.masked_all(nprof), ma.masked_all(nprof)]
+    rows = np.arange(nprof)[:, np.newaxis]
+
+    # Sums of the weights (in closed form) and of the weighted log10
+    # pressures of the first k sounding levels
+    def weights(k):
+        if weighted:
+            return k * pbot + dp * k * (k - 1) / 2.
+        return k.astype(np.float64)
+    p = pbot + dp * np.arange(n.max())
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x = np.log10(p)
+    if weighted:
+        x *= p
+    WX = np.zeros((p.shape[0], p.shape[1] + 1))
+    np.cumsum(x, axis=1, out=WX[:, 1:])
+    WX = np.broadcast_to(WX, (nprof, WX.shape[1]))
+
+    # The valid levels of each profile, in descending pressure
+    valid = prof.valid('logp', 'u', 'v')
+    m = valid.sum(axis=-1)
+    order = np.argsort(~valid, axis=-1, kind='mergesort')
+    pres, lp, u, v = [np.take_along_axis(ma.getdata(getattr(prof, name)),
+                                         order, axis=-1)
+                      for name in ('pres', 'logp', 'u', 'v')]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        first = np.log10(pbot[:, 0])
+        last = np.log10(pbot[:, 0] + dp * (n - 1))
+        inside = (n > 0) & (m > 0) & (first <= lp[:, 0]) & \
+            (last >= lp[rows[:, 0], np.maximum(m - 1, 0)])
+
+        # Number of sounding levels at or below each valid level; the
+        # levels between two valid levels are those in between the counts
+        count = np.floor((pbot - pres) / -dp) + 1
+        count = np.fmin(np.fmax(count, 0), n[:, np.newaxis]).astype(np.intp)
+        count[:, 0] = 0
+        lo, hi = count[:, :-1], count[:, 1:]
+        seg = (np.arange(1, lp.shape[1]) < m[:, np.newaxis]) & (hi > lo)
+        dx = lp[:, 1:] - lp[:, :-1]
+        sw = weights(hi) - weights(lo)
+        swx = WX[rows, hi] - WX[rows, lo]
+        total = weights(n[:, np.newaxis])[:, 0]
+        means = []
+        for f in (u, v):
+            s = np.where(seg & (dx != 0), (f[:, 1:] - f[:, :-1]) / dx, 0.)
+            a = f[:, :-1] - s * lp[:, :-1]
+            mean = np.where(seg, a * sw + s * swx, 0.).sum(axis=-1) / total
+            # A sounding of one level on the only valid level
+            mean = np.where(m == 1, f[:, 0], mean)
+            means.append(ma.masked_where(~inside, mean))
+    return means
+
+
+def _complete(values, ps):
+    '''
+    Masks the values of a profile collection beyond the levels ps of its
+    soundings, and the whole sounding of a profile that is missing any of
+    them
+
+    '''
+    mask = ma.getmaskarray(values)
+    levels = ~ma.getmaskarray(ps)
+    gap = (mask & levels).any(axis=-1)
+    return ma.array(values, mask=mask | ~levels | gap[:, np.newaxis])
+
+
+def _column(value):
+    '''
+    Returns a number or per-profile values as a float column with NaN in
+    place of masked values
+
+    '''
+    value = ma.filled(ma.asarray(value, dtype=np.float64), np.nan)
+    return value.reshape(-1, 1)
+
+
 def max_wind(prof, lower, upper, all=False):
     '''
     Finds the maximum wind speed of the layer given by lower and upper levels.
@@ -278,12 +657,15 @@ def max_wind(prof, lower, upper, all=False):
 
     Parameters
     ----------
-    prof : profile object
-        Profile Object
+    prof : profile object, profile collection
+        Profile object, or a collection of profiles
     lower : number
         Bottom level of layer (m, AGL)
     upper : number
         Top level of layer (m, AGL)
+    all : bool (optional; default False)
+        Switch to return every level of the maximum instead of the lowest
+        one (not available for a profile collection)
 
     Returns
     -------
@@ -299,10 +681,16 @@ def max_wind(prof, lower, upper, all=False):
     upper = interp.to_msl(prof, upper)
     plower = interp.pres(prof, lower)
     pupper = interp.pres(prof, upper)
+    if isinstance(prof, ProfileCollection):
+        if all:
+            raise ValueError('all=True is not supported for a profile '
+                             'collection')
+        return _max_wind_columns(prof, plower, pupper)
     ind1 = np.where(plower > prof.pres)[0].min()
     ind2 = np.where(pupper < prof.pres)[0].max()
-    inds = np.where(np.fabs(prof.wspd[ind1:ind2+1] -
-                    prof.wspd[ind1:ind2+1].max()) < TOL)[0]
+    inds = np.flatnonzero(prof.valid('wspd')[ind1:ind2+1])
+    wspd = ma.getdata(prof.wspd)[ind1:ind2+1][inds]
+    inds = inds[np.fabs(wspd - wspd.max()) < TOL]
     inds += ind1
     inds.sort()
     maxu, maxv =  utils.vec2comp(prof.wdir[inds], prof.wspd[inds])
@@ -312,14 +700,34 @@ def max_wind(prof, lower, upper, all=False):
         return maxu[0], maxv[0], prof.pres[inds[0]]
 
 
+def _max_wind_columns(prof, plower, pupper):
+    '''
+    Finds the lowest level of maximum wind speed between two pressures in
+    each profile of a profile collection (see max_wind())
+
+    '''
+    pres = ma.getdata(prof.pres)
+    with np.errstate(invalid='ignore'):
+        inside = prof.valid('pres', 'wspd') & (pres < _column(plower)) & \
+            (pres > _column(pupper))
+        wspd = np.where(inside, ma.getdata(prof.wspd), -np.inf)
+        top = wspd.max(axis=-1)[:, np.newaxis]
+        ind = np.argmax(inside & (np.fabs(wspd - top) < TOL), axis=-1)
+    rows = np.arange(len(prof))
+    missing = ~inside.any(axis=-1)
+    maxu, maxv = utils.vec2comp(prof.wdir[rows, ind], prof.wspd[rows, ind])
+    return (ma.masked_where(missing, maxu), ma.masked_where(missing, maxv),
+            ma.masked_where(missing, prof.pres[rows, ind]))
+
+
 def corfidi_mcs_motion(prof):
     '''
     Calculated the Meso-beta Elements (Corfidi) Vectors
 
     Parameters
     ----------
-    prof : profile object
-        Profile Object
+    prof : profile object, profile collection
+        Profile object, or a collection of profiles
 
     Returns
     -------
@@ -338,7 +746,8 @@ def corfidi_mcs_motion(prof):
 
     # Compute the low-level (SFC-1500m) mean wind
     p_1p5km = interp.pres(prof, interp.to_msl(prof, 1500.))
-    mnu2, mnv2 = mean_wind_npw(prof, prof.pres[prof.sfc], p_1p5km)
+    mnu2, mnv2 = mean_wind_npw(prof, interp._sfc_value(prof, 'pres'),
+                               p_1p5km)
 
     # Compute the upshear vector
     upu = mnu1 - mnu2
@@ -357,8 +766,8 @@ def mbe_vectors(prof):
 
     Parameters
     ----------
-    prof : profile object
-        Profile Object
+    prof : profile object, profile collection
+        Profile object, or a collection of profiles
 
     Returns
     -------
@@ -375,5 +784,185 @@ def mbe_vectors(prof):
     return corfidi_mcs_motion(prof)
 
 
+class Kinematics(object):
+    '''
+    Container for the standard kinematic parameters of a profile (see
+    kinematics()). Vectors are (u, v) pairs in knots and helicities are
+    (total, positive, negative) triples in m2/s2.
 
+    '''
+    def __init__(self):
+        '''
+        Create the kinematics object
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        A kinematics object
+
+        '''
+        self.mean_6km = ma.masked       # SFC-6km mean wind (kts)
+        self.mean_1p5km = ma.masked     # SFC-1.5km mean wind (kts)
+        self.mean_trop = ma.masked      # 850-300 hPa mean wind (kts)
+        self.shear_1km = ma.masked      # SFC-1km shear (kts)
+        self.shear_3km = ma.masked      # SFC-3km shear (kts)
+        self.shear_6km = ma.masked      # SFC-6km shear (kts)
+        self.right_mover = ma.masked    # Bunkers right mover (kts)
+        self.left_mover = ma.masked     # Bunkers left mover (kts)
+        self.upshear = ma.masked        # Corfidi upshear vector (kts)
+        self.downshear = ma.masked      # Corfidi downshear vector (kts)
+        self.srh_1km = ma.masked        # SFC-1km right mover SRH (m2/s2)
+        self.srh_3km = ma.masked        # SFC-3km right mover SRH (m2/s2)
+
+
+def kinematics(prof):
+    '''
+    Computes the standard kinematic parameters of a profile in one pass.
+    The heights of the layer tops are converted to pressure, and the winds
+    interpolated to the layer boundaries and to the 1 hPa soundings of the
+    mean winds, a single time each; all parameters are then built from these
+    shared samples. The mean winds are non-pressure-weighted. Results are
+    identical to those of mean_wind_npw(), wind_shear(),
+    non_parcel_bunkers_motion(), corfidi_mcs_motion() and helicity() with
+    exact=True for the same layers.
 
+    Parameters
+    ----------
+    prof : profile object, profile collection
+        Profile object, or a collection of profiles
+
+    Returns
+    -------
+    kin : kinematics object
+        Kinematics object
+
+    '''
+    if isinstance(prof, ProfileCollection):
+        return _kinematics_columns(prof)
+    kin = Kinematics()
+    psfc = prof.pres[prof.sfc]
+    msl = interp.to_msl(prof, np.array([0., 1000., 1500., 3000., 6000.]))
+    p0km, p1km, p1p5km, p3km, p6km = interp.pres(prof, msl)
+
+    # Winds at the layer boundaries and on the 1 hPa soundings of the mean
+    # winds. The SFC-1.5km sounding is the start of the SFC-6km one.
+    ps6 = np.arange(psfc, p6km-1, -1)
+    n1p5 = np.arange(psfc, p1p5km-1, -1).size
+    pstrop = np.arange(850., 300.-1, -1)
+    ps = np.concatenate([[psfc, p0km, p1km, p3km, p6km], ps6, pstrop])
+    u, v = interp.components(prof, ps)
+    (usfc, u0km, u1km, u3km, u6km), u6, utrop = \
+        u[:5], u[5:5+ps6.size], u[5+ps6.size:]
+    (vsfc, v0km, v1km, v3km, v6km), v6, vtrop = \
+        v[:5], v[5:5+ps6.size], v[5+ps6.size:]
+
+    # Mean winds and shear
+    mnu6, mnv6 = u6.mean(), v6.mean()
+    mnu1, mnv1 = utrop.mean(), vtrop.mean()
+    mnu2, mnv2 = u6[:n1p5].mean(), v6[:n1p5].mean()
+    kin.mean_6km = (mnu6, mnv6)
+    kin.mean_1p5km = (mnu2, mnv2)
+    kin.mean_trop = (mnu1, mnv1)
+    kin.shear_1km = (u1km - usfc, v1km - vsfc)
+    kin.shear_3km = (u3km - usfc, v3km - vsfc)
+    kin.shear_6km = shru6, shrv6 = (u6km - usfc, v6km - vsfc)
+
+    # Bunkers storm motion (see non_parcel_bunkers_motion())
+    d = utils.MS2KTS(7.5)
+    tmp = d / utils.comp2vec(shru6, shrv6)[1]
+    rstu = mnu6 + (tmp * shrv6)
+    rstv = mnv6 - (tmp * shru6)
+    kin.right_mover = (rstu, rstv)
+    kin.left_mover = (mnu6 - (tmp * shrv6), mnv6 + (tmp * shru6))
+
+    # Corfidi vectors (see corfidi_mcs_motion())
+    upu = mnu1 - mnu2
+    upv = mnv1 - mnv2
+    kin.upshear = (upu, upv)
+    kin.downshear = (mnu1 + upu, mnv1 + upv)
+
+    # Storm-relative helicity of the right mover (see helicity()); it is
+    # missing with the storm motion (e.g. without a surface wind)
+    if ma.is_masked(rstu) or ma.is_masked(rstv) or \
+            not np.isfinite(rstu) or not np.isfinite(rstv):
+        kin.srh_1km = kin.srh_3km = (ma.masked, ma.masked, ma.masked)
+        return kin
+    u, v = _layer_winds(prof, p0km, p1km, u0km, v0km, u1km, v1km)
+    kin.srh_1km = _helicity(u, v, rstu, rstv)
+    u, v = _layer_winds(prof, p0km, p3km, u0km, v0km, u3km, v3km)
+    kin.srh_3km = _helicity(u, v, rstu, rstv)
+    return kin
+
+
+def _kinematics_columns(prof):
+    '''
+    Computes the standard kinematic parameters of each profile of a profile
+    collection (see kinematics()). As for a single profile, the winds are
+    interpolated to all of the layer boundaries and mean wind soundings in
+    one pass.
+
+    '''
+    kin = Kinematics()
+    psfc = interp._sfc_value(prof, 'pres')
+    msl = interp.to_msl(prof, np.array([[0., 1000., 1500., 3000., 6000.]]))
+    p0km, p1km, p1p5km, p3km, p6km = interp.pres(prof, msl).T
+
+    # Winds at the layer boundaries and on the 1 hPa soundings of the mean
+    # winds. The SFC-1.5km sounding is the start of the SFC-6km one.
+    ps6 = _pres_levels(prof, psfc, p6km, -1)
+    n1p5 = ma.count(_pres_levels(prof, psfc, p1p5km, -1), axis=-1)
+    pstrop = np.arange(850., 300.-1, -1)
+    ps = ma.concatenate([ma.column_stack([psfc, p0km, p1km, p3km, p6km]),
+                         ps6, np.broadcast_to(pstrop, (len(prof),
+                                                       pstrop.size))], axis=1)
+    u, v = interp.components(prof, ps)
+    n6 = ps6.shape[1]
+    (usfc, u0km, u1km, u3km, u6km), u6, utrop = \
+        u[:, :5].T, u[:, 5:5+n6], u[:, 5+n6:]
+    (vsfc, v0km, v1km, v3km, v6km), v6, vtrop = \
+        v[:, :5].T, v[:, 5:5+n6], v[:, 5+n6:]
+    ps1p5 = ma.masked_where(np.arange(n6) >= n1p5[:, np.newaxis], ps6)
+
+    # Mean winds and shear; as in _sounding_means(), a sounding that is
+    # missing any of its levels has a missing mean
+    mnu6, mnv6 = _complete(u6, ps6).mean(axis=-1), \
+        _complete(v6, ps6).mean(axis=-1)
+    mnu1, mnv1 = _complete(utrop, pstrop).mean(axis=-1), \
+        _complete(vtrop, pstrop).mean(axis=-1)
+    mnu2, mnv2 = _complete(u6, ps1p5).mean(axis=-1), \
+        _complete(v6, ps1p5).mean(axis=-1)
+    kin.mean_6km = (mnu6, mnv6)
+    kin.mean_1p5km = (mnu2, mnv2)
+    kin.mean_trop = (mnu1, mnv1)
+    kin.shear_1km = (u1km - usfc, v1km - vsfc)
+    kin.shear_3km = (u3km - usfc, v3km - vsfc)
+    kin.shear_6km = shru6, shrv6 = (u6km - usfc, v6km - vsfc)
+
+    # Bunkers storm motion (see non_parcel_bunkers_motion())
+    d = utils.MS2KTS(7.5)
+    tmp = d / utils.comp2vec(shru6, shrv6)[1]
+    rstu = mnu6 + (tmp * shrv6)
+    rstv = mnv6 - (tmp * shru6)
+    kin.right_mover = (rstu, rstv)
+    kin.left_mover = (mnu6 - (tmp * shrv6), mnv6 + (tmp * shru6))
+
+    # Corfidi vectors (see corfidi_mcs_motion())
+    upu = mnu1 - mnu2
+    upv = mnv1 - mnv2
+    kin.upshear = (upu, upv)
+    kin.downshear = (mnu1 + upu, mnv1 + upv)
+
+    # Storm-relative helicity of the right mover (see helicity()); it is
+    # missing where the storm motion is
+    undefined = ma.getmaskarray(rstu) | ma.getmaskarray(rstv) | \
+        ~np.isfinite(ma.getdata(rstu)) | ~np.isfinite(ma.getdata(rstv))
+    u, v = _layer_winds(prof, p0km, p1km, u0km, v0km, u1km, v1km)
+    kin.srh_1km = tuple(ma.masked_where(undefined, h)
+                        for h in _helicity(u, v, rstu, rstv))
+    u, v = _layer_winds(prof, p0km, p3km, u0km, v0km, u3km, v3km)
+    kin.srh_3km = tuple(ma.masked_where(undefined, h)
+                        for h in _helicity(u, v, rstu, rstv))
+    return kin
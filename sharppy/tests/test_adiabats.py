@@ -0,0 +1,125 @@
+import os
+import shutil
+import tempfile
+import numpy as np
+import numpy.ma as ma
+import numpy.testing as npt
+import sharppy.sharptab.thermo as thermo
+import sharppy.sharptab.adiabats as adiabats
+
+
+table = adiabats.MoistAdiabatTable.build()
+
+
+def test_table_max_error():
+    rs = np.random.RandomState(0)
+    input_p = np.exp(rs.uniform(np.log(adiabats.PRES_MAX),
+                                np.log(adiabats.PRES_MIN), 20000))
+    input_thetam = rs.uniform(adiabats.THETAM_MIN, adiabats.THETAM_MAX,
+                              20000)
+    correct_t = thermo.satlift(input_p, input_thetam)
+    returned_t = table(input_p, input_thetam)
+    npt.assert_(np.abs(returned_t - correct_t).max() < adiabats.MAX_ERROR)
+
+
+def test_table_single():
+    input_p = 850
+    input_thetam = 20
+    correct_t = 13.712979340608157
+    returned_t = table(input_p, input_thetam)
+    npt.assert_almost_equal(returned_t, correct_t, decimal=1)
+
+
+def test_table_outside():
+    input_p = np.asarray([5., 850.])
+    input_thetam = np.asarray([20., 70.])
+    correct_t = thermo.satlift(input_p, input_thetam)
+    returned_t = table(input_p, input_thetam)
+    npt.assert_almost_equal(returned_t, correct_t)
+
+
+def test_table_masked():
+    input_p = ma.asanyarray([850., 700., 500.])
+    input_p[1] = ma.masked
+    returned_t = table(input_p, 20.)
+    npt.assert_(returned_t.mask[1])
+    npt.assert_(not returned_t.mask[0])
+
+
+def test_table_save_load():
+    tmpdir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmpdir, 'table.npz')
+        table.save(path)
+        returned = adiabats.MoistAdiabatTable.load(path)
+        npt.assert_equal(returned.temp, table.temp)
+        npt.assert_equal(returned.thetam, table.thetam)
+        npt.assert_equal(returned.logp, table.logp)
+        npt.assert_equal(returned.version, adiabats.TABLE_VERSION)
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+def test_get_table_check():
+    tmpdir = tempfile.mkdtemp()
+    cache_dir = adiabats.CACHE_DIR
+    adiabats.CACHE_DIR = tmpdir
+    path = os.path.join(tmpdir, adiabats.CACHE_FILE)
+    try:
+        # cached tables on the default grid with stale, corrupted or
+        # unversioned contents are rebuilt
+        stale = adiabats.MoistAdiabatTable(table.thetam, table.logp,
+                                           table.temp + 0.5)
+        corrupt = adiabats.MoistAdiabatTable(table.thetam, table.logp,
+                                             table.temp.copy())
+        corrupt.temp[100:] = 0.
+        old = adiabats.MoistAdiabatTable(table.thetam, table.logp,
+                                         table.temp, version=None)
+        for cached in [stale, corrupt, old]:
+            npt.assert_(not adiabats._check_table(cached))
+            cached.save(path)
+            adiabats._table = None
+            returned = adiabats.get_table()
+            npt.assert_equal(returned.temp, table.temp)
+            npt.assert_equal(adiabats.MoistAdiabatTable.load(path).temp,
+                             table.temp)
+
+        # a valid cached table is loaded as it is
+        npt.assert_(adiabats._check_table(table))
+        marked = adiabats.MoistAdiabatTable(table.thetam, table.logp,
+                                            table.temp.copy())
+        marked.temp[1, 1] += 0.01
+        marked.save(path)
+        adiabats._table = None
+        npt.assert_equal(adiabats.get_table().temp, marked.temp)
+    finally:
+        adiabats.CACHE_DIR = cache_dir
+        adiabats._table = None
+        shutil.rmtree(tmpdir)
+
+
+def test_wetlift_lookup():
+    tmpdir = tempfile.mkdtemp()
+    cache_dir = adiabats.CACHE_DIR
+    adiabats.CACHE_DIR = tmpdir
+    adiabats._table = None
+    try:
+        input_p = 700
+        input_t = 15
+        input_p2 = np.asarray([500., 300., 100.])
+        correct_t = thermo.wetlift(input_p, input_t, input_p2, lookup=False)
+        returned_t = thermo.wetlift(input_p, input_t, input_p2, lookup=True)
+        npt.assert_(np.abs(returned_t - correct_t).max() < adiabats.MAX_ERROR)
+        npt.assert_(os.path.exists(os.path.join(tmpdir, adiabats.CACHE_FILE)))
+
+        adiabats.use_table(True)
+        npt.assert_equal(thermo.wetlift(input_p, input_t, input_p2),
+                         returned_t)
+        adiabats.use_table(False)
+        npt.assert_equal(thermo.wetlift(input_p, input_t, input_p2),
+                         correct_t)
+    finally:
+        adiabats.use_table(False)
+        adiabats.CACHE_DIR = cache_dir
+        adiabats._table = None
+        shutil.rmtree(tmpdir)
@@ -3,7 +3,7 @@ import numpy.ma as ma
 import numpy.testing as npt
 import sharppy.sharptab.interp as interp
 from sharppy.sharptab.utils import vec2comp
-from sharppy.sharptab.profile import Profile
+from sharppy.sharptab.profile import Profile, ProfileCollection
 import test_profile as tp
 
 
@@ -73,6 +73,13 @@ def test_vtmp():
     returned_v = interp.vtmp(prof, input_p)
     npt.assert_almost_equal(returned_v, correct_v)
 
+    # masked levels stay masked
+    input_p = ma.asanyarray(input_p, dtype=np.float64)
+    input_p[1] = ma.masked
+    returned_v = interp.vtmp(prof, input_p)
+    npt.assert_equal(returned_v.mask, [False, True, False, False])
+    npt.assert_almost_equal(returned_v[[0, 2, 3]], correct_v[[0, 2, 3]])
+
 
 def test_components():
     input_p = 900
@@ -133,3 +140,134 @@ def test_to_msl():
 
 
 
+
+
+def test_generic_layer_mean():
+    input_p = np.asarray([1000., 900., 700., 500., 300.])
+    input_f = np.asarray([0., 10., 5., 20., 30.])
+    ps = np.linspace(850., 400., 450001)
+    fs = np.interp(np.log(ps), np.log(input_p[::-1]), input_f[::-1])
+    correct = [ma.average(fs, weights=ps), fs.mean()]
+    returned = [interp.generic_layer_mean(850., 400., input_p, input_f),
+                interp.generic_layer_mean(850., 400., input_p, input_f,
+                                          weighted=False)]
+    npt.assert_almost_equal(returned, correct, decimal=4)
+
+    # masked levels are skipped
+    input_p = ma.asanyarray(input_p)
+    input_p[2] = ma.masked
+    fs = np.interp(np.log(ps), np.log([300., 500., 900., 1000.]),
+                   [30., 20., 10., 0.])
+    returned = interp.generic_layer_mean(850., 400., input_p, input_f)
+    npt.assert_almost_equal(returned, ma.average(fs, weights=ps), decimal=4)
+
+    # many profiles at once
+    input_p = np.vstack([prof.pres, prof.pres])
+    input_f = np.vstack([prof.u, prof.v])
+    input_f = ma.masked_where(np.vstack([prof.u.mask, prof.v.mask]), input_f)
+    correct = [27.380840616294723, 1.6918481586877472]
+    returned = interp.generic_layer_mean([850., 850.], [250., 250.],
+                                         input_p, input_f)
+    npt.assert_almost_equal(returned, correct, decimal=5)
+
+    # a column that does not span the layer is masked, not truncated
+    input_f[1, prof.pres < 400.] = ma.masked
+    returned = interp.generic_layer_mean([850., 850.], [250., 250.],
+                                         input_p, input_f)
+    npt.assert_almost_equal(returned[0], correct[0], decimal=5)
+    npt.assert_(returned.mask[1])
+    returned = interp.generic_layer_mean(1000., 900., prof.pres, prof.u)
+    npt.assert_(returned is ma.masked)
+
+
+def test_interp_plan():
+    input_p = [1050, 976, 900, 800, 600, 400, 100, 50]
+    plan = interp.InterpPlan(prof, input_p)
+    returned = plan.fields('tmpc', 'dwpc', 'hght', 'u', 'v')
+    correct = [interp.temp(prof, input_p), interp.dwpt(prof, input_p),
+               interp.hght(prof, input_p)] + list(interp.components(prof,
+               input_p))
+    for ret, cor in zip(returned, correct):
+        npt.assert_equal(np.isnan(ret), np.isnan(cor))
+        npt.assert_almost_equal(ret[~np.isnan(ret)], cor[~np.isnan(cor)])
+
+    # single level
+    npt.assert_almost_equal(interp.InterpPlan(prof, 900)('u'), -5.53976475)
+
+    # height targets
+    input_h = [0, 1000, 5000, 10000]
+    plan = interp.InterpPlan(prof, h=input_h)
+    npt.assert_almost_equal(10**plan('logp')[1:], interp.pres(prof,
+                            input_h)[1:])
+    npt.assert_(np.isnan(plan('logp')[0]))
+
+
+def test_column_plan():
+    # columns that share the pressure levels of the test sounding
+    pres = prof.pres[prof.sfc:].data
+    tmpc = np.vstack([prof.tmpc[prof.sfc:], prof.tmpc[prof.sfc:] + 5.])
+    input_p = np.asarray([1000, 900, 500, 100])
+    plan = interp.ColumnPlan(np.log10(input_p), np.log10(pres))
+    returned = plan(tmpc)
+    correct = ma.masked_invalid(interp.temp(prof, input_p))
+    npt.assert_equal(returned.shape, (2, 4))
+    npt.assert_(returned.mask[0, 0] and returned.mask[1, 0])
+    npt.assert_almost_equal(returned[0, 1:], correct[1:])
+    npt.assert_almost_equal(returned[1, 1:], correct[1:] + 5.)
+
+    # levels missing per column and a coordinate given per column
+    tmpc = ma.asanyarray(tmpc)
+    tmpc[1, 2:6] = ma.masked
+    returned = interp.generic_interp_columns(np.log10(input_p),
+        np.log10(np.vstack([pres, pres])), tmpc)
+    npt.assert_almost_equal(returned[0, 1:], correct[1:])
+    valid = ~tmpc.mask[1]
+    correct = np.interp(np.log10(input_p[1:]), np.log10(pres[valid][::-1]),
+                        tmpc[1][valid][::-1])
+    npt.assert_almost_equal(returned[1, 1:], correct)
+
+    # a single target gives one value per column
+    returned = interp.generic_interp_columns(np.log10(500.), np.log10(pres),
+                                             tmpc)
+    npt.assert_equal(returned.shape, (2,))
+
+    # leading columns that are all missing, as in a padded batch
+    coord = ma.masked_all((20, pres.size))
+    coord[-1] = np.log10(pres)
+    stack = ma.masked_all(coord.shape)
+    stack[-1] = prof.tmpc[prof.sfc:]
+    returned = interp.ColumnPlan(np.log10(input_p), coord)(stack)
+    npt.assert_(returned[:-1].mask.all())
+    npt.assert_(not returned.mask[-1, 1:].any())
+    npt.assert_almost_equal(returned[-1, 1:],
+                            ma.masked_invalid(interp.temp(prof, input_p))[1:])
+
+
+def test_profile_collection():
+    warm = Profile(pres=prof.pres, hght=prof.hght, tmpc=prof.tmpc + 3.,
+                   dwpc=prof.dwpc, wdir=prof.wdir, wspd=prof.wspd * 2.)
+    profs = [prof, warm]
+    coll = ProfileCollection.from_profiles(profs)
+
+    # one level, one level per profile and several levels per profile
+    input_p = np.array([850., 500.])
+    for p in [500., input_p, np.array([[850., 500., 100.]])]:
+        for func in [interp.temp, interp.dwpt, interp.hght, interp.vtmp]:
+            returned = func(coll, p)
+            for i, q in enumerate(profs):
+                correct = func(q, p if np.ndim(p) != 1 else p[i])
+                npt.assert_almost_equal(returned[i], np.squeeze(correct))
+        u, v = interp.components(coll, p)
+        for i, q in enumerate(profs):
+            correct = interp.components(q, p if np.ndim(p) != 1 else p[i])
+            npt.assert_almost_equal(u[i], np.squeeze(correct[0]))
+            npt.assert_almost_equal(v[i], np.squeeze(correct[1]))
+
+    # heights and levels beyond the top of the profiles
+    msl = interp.to_msl(coll, 3000.)
+    npt.assert_almost_equal(msl, [interp.to_msl(q, 3000.) for q in profs])
+    npt.assert_almost_equal(interp.to_agl(coll, msl), [3000., 3000.])
+    npt.assert_almost_equal(interp.pres(coll, msl),
+                            [interp.pres(q, 3000. + q.hght[q.sfc])
+                             for q in profs])
+    npt.assert_(interp.temp(coll, 1.).mask.all())
@@ -0,0 +1,96 @@
+''' Parity tests between the numpy and numba thermo backends '''
+import warnings
+import numpy as np
+import numpy.ma as ma
+import numpy.testing as npt
+import pytest
+import sharppy.sharptab.thermo as thermo
+import sharppy.sharptab.parcel as parcel
+import sharppy.sharptab.jit as jit
+import test_profile
+
+
+prof = test_profile.TestProfile().prof
+
+# The two backends must agree to within this tolerance (C, g/kg or hPa)
+TOL_PARITY = 1e-10
+
+rs = np.random.RandomState(0)
+p = rs.uniform(100., 1050., 5000)
+t = rs.uniform(-40., 40., 5000)
+td = t - rs.uniform(0., 20., 5000)
+
+requires_numba = pytest.mark.skipif(not jit.HAS_NUMBA,
+                                    reason='numba is not installed')
+
+
+def both(func, *args):
+    thermo.set_backend('numpy')
+    try:
+        correct = func(*args)
+        thermo.set_backend('numba')
+        returned = func(*args)
+    finally:
+        thermo.set_backend('numpy')
+    return correct, returned
+
+
+@requires_numba
+def test_parity_kernels():
+    w = thermo.mixratio(p, td)
+    for func, args in [(thermo.wobf, (t,)),
+                       (thermo.vappres, (t,)),
+                       (thermo.mixratio, (p, t)),
+                       (thermo.lcltemp, (t, td)),
+                       (thermo.temp_at_mixrat, (w, p)),
+                       (thermo.satlift, (p, t)),
+                       (thermo.wetlift, (p, t, p[::-1])),
+                       (thermo.thetae, (p, t, td)),
+                       (thermo.wetbulb, (p, t, td))]:
+        correct, returned = both(func, *args)
+        npt.assert_allclose(returned, correct, rtol=0, atol=TOL_PARITY)
+
+
+@requires_numba
+def test_parity_scalar():
+    correct, returned = both(thermo.satlift, 850., 20.)
+    npt.assert_allclose(returned, correct, rtol=0, atol=TOL_PARITY)
+    correct, returned = both(thermo.wetlift, 700., 15., 100.)
+    npt.assert_allclose(returned, correct, rtol=0, atol=TOL_PARITY)
+
+
+@requires_numba
+def test_parity_masked():
+    input_t = ma.asanyarray([10., 0., -10.])
+    input_t[1] = ma.masked
+    correct, returned = both(thermo.wobf, input_t)
+    npt.assert_(returned.mask[1])
+    npt.assert_allclose(returned[[0, 2]], correct[[0, 2]], rtol=0,
+                        atol=TOL_PARITY)
+
+
+@requires_numba
+def test_parity_parcel():
+    correct, returned = both(parcel.parcelx, prof)
+    for attr in ['lclpres', 'lfcpres', 'elpres', 'bplus', 'bminus', 'b3km',
+                 'bm10m30']:
+        npt.assert_allclose(getattr(returned, attr), getattr(correct, attr),
+                            rtol=1e-8, atol=TOL_PARITY)
+
+
+def test_set_backend():
+    npt.assert_equal(thermo.get_backend(), 'numpy')
+    npt.assert_raises(ValueError, thermo.set_backend, 'fortran')
+    has_numba = jit.HAS_NUMBA
+    jit.HAS_NUMBA = False
+    try:
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter('always')
+            thermo.set_backend('numba')
+        npt.assert_equal(len(w), 1)
+        npt.assert_equal(thermo.get_backend(), 'numpy')
+        thermo.set_backend('auto')
+        npt.assert_equal(thermo.get_backend(), 'numpy')
+    finally:
+        jit.HAS_NUMBA = has_numba
+        thermo.set_backend('numpy')
@@ -0,0 +1,136 @@
+import numpy as np
+import numpy.ma as ma
+import numpy.testing as npt
+import sharppy.sharptab.parcel as parcel
+import sharppy.sharptab.interp as interp
+import sharppy.sharptab.thermo as thermo
+from sharppy.sharptab.profile import Profile, ProfileCollection
+from sharppy.sharptab.constants import *
+import test_profile
+
+
+prof = test_profile.TestProfile().prof
+
+
+def test_parcelx_surface():
+    pcl = parcel.parcelx(prof)
+    npt.assert_almost_equal(pcl.pres, prof.pres[prof.sfc])
+    correct = [879.8949707815297, 870.3216351840085, 879.8949707815297,
+               870.3216351840085, 192.3674017132846, 11779.783341397479]
+    returned = [pcl.lclpres, pcl.lclhght, pcl.lfcpres, pcl.lfchght,
+                pcl.elpres, pcl.elhght]
+    npt.assert_almost_equal(returned, correct, decimal=4)
+    correct = [2392.3203433664867, 0., 125.665476368882, 807.5886718444655]
+    returned = [pcl.bplus, pcl.bminus, pcl.b3km, pcl.bm10m30]
+    npt.assert_almost_equal(returned, correct, decimal=4)
+
+
+def test_parcelx_defined():
+    pcl = parcel.parcelx(prof, 850., 10.6, 9.5)
+    correct = [835.9033667953873, 1299.3215308772724, 668.9857332101875,
+               3123.434015287626, 216.89754709613217, 11047.525621951914]
+    returned = [pcl.lclpres, pcl.lclhght, pcl.lfcpres, pcl.lfchght,
+                pcl.elpres, pcl.elhght]
+    npt.assert_almost_equal(returned, correct, decimal=4)
+    correct = [826.1717037646101, -65.74011643151303, 0.,
+               390.20352419179187]
+    returned = [pcl.bplus, pcl.bminus, pcl.b3km, pcl.bm10m30]
+    npt.assert_almost_equal(returned, correct, decimal=4)
+
+
+def test_parcelx_stable():
+    pcl = parcel.parcelx(prof, 500., -17.9, -40.)
+    npt.assert_(pcl.lfcpres is ma.masked)
+    npt.assert_(pcl.elpres is ma.masked)
+    npt.assert_equal([pcl.bplus, pcl.bminus, pcl.b3km, pcl.bm10m30],
+                     [0., 0., 0., 0.])
+
+
+def test_parcelx_fine_integration():
+    # Compare against a brute force integration of the parcel every 0.25 hPa
+    pcl = parcel.parcelx(prof, 850., 10.6, 9.5)
+    ps = np.arange(850., 150., -0.25)
+    lclp, lclt = thermo.drylift(850., 10.6, 9.5)
+    w = thermo.mixratio(850., 9.5)
+    tp = np.where(ps >= lclp, thermo.theta(850., 10.6, ps),
+                  thermo.wetlift(lclp, lclt, ps))
+    tdp = np.where(ps >= lclp, thermo.temp_at_mixrat(w, ps), tp)
+    vtp = thermo.virtemp(ps, tp, tdp)
+    vte = thermo.virtemp(ps, interp.temp(prof, ps), interp.dwpt(prof, ps))
+    b = G * (vtp - vte) / thermo.ctok(vte)
+    h = interp.to_agl(prof, interp.hght(prof, ps))
+    area = 0.5 * (b[1:] + b[:-1]) * np.diff(h)
+    hmid = 0.5 * (h[1:] + h[:-1])
+    cape = area[(area > 0) & (hmid > pcl.lfchght) & (hmid < pcl.elhght)]
+    cin = area[(area < 0) & (hmid < pcl.lfchght)]
+    npt.assert_allclose(pcl.bplus, cape.sum(), rtol=0.01)
+    npt.assert_allclose(pcl.bminus, cin.sum(), rtol=0.01)
+
+
+def test_lift_parcels():
+    input_p = [prof.pres[prof.sfc], 850., 500., 700.]
+    input_t = [prof.tmpc[prof.sfc], 10.6, -17.9, 3.]
+    input_td = [prof.dwpc[prof.sfc], 9.5, -40., -6.]
+    returned = parcel.lift_parcels(prof, input_p, input_t, input_td)
+    npt.assert_equal(len(returned), 4)
+    for p, t, td, pcl in zip(input_p, input_t, input_td, returned):
+        correct = parcel.parcelx(prof, p, t, td)
+        for attr in ['lclpres', 'lclhght', 'bplus', 'bminus', 'b3km',
+                     'bm10m30']:
+            npt.assert_almost_equal(getattr(pcl, attr),
+                                    getattr(correct, attr))
+        npt.assert_almost_equal(pcl.ptrace, correct.ptrace)
+        npt.assert_almost_equal(pcl.ttrace, correct.ttrace)
+    npt.assert_almost_equal(returned[1].bplus, 826.1717037646101, decimal=4)
+    npt.assert_(returned[2].lfcpres is ma.masked)
+    npt.assert_(returned[3].bplus > 0)
+
+
+def test_most_unstable_level():
+    correct_p = 976.
+    returned_p = parcel.most_unstable_level(prof)
+    npt.assert_almost_equal(returned_p, correct_p)
+    returned_p = parcel.most_unstable_level(prof, exact=False)
+    npt.assert_almost_equal(returned_p, correct_p)
+
+    # elevated moist layer above a cool, dry surface layer
+    p = [1000, 950, 900, 850, 800, 700, 600, 500, 400, 300]
+    z = [100, 540, 990, 1460, 1950, 3010, 4200, 5570, 7180, 9160]
+    t = [10, 8, 12, 14, 11, 4, -4, -13, -25, -40]
+    d = [-5, -6, 10, 12, 2, -10, -20, -30, -40, -55]
+    wd = [90, 120, 180, 200, 220, 240, 250, 260, 270, 270]
+    ws = [10, 15, 30, 35, 35, 40, 45, 50, 60, 70]
+    elev = Profile(pres=p, hght=z, tmpc=t, dwpc=d, wdir=wd, wspd=ws)
+    returned_p = parcel.most_unstable_level(elev)
+    thetae = [thermo.thetae(pp, tt, dd) for pp, tt, dd in zip(p, t, d)]
+    correct_p = p[np.argmax(thetae[:8])]
+    npt.assert_almost_equal(returned_p, correct_p)
+    returned_p = parcel.most_unstable_level(elev, dp=-5, exact=False)
+    npt.assert_almost_equal(returned_p, correct_p)
+    returned_p = parcel.most_unstable_level(elev, depth=25)
+    npt.assert_almost_equal(returned_p, 1000.)
+
+
+def test_mixed_layer():
+    correct = [976., 21.387465825720597, 13.241822906099571]
+    returned = parcel.mixed_layer(prof)
+    npt.assert_almost_equal(returned, correct)
+
+    # compare against the mean of a 1 hPa resampled layer
+    ps = np.arange(976., 875., -1)
+    correct_theta = ma.average(thermo.theta(ps, interp.temp(prof, ps)),
+                               weights=ps)
+    correct_mr = ma.average(thermo.mixratio(ps, interp.dwpt(prof, ps)),
+                            weights=ps)
+    npt.assert_almost_equal(parcel.mean_theta(prof), correct_theta, decimal=1)
+    npt.assert_almost_equal(parcel.mean_mixratio(prof), correct_mr,
+                            decimal=1)
+
+    # many profiles at once
+    returned = parcel.mixed_layer([prof, prof, prof], depth=100)
+    for field, value in zip(returned, correct):
+        npt.assert_almost_equal(field, [value, value, value])
+    coll = ProfileCollection.from_profiles([prof, prof])
+    returned = parcel.mixed_layer(coll, depth=100)
+    for field, value in zip(returned, correct):
+        npt.assert_almost_equal(field, [value, value])
@@ -1,8 +1,12 @@
+import os
+import pickle
+import shutil
+import tempfile
 import numpy as np
 import numpy.ma as ma
-from sharppy.sharptab import constants
+from sharppy.sharptab import constants, interp, thermo
 from sharppy.sharptab.constants import MISSING
-from sharppy.sharptab.profile import Profile
+from sharppy.sharptab.profile import Profile, ProfileCollection
 import numpy.testing as npt
 
 sounding = """
@@ -208,3 +212,318 @@ class TestProfile(object):
         npt.assert_almost_equal(prof.sfc, sfc_ind)
 
 
+def test_valid_levels():
+    prof = TestProfile().prof
+    logp, field = prof.valid_levels('wspd')
+    valid = ~(prof.logp.mask | prof.wspd.mask)
+    npt.assert_equal(logp, prof.logp[valid][::-1].data)
+    npt.assert_equal(field, prof.wspd[valid][::-1].data)
+    npt.assert_(np.all(np.diff(logp) > 0))
+    npt.assert_(prof.valid_levels('wspd')[1] is field)
+
+
+def test_reset_cache():
+    prof = TestProfile().prof
+    field = prof.valid_levels('tmpc')[1]
+
+    # replacing a data array discards the cached views
+    prof.tmpc = prof.tmpc + 1.
+    npt.assert_almost_equal(prof.valid_levels('tmpc')[1], field + 1.)
+
+    # changes made in place discard the cached arrays as well
+    field = prof.valid_levels('tmpc')[1]
+    prof.tmpc[prof.sfc] = ma.masked
+    npt.assert_equal(prof.valid_levels('tmpc')[1], field[:-1])
+
+    i = prof.sfc + 3
+    p = prof.pres[i]
+    temp, theta = interp.temp(prof, p), prof.theta[i]
+    layer = interp._layer_mean(prof, 'tmpc', p + 5., p - 5.)
+    prof.tmpc[i] += 10.
+    npt.assert_almost_equal(interp.temp(prof, p), temp + 10.)
+    npt.assert_(prof.theta[i] > theta + 9.)
+    npt.assert_(interp._layer_mean(prof, 'tmpc', p + 5., p - 5.) > layer)
+    prof.tmpc.mask = False
+    npt.assert_(prof.valid('tmpc').all())
+    prof.tmpc -= 10.
+    npt.assert_almost_equal(interp.temp(prof, p), temp)
+
+    # so do writes through views of a data array
+    prof.tmpc[:i+1][i] += 10.
+    npt.assert_almost_equal(interp.temp(prof, p), temp + 10.)
+    prof.tmpc[i:][0] = ma.masked
+    npt.assert_(prof.tmpc[i] is ma.masked)
+    npt.assert_(not prof.valid('tmpc')[i])
+
+    # and writes in the NaN storage mode
+    nprof = TestProfile().prof.to_nan()
+    temp = interp.temp(nprof, p)
+    nprof.tmpc[i] += 10.
+    npt.assert_almost_equal(interp.temp(nprof, p), temp + 10.)
+    nprof.tmpc[:i+1][i] -= 10.
+    npt.assert_almost_equal(interp.temp(nprof, p), temp)
+    nprof.tmpc[i:][0] = np.nan
+    npt.assert_(not nprof.valid('tmpc')[i])
+
+    # other writes are refused rather than leaving the caches stale
+    for field in [prof.tmpc.data, prof.tmpc.mask]:
+        npt.assert_raises(ValueError, field.__setitem__, 0, 1.)
+
+
+def test_derived_wind_writes():
+    # changes to the derived wind arrays are kept in the stored pair
+    for nan in (False, True):
+        prof = TestProfile().prof
+        if nan:
+            prof = prof.to_nan()
+        i = np.flatnonzero(prof.valid('u'))[3]
+        u, v, wspd = prof.u[i], prof.v[i], prof.wspd.copy()
+        prof.u[i] = 99.
+        npt.assert_almost_equal(prof.u[i], 99.)
+        prof.tmpc[10] += 1.
+        npt.assert_almost_equal(prof.u[i], 99.)
+        npt.assert_almost_equal(prof.v[i], v)
+        npt.assert_almost_equal(prof.wspd[i], np.hypot(99., v))
+        npt.assert_almost_equal(interp.components(prof, prof.pres[i]),
+                                (99., v))
+        # the other levels are left as they were
+        other = np.arange(len(wspd)) != i
+        npt.assert_equal(prof.wspd[other], wspd[other])
+
+        prof.v[i:i+2] *= 2.
+        npt.assert_almost_equal(prof.v[i], 2. * v)
+        prof.u[i] = u
+        npt.assert_almost_equal(prof.wspd[i], np.hypot(u, 2. * v))
+
+
+def test_filled_levels():
+    prof = TestProfile().prof
+    logp = prof.valid_levels('logp')[0]
+    filled = prof.filled_levels('wspd')
+    npt.assert_equal(filled.shape, logp.shape)
+    correct = np.interp(logp, *prof.valid_levels('wspd'))
+    npt.assert_almost_equal(filled[~np.isnan(filled)],
+                            correct[~np.isnan(filled)])
+    # the lowest level has no wind and lies below the first valid one
+    npt.assert_(np.isnan(filled[-1]))
+
+
+def test_integrals():
+    prof = TestProfile().prof
+    hght, field = prof.valid_levels('u', 'hght')
+    z, cum = prof.integrals('u', 'hght')
+    npt.assert_(z is hght)
+    npt.assert_almost_equal(cum[0], np.concatenate(([0.],
+        np.cumsum(np.diff(z) * (field[1:] + field[:-1]) / 2.))))
+
+    # integrals between arbitrary levels agree with the exact layer mean
+    for pbot, ptop in [(850., 250.), (prof.pres[prof.sfc], 500.3)]:
+        p, cum = prof.integrate('u', np.array([pbot, ptop]))
+        npt.assert_almost_equal(p, [pbot, ptop])
+        correct = interp.generic_layer_mean(pbot, ptop, prof.pres, prof.u,
+                                            weighted=False)
+        npt.assert_almost_equal((cum[0, 0] - cum[0, 1]) / (pbot - ptop),
+                                correct)
+        correct = interp.generic_layer_mean(pbot, ptop, prof.pres, prof.u)
+        npt.assert_almost_equal((cum[1, 0] - cum[1, 1]) /
+                                ((pbot**2 - ptop**2) / 2.), correct)
+        for level in (pbot, ptop):
+            npt.assert_almost_equal(prof.integrate('u', level)[1],
+                                    prof.integrate('u', [level])[1][:, 0])
+
+    # the weighted height integral is exact for data linear in height
+    zq = np.linspace(z[0], z[-1], 20001)
+    fq = np.interp(zq, z, field)
+    level, cum = prof.integrate('u', [z[0], z[-1]], 'hght')
+    npt.assert_almost_equal(level, [z[0], z[-1]])
+    npt.assert_almost_equal((cum[1, 1] - cum[1, 0]) / 1e6,
+                            np.trapz(fq * zq, zq) / 1e6, 2)
+
+    # levels beyond the valid levels are NaN rather than clipped
+    level, cum = prof.integrate('u', [z[0] - 100., z[-1], z[-1] + 100.],
+                                'hght')
+    npt.assert_equal(np.isnan(level), [True, False, True])
+    npt.assert_equal(np.isnan(cum), [[True, False, True]] * 2)
+    psfc = prof.pres[prof.sfc]
+    for level in [psfc + 10., 0., -5., np.nan]:
+        npt.assert_(np.isnan(prof.integrate('u', level)[1]).all())
+        npt.assert_(np.isnan(prof.integrate('u', [level])[1]).all())
+    npt.assert_(not np.isnan(prof.integrate('u', psfc)[1]).any())
+
+
+def test_derived():
+    prof = TestProfile().prof
+    valid = ~(prof.pres.mask | prof.tmpc.mask | prof.dwpc.mask)
+    p, t, td = prof.pres[valid], prof.tmpc[valid], prof.dwpc[valid]
+    npt.assert_almost_equal(prof.theta[valid], thermo.theta(p, t))
+    npt.assert_almost_equal(prof.thetae[valid], thermo.thetae(p, t, td))
+    npt.assert_almost_equal(prof.wetbulb[valid], thermo.wetbulb(p, t, td))
+    npt.assert_almost_equal(prof.wvmr[valid], thermo.mixratio(p, td))
+    npt.assert_almost_equal(prof.relh[valid], thermo.relh(p, t, td))
+    npt.assert_almost_equal(prof.vtmp[valid], thermo.virtemp(p, t, td))
+    npt.assert_equal(prof.thetae.mask, ~valid)
+
+    # derived arrays are computed once and dropped when the data changes
+    thetae = prof.thetae
+    npt.assert_(prof.thetae is thetae)
+    prof.tmpc = prof.tmpc + 1.
+    npt.assert_(prof.thetae is not thetae)
+    npt.assert_(np.all(prof.thetae[valid] > thetae[valid]))
+
+
+def test_nan_mode():
+    prof = TestProfile().prof
+    data = [pres, hght, tmpc, dwpc, wdir, wspd]
+    copies = [field.copy() for field in data]
+    nprof = Profile(pres=pres, hght=hght, tmpc=tmpc, dwpc=dwpc, wdir=wdir,
+                    wspd=wspd, nan=True)
+    for field, copy in zip(data, copies):
+        npt.assert_equal(field.data, copy.data)
+        npt.assert_equal(field.mask, copy.mask)
+    npt.assert_equal(nprof.sfc, prof.sfc)
+    for name in ['pres', 'hght', 'tmpc', 'dwpc', 'logp', 'u', 'v', 'wdir',
+                 'wspd']:
+        field = getattr(nprof, name)
+        npt.assert_(isinstance(field, np.ndarray))
+        npt.assert_(not isinstance(field, ma.MaskedArray))
+        npt.assert_equal(field, getattr(prof, name).filled(np.nan))
+        npt.assert_equal(getattr(prof.to_nan(), name), field)
+        masked = getattr(nprof.to_masked(), name)
+        npt.assert_equal(masked.mask, getattr(prof, name).mask)
+        npt.assert_equal(masked.filled(), getattr(prof, name).filled())
+
+    # the routines give the same results on plain arrays
+    p = np.linspace(1000., 100., 10)
+    npt.assert_equal(interp.temp(nprof, p), interp.temp(prof, p))
+    npt.assert_equal(nprof.thetae, prof.thetae.filled(np.nan))
+    npt.assert_equal(nprof.valid_levels('u'), prof.valid_levels('u'))
+
+
+def test_block_storage():
+    prof = Profile(pres=pres, hght=hght, tmpc=tmpc, dwpc=dwpc, wdir=wdir,
+                   wspd=wspd)
+    npt.assert_(not hasattr(prof, '__dict__'))
+    npt.assert_(prof.pres is prof.pres)
+    for name in ['pres', 'hght', 'tmpc', 'dwpc', 'logp', 'wdir', 'wspd']:
+        npt.assert_(np.may_share_memory(getattr(prof, name), prof._data))
+
+    # masking a value in place writes through to the profile
+    prof.tmpc[0] = ma.masked
+    npt.assert_(not prof.valid('tmpc')[0])
+
+    # the other wind pair is derived on demand and can replace the stored one
+    u, v = prof.u, prof.v
+    npt.assert_(not np.may_share_memory(u, prof._data))
+    prof.u = u + 5.
+    npt.assert_almost_equal(prof.u, u + 5.)
+    npt.assert_almost_equal(prof.v, v)
+    npt.assert_(np.may_share_memory(prof.u, prof._data[5]))
+
+
+def test_pickle():
+    bad = pres.copy()
+    bad[3] = MISSING
+    for nan in [False, True]:
+        prof = Profile(pres=bad, hght=hght, tmpc=tmpc, dwpc=dwpc, wdir=wdir,
+                       wspd=wspd, nan=nan)
+        # the log10 of missing pressures is NaN rather than left unset
+        npt.assert_(np.isnan(ma.getdata(prof.logp)[3]))
+        prof.thetae
+        for protocol in [0, 1, 2]:
+            copy = pickle.loads(pickle.dumps(prof, protocol))
+            npt.assert_equal(copy.nan, nan)
+            npt.assert_equal(copy.sfc, prof.sfc)
+            for name in ['pres', 'logp', 'tmpc', 'u', 'wspd', 'thetae']:
+                npt.assert_equal(ma.getdata(getattr(copy, name)),
+                                 ma.getdata(getattr(prof, name)))
+                npt.assert_equal(ma.getmask(getattr(copy, name)),
+                                 ma.getmask(getattr(prof, name)))
+    copy.tmpc = copy.tmpc + 1.
+    copy = pickle.loads(pickle.dumps(copy, 0))
+    npt.assert_equal(copy.tmpc, prof.tmpc + 1.)
+
+
+def test_from_buffers():
+    prof = TestProfile().prof
+    names = ['pres', 'hght', 'tmpc', 'dwpc', 'wdir', 'wspd']
+    block = np.array([ma.getdata(f) for f in [pres, hght, tmpc, dwpc, wdir,
+                                                wspd]])
+    source = block.copy()
+    bprof = Profile.from_buffers(**dict(zip(names, block)))
+    for i, name in enumerate(names):
+        field = getattr(bprof, name)
+        npt.assert_(np.may_share_memory(field, block[i]))
+        npt.assert_equal(field.mask, getattr(prof, name).mask)
+        npt.assert_equal(field.filled(), getattr(prof, name).filled())
+    npt.assert_equal(bprof.logp.filled(), prof.logp.filled())
+    npt.assert_equal(bprof.u.filled(), prof.u.filled())
+    npt.assert_equal(bprof.sfc, prof.sfc)
+    npt.assert_equal(block, source)
+
+    # the log10 of missing pressures is NaN rather than left unset
+    bad = block.copy()
+    bad[0, 3] = MISSING
+    for nan in [False, True]:
+        bprof = Profile.from_buffers(nan=nan, **dict(zip(names, bad)))
+        npt.assert_(np.isnan(ma.getdata(bprof.logp)[3]))
+        npt.assert_equal(ma.getdata(bprof.logp)[4:],
+                         ma.getdata(prof.logp)[4:])
+
+    # float32 rows of a read-only memory map are wrapped as they are
+    tmpdir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmpdir, 'soundings.dat')
+        mm = np.memmap(path, dtype=np.float32, mode='w+', shape=block.shape)
+        mm[:] = block
+        mm.flush()
+        del mm
+        mm = np.memmap(path, dtype=np.float32, mode='r', shape=block.shape)
+        for nan in [False, True]:
+            mprof = Profile.from_buffers(nan=nan, **dict(zip(names, mm)))
+            npt.assert_(np.may_share_memory(mprof.pres, mm))
+            npt.assert_equal(mprof.valid('tmpc', 'wdir'),
+                             prof.valid('tmpc', 'wdir'))
+            p = np.linspace(1000., 100., 10)
+            npt.assert_almost_equal(interp.temp(mprof, p),
+                                    interp.temp(prof, p), 4)
+        npt.assert_(not np.may_share_memory(mprof.wdir, mm))
+        npt.assert_(np.isnan(mprof.wdir[0]))
+        npt.assert_equal(mm, block.astype(np.float32))
+        del mm, mprof
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+def test_profile_collection():
+    prof = TestProfile().prof
+    top = Profile(pres=pres[:80], hght=hght[:80], tmpc=tmpc[:80],
+                  dwpc=dwpc[:80], wdir=wdir[:80], wspd=wspd[:80])
+    coll = ProfileCollection.from_profiles([top, prof])
+    npt.assert_equal(len(coll), 2)
+    npt.assert_equal(coll.pres.shape, (2, prof.pres.size))
+    npt.assert_equal(coll.nlevels, [80, prof.pres.size])
+    npt.assert_equal(coll.sfc, [prof.sfc, prof.sfc])
+    npt.assert_equal(coll.sfc_values('hght'), [hght[prof.sfc]] * 2)
+    npt.assert_(coll.valid('pres')[0, :80].all())
+    npt.assert_(not coll.valid('pres')[0, 80:].any())
+    for name in ['pres', 'hght', 'tmpc', 'dwpc', 'logp', 'u', 'v', 'wdir',
+                 'wspd']:
+        field = getattr(coll, name)
+        npt.assert_equal(field[1].mask, getattr(prof, name).mask)
+        npt.assert_almost_equal(field[1].compressed(),
+                                getattr(prof, name).compressed())
+        npt.assert_equal(getattr(coll[0], name).mask,
+                         getattr(top, name).mask)
+        npt.assert_equal(getattr(coll[0], name).filled(),
+                         getattr(top, name).filled())
+
+    # (profile x level) arrays with missing values flagged or NaN
+    block = np.array([ma.getdata(f) for f in [pres, hght, tmpc, dwpc, wdir,
+                                                wspd]])
+    block[2, prof.sfc + 1] = np.nan
+    stack = [np.vstack([row, row]) for row in block]
+    coll = ProfileCollection(**dict(zip(['pres', 'hght', 'tmpc', 'dwpc',
+                                         'wdir', 'wspd'], stack)))
+    npt.assert_equal(coll.sfc, [prof.sfc, prof.sfc])
+    npt.assert_(coll.tmpc.mask[:, prof.sfc + 1].all())
+    npt.assert_equal(coll.wdir.mask[0], prof.wdir.mask)
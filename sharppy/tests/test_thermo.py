@@ -234,6 +234,22 @@ def test_wobf():
     returned_c = thermo.wobf(input_t)
     npt.assert_almost_equal(returned_c, correct_c)
 
+    # preallocated output
+    out = np.empty(3)
+    returned_c = thermo.wobf(input_t, out=out)
+    npt.assert_(returned_c is out)
+    npt.assert_almost_equal(out, correct_c)
+
+    # masked array_like pass
+    input_t = ma.asanyarray(input_t)
+    input_t[1] = ma.masked
+    returned_c = thermo.wobf(input_t)
+    npt.assert_(returned_c.mask[1])
+    npt.assert_almost_equal(returned_c[[0, 2]], correct_c[[0, 2]])
+
+    # single masked
+    npt.assert_(thermo.wobf(ma.masked) is ma.masked)
+
 
 def test_lcltemp():
     input_t = 10
@@ -447,3 +463,134 @@ def test_relh():
 
 
 
+
+
+def test_satlift_array():
+    input_p = np.asarray([1000., 850., 700., 500., 300., 100.])
+    input_thetam = np.asarray([20., 20., 15., 30., -10., 25.])
+    correct_t = [thermo.satlift(p, thm) for p, thm in
+                 zip(input_p, input_thetam)]
+    returned_t = thermo.satlift(input_p, input_thetam)
+    npt.assert_almost_equal(returned_t, correct_t)
+
+    # broadcast a single parcel over many levels
+    input_p = np.linspace(1000., 100., 50)
+    correct_t = [thermo.satlift(p, 20.) for p in input_p]
+    returned_t = thermo.satlift(input_p, 20.)
+    npt.assert_almost_equal(returned_t, correct_t)
+
+    # masked array_like pass
+    input_p = ma.asanyarray([850., 700., 500.])
+    input_p[1] = ma.masked
+    returned_t = thermo.satlift(input_p, 20.)
+    npt.assert_(returned_t.mask[1])
+    npt.assert_almost_equal(returned_t[0], 13.712979340608157)
+
+
+def test_wetlift_array():
+    input_p = np.asarray([700., 850., 950.])
+    input_t = np.asarray([15., 10., 20.])
+    input_p2 = np.asarray([100., 500., 300.])
+    correct_t = [thermo.wetlift(p, t, p2) for p, t, p2 in
+                 zip(input_p, input_t, input_p2)]
+    returned_t = thermo.wetlift(input_p, input_t, input_p2)
+    npt.assert_almost_equal(returned_t, correct_t)
+    npt.assert_almost_equal(returned_t[0], -81.27400812504021)
+
+
+def test_moist_array():
+    input_p = np.asarray([925., 950.])
+    input_t = np.asarray([7., 20.])
+    input_td = np.asarray([3., 14.])
+    correct_t = [28.864469418729357, 57.68849564698746]
+    returned_t = thermo.thetae(input_p, input_t, input_td)
+    npt.assert_almost_equal(returned_t, correct_t)
+
+    correct_t = [8.69793773351298, 18.21065472362592]
+    returned_t = thermo.thetaw(input_p, input_t, input_td)
+    npt.assert_almost_equal(returned_t, correct_t)
+
+    input_p = np.asarray([950., 1013.])
+    input_t = np.asarray([5., 5.])
+    input_td = np.asarray([-10., -10.])
+    correct_t = [-0.04811002960985089, 0.22705033380623352]
+    returned_t = thermo.wetbulb(input_p, input_t, input_td)
+    npt.assert_almost_equal(returned_t, correct_t)
+
+    input_lev = np.asarray([100., 500.])
+    correct_t = [thermo.lifted(950., 30., 25., lev) for lev in input_lev]
+    returned_t = thermo.lifted(950., 30., 25., input_lev)
+    npt.assert_almost_equal(returned_t, correct_t)
+    npt.assert_almost_equal(returned_t[0], -79.05621246586672)
+
+
+def test_out_workspace():
+    input_p = np.asarray([1000., 850., 700., 500., 300.])
+    input_t = np.asarray([25., 15., 5., -10., -40.])
+    input_td = np.asarray([20., 5., -5., -25., -50.])
+    input_w = np.asarray([15., 6., 3., 0.8, 0.05])
+    ws = thermo.Workspace()
+    out = np.empty(5)
+    calls = [(thermo.theta, (input_p, input_t, 1000.)),
+             (thermo.lcltemp, (input_t, input_td)),
+             (thermo.virtemp, (input_p, input_t, input_td)),
+             (thermo.relh, (input_p, input_t, input_td)),
+             (thermo.mixratio, (input_p, input_td)),
+             (thermo.temp_at_mixrat, (input_w, input_p)),
+             (thermo.wobf, (input_t,)),
+             (thermo.wetlift, (input_p, input_t, 200.))]
+    for func, args in calls:
+        correct = func(*args)
+        returned = func(*args, out=out, ws=ws)
+        npt.assert_(returned is out)
+        npt.assert_array_equal(out, correct)
+    returned = thermo.vappres(input_t, out=out)
+    npt.assert_array_equal(out, thermo.vappres(input_t))
+    returned = thermo.satlift(input_p, input_t, out=out)
+    npt.assert_array_equal(out, thermo.satlift(input_p, input_t))
+
+    # the workspace hands back the same scratch arrays
+    buffers = dict(ws.buffers)
+    thermo.virtemp(input_p, input_t, input_td, out=out, ws=ws)
+    for name, buf in ws.buffers.items():
+        npt.assert_(buffers[name] is buf)
+
+    # masked array_like pass
+    input_td = ma.asanyarray(input_td)
+    input_td[2] = ma.masked
+    returned = thermo.mixratio(input_p, input_td, out=out, ws=ws)
+    npt.assert_(returned.mask[2])
+    npt.assert_almost_equal(returned[[0, 1]],
+        thermo.mixratio(input_p[[0, 1]], input_td[[0, 1]]))
+
+
+def test_scalar_paths():
+    # python numbers take the scalar paths; 0-d arrays take the array paths
+    for p, t, td in [(1000., 20., 15.), (850, 10, 2), (500., -20., -35.)]:
+        args = (p, t, td)
+        arrs = [np.array(arg) for arg in args]
+        npt.assert_equal(thermo.theta(p, t), thermo.theta(*arrs[:2]))
+        npt.assert_equal(thermo.lcltemp(t, td), thermo.lcltemp(*arrs[1:]))
+        npt.assert_equal(thermo.wobf(t), thermo.wobf(arrs[1]))
+        npt.assert_equal(thermo.satlift(p, t), thermo.satlift(*arrs[:2]))
+        npt.assert_equal(thermo.wetlift(p, t, 200.),
+                         thermo.wetlift(arrs[0], arrs[1], np.array(200.)))
+        npt.assert_(isinstance(thermo.wetlift(p, t, 200.), float))
+
+
+def test_missing_scalars():
+    # missing input comes back missing instead of stalling the iteration
+    npt.assert_(np.isnan(thermo.satlift(500., np.nan)))
+    npt.assert_(np.isnan(thermo.wetlift(1000., np.nan, 500.)))
+    npt.assert_(np.isnan(thermo.thetae(1000., np.nan, np.nan)))
+    npt.assert_(thermo.satlift(500., ma.masked) is ma.masked)
+    npt.assert_(thermo.wetlift(1000., ma.masked, 500.) is ma.masked)
+    npt.assert_(thermo.thetae(1000., ma.masked, ma.masked) is ma.masked)
+    npt.assert_(thermo.theta(0., 20.) is ma.masked)
+    returned = thermo.theta(np.array([0., 500.]), np.array([10., 10.]))
+    npt.assert_equal(ma.getmaskarray(returned), [True, False])
+    npt.assert_almost_equal(returned[1], thermo.theta(500., 10.))
+    returned = thermo.theta(np.array([0., 500.]), 10.,
+                            out=np.empty(2))
+    npt.assert_equal(ma.getmaskarray(returned), [True, False])
+    npt.assert_(thermo.wetlift(0., 20., 500.) is ma.masked)
@@ -235,3 +235,47 @@ def test_mag_user_missing_array():
     correct_answer[correct_answer == missing] = ma.masked
     returned_answer = utils.mag(input_u, input_v, missing)
     npt.assert_almost_equal(returned_answer, correct_answer)
+
+def test_scalar_paths():
+    # python numbers take the scalar paths; 0-d arrays take the array paths
+    for wdir, wspd in [(225, 7.0710678118654755), (0., 5.), (359.5, 42.)]:
+        returned = utils.vec2comp(wdir, wspd)
+        correct = utils.vec2comp(np.array(wdir), np.array(wspd))
+        npt.assert_equal(returned, correct)
+    for u, v in [(5., 5.), (0., -5.), (-12.5, 3)]:
+        returned = utils.comp2vec(u, v)
+        correct = utils.comp2vec(np.array(u), np.array(v))
+        npt.assert_equal(returned, correct)
+        npt.assert_equal(utils.mag(u, v), utils.mag(np.array(u), np.array(v)))
+    npt.assert_(utils.mag(MISSING, 5.) is ma.masked)
+    # non-finite numbers come back masked
+    for u, v in [(np.nan, 5.), (5., np.nan), (np.inf, 3.)]:
+        npt.assert_(utils.comp2vec(u, v)[0] is ma.masked)
+        npt.assert_(utils.comp2vec(u, v)[1] is ma.masked)
+        npt.assert_(utils.mag(u, v) is ma.masked)
+
+def test_many_paths():
+    # plain float stacks with NaN for missing match the masked paths
+    wdir = np.array([[0., 45., 180., 359.5], [270., np.nan, 720., 90.]])
+    wspd = np.array([[5., 10., 0., 42.], [12.5, 20., 7., np.nan]])
+    valid = ~(np.isnan(wdir) | np.isnan(wspd))
+    u, v = utils.vec2comp_many(wdir, wspd)
+    correct_u, correct_v = utils.vec2comp(wdir[valid], wspd[valid])
+    npt.assert_equal(u[valid], correct_u)
+    npt.assert_equal(v[valid], correct_v)
+    npt.assert_(np.all(np.isnan(u[~valid])))
+
+    wd, ws = utils.comp2vec_many(u, v)
+    correct_wd, correct_ws = utils.comp2vec(u[valid], v[valid])
+    npt.assert_equal(wd[valid], correct_wd)
+    npt.assert_equal(ws[valid], correct_ws)
+    npt.assert_equal(utils.mag_many(u, v), ws)
+
+    # the results can overwrite the inputs
+    returned = utils.vec2comp_many(wdir, wspd, out=(wdir, wspd))
+    npt.assert_(returned[0] is wdir and returned[1] is wspd)
+    npt.assert_equal(wdir, u)
+    npt.assert_equal(wspd, v)
+    utils.comp2vec_many(wdir, wspd, out=(wdir, wspd))
+    npt.assert_equal(wdir, wd)
+    npt.assert_equal(wspd, ws)
@@ -4,12 +4,16 @@ import numpy.testing as npt
 import sharppy.sharptab.winds as winds
 import sharppy.sharptab.utils as utils
 import sharppy.sharptab.interp as interp
-from sharppy.sharptab.profile import Profile
+from sharppy.sharptab.profile import Profile, ProfileCollection
 import test_profile
 
 
 prof = test_profile.TestProfile().prof
 
+# the test sounding without its surface wind
+nosfc = test_profile.TestProfile().prof
+nosfc.wdir[nosfc.sfc] = ma.masked
+
 
 import time
 def test_mean_wind():
@@ -24,6 +28,32 @@ def test_mean_wind_npw():
     npt.assert_almost_equal(returned, [correct_u, correct_v])
 
 
+def test_mean_wind_exact():
+    returned = winds.mean_wind(prof, exact=True)
+    correct_u, correct_v = 27.380840616294723, 1.6918481586877472
+    npt.assert_almost_equal(returned, [correct_u, correct_v])
+    returned = winds.mean_wind_npw(prof, exact=True)
+    correct_u, correct_v = 31.843605953677137, -0.4146032381342044
+    npt.assert_almost_equal(returned, [correct_u, correct_v])
+    for pbot, ptop in [(900.3, 300.7), (prof.pres[prof.sfc], 500.)]:
+        for func in [winds.mean_wind, winds.mean_wind_npw]:
+            npt.assert_almost_equal(func(prof, pbot, ptop, exact=True),
+                func(prof, pbot, ptop, dp=-0.01), 3)
+    returned = winds.sr_wind(prof, stu=10, stv=10, exact=True)
+    npt.assert_almost_equal(returned, [17.380840616294723, -8.3081518413122528])
+
+    # layers beyond the data are masked; a layer of zero depth is a level
+    for pbot, ptop in [(1000., 900.), (850., 1.), (ma.masked, 500.)]:
+        for func in [winds.mean_wind, winds.mean_wind_npw, winds.sr_wind,
+                     winds.sr_wind_npw]:
+            returned = func(prof, pbot, ptop, exact=True)
+            npt.assert_(returned[0] is ma.masked)
+            npt.assert_(returned[1] is ma.masked)
+    for func in [winds.mean_wind, winds.mean_wind_npw]:
+        npt.assert_almost_equal(func(prof, 850., 850., exact=True),
+                                func(prof, 850., 850.))
+
+
 def test_sr_wind():
     input_stu = 10
     input_stv = 10
@@ -57,6 +87,9 @@ def test_non_parcel_bunkers_motion():
                20.924864405622614, 19.379065415942257]
     returned = winds.non_parcel_bunkers_motion(prof)
     npt.assert_almost_equal(returned, correct)
+    # the motion is missing without the surface wind
+    for value in winds.non_parcel_bunkers_motion(nosfc):
+        npt.assert_(value is ma.masked)
 
 
 def test_helicity():
@@ -104,3 +137,146 @@ def test_mbe_vectors():
     npt.assert_almost_equal(returned, correct)
 
 
+
+
+def test_kinematics():
+    kin = winds.kinematics(prof)
+    psfc = prof.pres[prof.sfc]
+    p6km = interp.pres(prof, interp.to_msl(prof, 6000.))
+    npt.assert_equal(kin.mean_6km, winds.mean_wind_npw(prof, psfc, p6km))
+    npt.assert_equal(kin.mean_trop, winds.mean_wind_npw(prof, 850., 300.))
+    for depth, shear in [(1000., kin.shear_1km), (3000., kin.shear_3km),
+                         (6000., kin.shear_6km)]:
+        ptop = interp.pres(prof, interp.to_msl(prof, depth))
+        npt.assert_equal(shear, winds.wind_shear(prof, psfc, ptop))
+    rstu, rstv, lstu, lstv = winds.non_parcel_bunkers_motion(prof)
+    npt.assert_equal(kin.right_mover + kin.left_mover,
+                     (rstu, rstv, lstu, lstv))
+    npt.assert_equal(kin.upshear + kin.downshear,
+                     winds.corfidi_mcs_motion(prof))
+    npt.assert_equal(kin.srh_1km,
+                     winds.helicity(prof, 0, 1000., stu=rstu, stv=rstv))
+    npt.assert_equal(kin.srh_3km,
+                     winds.helicity(prof, 0, 3000., stu=rstu, stv=rstv))
+
+
+def test_helicity_many():
+    stu, stv = np.meshgrid(np.linspace(-40, 40, 9), np.linspace(-30, 30, 7))
+    for exact in [True, False]:
+        returned = winds.helicity_many(prof, 0., 3000., stu, stv,
+                                       exact=exact)
+        npt.assert_equal(returned[0].shape, stu.shape)
+        for i, j in [(0, 0), (3, 4), (6, 8), (2, 7)]:
+            correct = winds.helicity(prof, 0., 3000., stu=stu[i, j],
+                                     stv=stv[i, j], exact=exact)
+            npt.assert_almost_equal([r[i, j] for r in returned], correct)
+    correct = [284.9218078420389, 302.9305759626597, -18.008768120620786]
+    returned = winds.helicity_many(prof, 0., 3000., 10.5329157627,
+                                   -7.86385969675)
+    npt.assert_almost_equal(returned, correct)
+
+    # the segment from a missing surface wind is left out
+    for exact in [True, False]:
+        returned = winds.helicity_many(nosfc, 0., 3000., [10.], [-5.],
+                                       exact=exact)
+        correct = winds.helicity(nosfc, 0., 3000., stu=10., stv=-5.,
+                                 exact=exact)
+        npt.assert_(np.all(np.isfinite(correct)))
+        npt.assert_almost_equal([r[0] for r in returned], correct)
+
+    coll = ProfileCollection.from_profiles([prof])
+    npt.assert_raises(TypeError, winds.helicity_many, coll, 0., 3000.)
+
+
+def test_helicity_layers():
+    input_ru = 10.5329157627
+    input_rv = -7.86385969675
+    layers = [(0., 500.), (0., 1000.), (0., 3000.), (500., 2500.),
+              (1234.5, 1300.), (2000., 6000.)]
+    returned = winds.helicity_layers(prof, layers, stu=input_ru,
+                                     stv=input_rv)
+    for i, (lower, upper) in enumerate(layers):
+        correct = winds.helicity(prof, lower, upper, stu=input_ru,
+                                 stv=input_rv)
+        npt.assert_almost_equal([r[i] for r in returned], correct)
+
+    # the segment from a missing surface wind is left out
+    returned = winds.helicity_layers(nosfc, layers, stu=10., stv=-5.)
+    coll = winds.helicity_layers(ProfileCollection.from_profiles([nosfc]),
+                                 layers, stu=10., stv=-5.)
+    for i, (lower, upper) in enumerate(layers):
+        correct = winds.helicity(nosfc, lower, upper, stu=10., stv=-5.)
+        npt.assert_(np.all(np.isfinite(correct)))
+        npt.assert_almost_equal([r[i] for r in returned], correct)
+        npt.assert_almost_equal([r[0, i] for r in coll], correct)
+
+
+def test_profile_collection():
+    # a profile cut off at 400 hPa and one with stronger winds
+    cut = prof.pres >= 400.
+    low = Profile(pres=prof.pres[cut], hght=prof.hght[cut],
+                  tmpc=prof.tmpc[cut], dwpc=prof.dwpc[cut],
+                  wdir=prof.wdir[cut], wspd=prof.wspd[cut])
+    fast = Profile(pres=prof.pres, hght=prof.hght, tmpc=prof.tmpc,
+                   dwpc=prof.dwpc, u=prof.u * 1.5, v=prof.v - 5.)
+    profs = [prof, low, fast, nosfc]
+    coll = ProfileCollection.from_profiles(profs)
+
+    def check(returned, correct):
+        for field, values in zip(returned, zip(*correct)):
+            npt.assert_equal(np.shape(field), (len(profs),))
+            npt.assert_almost_equal(ma.filled(field, np.nan),
+                [np.nan if v is ma.masked else v for v in values])
+
+    check(winds.mean_wind(coll, 900., 450.),
+          [winds.mean_wind(q, 900., 450.) for q in profs])
+    check(winds.mean_wind(coll, exact=True),
+          [winds.mean_wind(q, exact=True) for q in profs])
+    check(winds.mean_wind_npw(coll, 900., 450., exact=True),
+          [winds.mean_wind_npw(q, 900., 450., exact=True) for q in profs])
+    check(winds.mean_wind(coll, 850., 850., exact=True),
+          [winds.mean_wind(q, 850., 850.) for q in profs])
+    check(winds.sr_wind_npw(coll, 900., 450., stu=5., stv=-5.),
+          [winds.sr_wind_npw(q, 900., 450., stu=5., stv=-5.)
+           for q in profs])
+    check(winds.wind_shear(coll, 900., 450.),
+          [winds.wind_shear(q, 900., 450.) for q in profs])
+    check(winds.non_parcel_bunkers_motion(coll),
+          [winds.non_parcel_bunkers_motion(q) for q in profs])
+    check(winds.corfidi_mcs_motion(coll),
+          [winds.corfidi_mcs_motion(q) for q in profs])
+    check(winds.helicity(coll, 0, 3000., stu=10., stv=-5.),
+          [winds.helicity(q, 0, 3000., stu=10., stv=-5.) for q in profs])
+    check(winds.helicity(coll, 0, 3000., stu=10., stv=-5., exact=False),
+          [winds.helicity(q, 0, 3000., stu=10., stv=-5., exact=False)
+           for q in profs])
+    check(winds.max_wind(coll, 0, 6000.),
+          [winds.max_wind(q, 0, 6000.) for q in profs])
+    npt.assert_raises(ValueError, winds.max_wind, coll, 0, 6000., True)
+
+    # storm motions per profile
+    rstu, rstv = winds.non_parcel_bunkers_motion(coll)[:2]
+    check(winds.helicity(coll, 0, 1000., stu=rstu, stv=rstv),
+          [winds.helicity(q, 0, 1000., stu=rstu[i], stv=rstv[i])
+           for i, q in enumerate(profs)])
+    returned = winds.helicity_layers(coll, [(0, 1000.), (0, 3000.)])
+    for i, q in enumerate(profs):
+        npt.assert_almost_equal([field[i] for field in returned],
+                                winds.helicity_layers(q, [(0, 1000.),
+                                                          (0, 3000.)]))
+
+    # the mean winds of the profile that ends at 400 hPa are missing
+    kin = winds.kinematics(coll)
+    npt.assert_(kin.mean_trop[0].mask[1])
+    kins = [winds.kinematics(q) for q in profs]
+    for name in ['mean_6km', 'mean_1p5km', 'mean_trop', 'shear_1km',
+                 'shear_3km', 'shear_6km', 'right_mover', 'left_mover',
+                 'upshear', 'downshear', 'srh_1km', 'srh_3km']:
+        check(getattr(kin, name), [getattr(k, name) for k in kins])
+
+    # the helicity is missing with the storm motion of the profile without
+    # its surface wind, rather than zero
+    for srh in [kins[3].srh_1km, kins[3].srh_3km]:
+        npt.assert_(all(h is ma.masked for h in srh))
+    for srh in [kin.srh_1km, kin.srh_3km]:
+        npt.assert_(all(h.mask[3] for h in srh))